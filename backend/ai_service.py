@@ -1,16 +1,195 @@
-from sentence_transformers import SentenceTransformer
+import hashlib
+import os
+import numpy as np
+from embedding_cache import EmbeddingCache
 
-# Model tek bir kez yüklenir (Global Değişken)
 # 'all-MiniLM-L6-v2' modeli hem hızlıdır hem de semantic (anlamsal) ilişkileri çok iyi kurar.
-print("🧠 NLP Modeli (BERT) yükleniyor... (İlk seferde indirme yapabilir)")
-model = SentenceTransformer('all-MiniLM-L6-v2')
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# Çıkarım (inference) motoru:
+#   "torch"     -> SentenceTransformer, fp32 PyTorch (varsayılan)
+#   "onnx"      -> modeli bir kez ONNX'e export eder, onnxruntime ile çalıştırır
+#   "onnx-int8" -> ONNX + dinamik int8 quantization (CPU'da en hızlısı)
+#   "random"    -> model yok; metnin hash'inden türetilen birim vektörler (sentetik veri / benchmark)
+# onnx / onnx-int8 opsiyonel bağımlılık ister (requirements.txt'de yok):
+#   pip install -r requirements-onnx.txt
+#   onnxruntime -> çıkarım ve int8 quantization; onnx + onnxscript -> torch.onnx.export ile tek seferlik export
+MOOD_ENCODER_BACKEND = os.getenv("MOOD_ENCODER_BACKEND", "torch")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "onnx_model")
+MAX_SEQ_LENGTH = 256  # all-MiniLM-L6-v2'nin max_seq_length değeri
+
+
+class TorchEncoder:
+    """Mevcut PyTorch yolu (SentenceTransformer)."""
+
+    def __init__(self):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(MODEL_NAME)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts, batch_size: int = 64):
+        embeddings = self.model.encode(list(texts), batch_size=batch_size, convert_to_numpy=True)
+        return np.asarray(embeddings, dtype=np.float32)
+
+
+class OnnxEncoder:
+    """
+    onnxruntime ile çalışan encoder. SentenceTransformer ile aynı adımlar:
+    tokenize -> transformer -> mean pooling (attention mask ile) -> L2 normalize.
+    """
+
+    def __init__(self, quantize: bool = False, model_dir: str = ONNX_MODEL_DIR):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError(
+                f"MOOD_ENCODER_BACKEND={MOOD_ENCODER_BACKEND} için onnxruntime gerekli: "
+                "pip install -r requirements-onnx.txt"
+            ) from e
+        from transformers import AutoTokenizer
+
+        fp32_path = os.path.join(model_dir, "model.onnx")
+        int8_path = os.path.join(model_dir, "model_int8.onnx")
+        if not os.path.exists(fp32_path):
+            self.export(model_dir)
+        if quantize and not os.path.exists(int8_path):
+            self.quantize(fp32_path, int8_path)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            int8_path if quantize else fp32_path, options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.dim = self.session.get_outputs()[0].shape[-1]
+
+    @staticmethod
+    def export(model_dir: str):
+        """PyTorch modelini tek seferlik ONNX dosyasına çevirir (tokenizer ile birlikte)."""
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        print(f"📦 Model ONNX formatına çevriliyor -> {model_dir}")
+        os.makedirs(model_dir, exist_ok=True)
+        st_model = SentenceTransformer(MODEL_NAME, device="cpu")
+        transformer = st_model[0].auto_model.eval()
+        tokenizer = st_model.tokenizer
+        tokenizer.save_pretrained(model_dir)
+
+        sample = tokenizer(["örnek metin"], return_tensors="pt")
+        with torch.no_grad():
+            torch.onnx.export(
+                transformer,
+                (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+                os.path.join(model_dir, "model.onnx"),
+                input_names=["input_ids", "attention_mask", "token_type_ids"],
+                output_names=["last_hidden_state"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "seq"},
+                    "attention_mask": {0: "batch", 1: "seq"},
+                    "token_type_ids": {0: "batch", 1: "seq"},
+                    "last_hidden_state": {0: "batch", 1: "seq"},
+                },
+                opset_version=17,
+            )
+
+    @staticmethod
+    def quantize(fp32_path: str, int8_path: str):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        print("🗜️ ONNX modeli int8'e quantize ediliyor...")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    def encode(self, texts, batch_size: int = 64):
+        texts = list(texts)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            tokens = self.tokenizer(batch, padding=True, truncation=True,
+                                    max_length=MAX_SEQ_LENGTH, return_tensors="np")
+            feeds = {name: tokens[name].astype(np.int64) for name in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+
+            # Mean pooling: padding token'ları ortalamaya katılmaz
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            out[start:start + len(batch)] = pooled / np.clip(norms, 1e-12, None)
+        return out
+
+
+class RandomEncoder:
+    """
+    Model yüklemeden çalışan sahte encoder: aynı metin her zaman aynı rastgele
+    birim vektörü verir (anlamsal benzerlik yoktur). Benchmark ve sentetik veri
+    üretiminde MiniLM'in yerine geçer.
+    """
+
+    dim = 384
+
+    def encode(self, texts, batch_size: int = 64):
+        texts = list(texts)
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+            out[i] = np.random.default_rng(seed).standard_normal(self.dim)
+        return out / np.linalg.norm(out, axis=1, keepdims=True)
+
+
+def create_encoder(backend: str = MOOD_ENCODER_BACKEND):
+    if backend == "torch":
+        return TorchEncoder()
+    if backend == "onnx":
+        return OnnxEncoder(quantize=False)
+    if backend == "onnx-int8":
+        return OnnxEncoder(quantize=True)
+    if backend == "random":
+        return RandomEncoder()
+    raise ValueError(f"Bilinmeyen MOOD_ENCODER_BACKEND: {backend}")
+
+
+# Model tek bir kez yüklenir (Global Değişken)
+print(f"🧠 NLP Modeli (BERT, {MOOD_ENCODER_BACKEND}) yükleniyor... (İlk seferde indirme yapabilir)")
+encoder = create_encoder()
 print("✅ Model hazır!")
 
+# Aynı metin için modeli tekrar çalıştırmamak için önbellek (RAM + disk).
+# Farklı motorların vektörleri birbirine karışmasın diye anahtar motoru da içerir.
+embedding_cache = EmbeddingCache(f"{MODEL_NAME}:{MOOD_ENCODER_BACKEND}")
+
 def get_mood_vector(text: str):
     """
     Gelen metni alır (örn: "Canım sıkkın"),
     BERT modelinden geçirir ve 384 boyutlu bir liste (vektör) döner.
     """
-    # encode() normalde numpy array döner, veritabanı/JSON için list'e çeviriyoruz.
-    embedding = model.encode(text).tolist()
-    return embedding
\ No newline at end of file
+    cached = embedding_cache.get(text)
+    if cached is not None:
+        return cached.tolist()
+
+    # encode() numpy array döner, veritabanı için list'e çeviriyoruz.
+    embedding = encoder.encode([text])[0]
+    embedding_cache.put(text, embedding)
+    return embedding.tolist()
+
+def get_mood_vectors(texts, batch_size: int = 64, use_cache: bool = True):
+    """
+    Birden fazla metni tek seferde (batch halinde) vektöre çevirir.
+    (N, 384) boyutlu float32 NumPy dizisi döner.
+    Önbellekte olanlar modelden geçmez, batch içindeki tekrarlar tek kez kodlanır.
+    """
+    texts = list(texts)
+    if not use_cache:
+        return encoder.encode(texts, batch_size=batch_size)
+
+    cached = embedding_cache.get_many(texts)
+    missing = list(dict.fromkeys(t for t, v in zip(texts, cached) if v is None))
+    if missing:
+        encoded = encoder.encode(missing, batch_size=batch_size)
+        embedding_cache.put_many(missing, encoded)
+        fresh = dict(zip(missing, encoded))
+        cached = [v if v is not None else fresh[t] for t, v in zip(texts, cached)]
+
+    if not cached:
+        return np.zeros((0, encoder.dim), dtype=np.float32)
+    return np.asarray(np.stack(cached), dtype=np.float32)
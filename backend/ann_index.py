@@ -0,0 +1,299 @@
+"""
+Yaklaşık en yakın komşu (ANN) araması için saf NumPy IVF indeksi.
+
+IVF (Inverted File): vektörler k-means ile n_lists kümeye ayrılır, her küme
+kendi "ters listesini" tutar. Sorguda sadece sorguya en yakın nprobe küme
+taranır -> tarama maliyeti ~ N * nprobe / n_lists.
+nprobe büyüdükçe recall artar, gecikme de artar (recall/latency düğmesi).
+
+Komut satırı:
+    python ann_index.py build [dosya]   -> user_profiles tablosundan indeksi kurup kaydeder
+"""
+import os
+import sys
+import threading
+
+import numpy as np
+
+# Ayarlar (ortam değişkenleriyle değiştirilebilir)
+ANN_INDEX_PATH = os.getenv("ANN_INDEX_PATH", "user_ivf.npz")
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))
+ANN_NLISTS = int(os.getenv("ANN_NLISTS", "0"))  # 0 -> 4 * sqrt(N)
+
+
+def _normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def default_n_lists(n: int) -> int:
+    if ANN_NLISTS > 0:
+        return ANN_NLISTS
+    return max(1, int(4 * np.sqrt(max(n, 1))))
+
+
+class IVFIndex:
+    """
+    Kosinüs benzerliği için IVF indeksi.
+    Vektörler normalize edilerek saklanır, skor = iç çarpım.
+    """
+
+    def __init__(self, dim: int, n_lists: int, nprobe: int = ANN_NPROBE):
+        self.dim = dim
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.centroids = None
+        self._lock = threading.RLock()
+        self._vecs = [np.zeros((0, dim), dtype=np.float32) for _ in range(n_lists)]
+        self._ids = [np.zeros(0, dtype=np.int64) for _ in range(n_lists)]
+        self._sizes = np.zeros(n_lists, dtype=np.int64)
+        self._where = {}  # id -> (liste no, liste içindeki pozisyon)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, item_id):
+        return int(item_id) in self._where
+
+    # --- EĞİTİM (Coarse Quantizer) ---
+
+    def train(self, vectors, n_iter: int = 15, max_samples_per_list: int = 256, seed: int = 0):
+        """Küresel (spherical) k-means ile küme merkezlerini öğrenir."""
+        data = _normalize_rows(vectors)
+        rng = np.random.default_rng(seed)
+
+        n_lists = min(self.n_lists, len(data))
+        if n_lists == 0:
+            raise ValueError("Eğitim için en az bir vektör gerekli")
+
+        # Büyük veri setlerinde örneklem üzerinden eğit
+        max_samples = max_samples_per_list * n_lists
+        if len(data) > max_samples:
+            data = data[rng.choice(len(data), max_samples, replace=False)]
+
+        centroids = data[rng.choice(len(data), n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assign = self._assign(data, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, data)
+            counts = np.bincount(assign, minlength=n_lists)
+
+            # Boş kalan kümeleri rastgele bir noktaya taşı
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = data[rng.choice(len(data), int(empty.sum()), replace=False)]
+            centroids = _normalize_rows(sums)
+
+        with self._lock:
+            self.n_lists = n_lists
+            self.centroids = centroids
+            self._vecs = [np.zeros((0, self.dim), dtype=np.float32) for _ in range(n_lists)]
+            self._ids = [np.zeros(0, dtype=np.int64) for _ in range(n_lists)]
+            self._sizes = np.zeros(n_lists, dtype=np.int64)
+            self._where = {}
+
+    @staticmethod
+    def _assign(data, centroids, block: int = 65536):
+        # Belleği sınırlı tutmak için bloklar halinde en yakın merkezi bul
+        out = np.empty(len(data), dtype=np.int64)
+        for start in range(0, len(data), block):
+            out[start:start + block] = np.argmax(data[start:start + block] @ centroids.T, axis=1)
+        return out
+
+    # --- EKLEME / SİLME ---
+
+    def _remove(self, item_id: int):
+        list_no, pos = self._where.pop(item_id)
+        last = self._sizes[list_no] - 1
+        if pos != last:
+            # Son elemanı silinen yere taşı (swap-remove)
+            moved_id = int(self._ids[list_no][last])
+            self._vecs[list_no][pos] = self._vecs[list_no][last]
+            self._ids[list_no][pos] = moved_id
+            self._where[moved_id] = (list_no, pos)
+        self._sizes[list_no] = last
+
+    def _reserve(self, list_no: int, extra: int):
+        needed = self._sizes[list_no] + extra
+        capacity = len(self._ids[list_no])
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 16)
+        vecs = np.zeros((capacity, self.dim), dtype=np.float32)
+        ids = np.zeros(capacity, dtype=np.int64)
+        size = self._sizes[list_no]
+        vecs[:size] = self._vecs[list_no][:size]
+        ids[:size] = self._ids[list_no][:size]
+        self._vecs[list_no], self._ids[list_no] = vecs, ids
+
+    def add(self, ids, vectors):
+        """Vektörleri ilgili ters listelere ekler. Var olan id'ler güncellenir (upsert)."""
+        if not self.is_trained:
+            raise RuntimeError("İndeks eğitilmeden ekleme yapılamaz (önce train/build)")
+
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        data = _normalize_rows(vectors)
+        assign = self._assign(data, self.centroids)
+
+        with self._lock:
+            for item_id in ids:
+                if int(item_id) in self._where:
+                    self._remove(int(item_id))
+
+            for list_no in np.unique(assign):
+                mask = assign == list_no
+                count = int(mask.sum())
+                self._reserve(list_no, count)
+                start = self._sizes[list_no]
+                self._vecs[list_no][start:start + count] = data[mask]
+                self._ids[list_no][start:start + count] = ids[mask]
+                for offset, item_id in enumerate(ids[mask]):
+                    self._where[int(item_id)] = (int(list_no), int(start + offset))
+                self._sizes[list_no] = start + count
+
+    def remove(self, ids):
+        """Verilen id'leri indeksten çıkarır (olmayanlar yok sayılır)."""
+        with self._lock:
+            for item_id in np.asarray(ids, dtype=np.int64).reshape(-1).tolist():
+                if item_id in self._where:
+                    self._remove(item_id)
+
+    def all_ids(self):
+        with self._lock:
+            return np.fromiter(self._where.keys(), dtype=np.int64, count=len(self._where))
+
+    def stale_ids(self, ids, vectors, atol: float = 1e-5):
+        """
+        Verilen (güncel) vektörlere göre indekste eksik ya da vektörü farklı olan id'ler.
+        Diskten yüklenen indeksi veritabanıyla eşitlemek için kullanılır.
+        """
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        data = _normalize_rows(vectors)
+        stale = np.ones(len(ids), dtype=bool)
+        with self._lock:
+            for row, item_id in enumerate(ids.tolist()):
+                where = self._where.get(item_id)
+                if where is not None:
+                    stored = self._vecs[where[0]][where[1]]
+                    stale[row] = not np.allclose(stored, data[row], atol=atol)
+        return ids[stale]
+
+    def build(self, ids, vectors, **train_kwargs):
+        self.train(vectors, **train_kwargs)
+        self.add(ids, vectors)
+
+    # --- ARAMA ---
+
+    def search(self, query, top_k: int = 10, nprobe: int = None, exclude_id: int = None):
+        """
+        En yakın nprobe kümeyi tarayıp en benzer top_k vektörü döner.
+        Sonuç: (ids, scores) skora göre azalan sırada.
+        """
+        if not self.is_trained or top_k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        q = _normalize_rows(query)[0]
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+
+        with self._lock:
+            coarse = self.centroids @ q
+            probe = np.argpartition(-coarse, nprobe - 1)[:nprobe]
+
+            cand_ids, cand_scores = [], []
+            for list_no in probe:
+                size = self._sizes[list_no]
+                if size == 0:
+                    continue
+                cand_ids.append(self._ids[list_no][:size])
+                cand_scores.append(self._vecs[list_no][:size] @ q)
+
+            if not cand_ids:
+                return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+            ids = np.concatenate(cand_ids)
+            scores = np.concatenate(cand_scores)
+
+        if exclude_id is not None:
+            scores[ids == exclude_id] = -np.inf
+
+        k = min(top_k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = top[np.isfinite(scores[top])]
+        return ids[top], scores[top]
+
+    # --- KAYDETME / YÜKLEME ---
+
+    def save(self, path: str = ANN_INDEX_PATH):
+        with self._lock:
+            sizes = self._sizes.copy()
+            vecs = np.concatenate([self._vecs[i][:sizes[i]] for i in range(self.n_lists)]) \
+                if self.n_lists else np.zeros((0, self.dim), dtype=np.float32)
+            ids = np.concatenate([self._ids[i][:sizes[i]] for i in range(self.n_lists)]) \
+                if self.n_lists else np.zeros(0, dtype=np.int64)
+            centroids = self.centroids
+
+        # Yarım yazılmış dosya bırakmamak için önce geçici dosyaya yaz
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, centroids=centroids, sizes=sizes, vecs=vecs, ids=ids,
+                     nprobe=np.int64(self.nprobe))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = ANN_INDEX_PATH):
+        with np.load(path) as data:
+            centroids = data["centroids"]
+            sizes = data["sizes"]
+            vecs = data["vecs"]
+            ids = data["ids"]
+            nprobe = int(data["nprobe"])
+
+        index = cls(dim=centroids.shape[1], n_lists=len(centroids), nprobe=nprobe)
+        index.centroids = centroids
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+        for list_no in range(len(centroids)):
+            start, end = offsets[list_no], offsets[list_no + 1]
+            index._vecs[list_no] = vecs[start:end].copy()
+            index._ids[list_no] = ids[start:end].copy()
+            for pos, item_id in enumerate(index._ids[list_no]):
+                index._where[int(item_id)] = (list_no, pos)
+        index._sizes = sizes.astype(np.int64)
+        return index
+
+
+def build_from_database(path: str = ANN_INDEX_PATH):
+    """user_profiles tablosundaki tüm vektörlerden IVF indeksini kurup diske yazar."""
+    from database import SessionLocal
+    from vector_index import UserVectorIndex
+
+    db = SessionLocal()
+    index = UserVectorIndex()
+    index.load(db)
+    db.close()
+
+    ids, vectors = index.snapshot()
+    if len(ids) == 0:
+        print("⚠️ Vektörlü profil bulunamadı, indeks oluşturulmadı.")
+        return None
+
+    ivf = IVFIndex(dim=vectors.shape[1], n_lists=default_n_lists(len(ids)))
+    ivf.build(ids, vectors)
+    ivf.save(path)
+    print(f"✅ IVF indeksi kaydedildi: {path} ({len(ids)} vektör, {ivf.n_lists} küme)")
+    return ivf
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "build":
+        build_from_database(sys.argv[2] if len(sys.argv) > 2 else ANN_INDEX_PATH)
+    else:
+        print(__doc__)
@@ -0,0 +1,106 @@
+"""
+IVF indeksi için recall / gecikme benchmark'ı (tam taramaya karşı).
+
+Kullanım:
+    python bench_ann.py                     -> sentetik kümelenmiş vektörlerle (varsayılan 100k x 384)
+    python bench_ann.py --n 500000 --queries 500
+    python bench_ann.py --db                -> user_profiles tablosundaki gerçek vektörlerle
+
+Her nprobe değeri için recall@k, sorgu başına ortalama/p95 gecikme ve QPS yazdırılır.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from ann_index import IVFIndex, default_n_lists, _normalize_rows
+
+
+def synthetic_vectors(n: int, dim: int, n_clusters: int = 200, seed: int = 0):
+    """MiniLM vektörlerine benzer şekilde kümelenmiş birim vektörler üretir."""
+    rng = np.random.default_rng(seed)
+    centers = _normalize_rows(rng.normal(size=(n_clusters, dim)))
+    labels = rng.integers(0, n_clusters, size=n)
+    data = centers[labels] + 0.35 * rng.normal(size=(n, dim)).astype(np.float32) / np.sqrt(dim) * 4
+    return _normalize_rows(data)
+
+
+def database_vectors():
+    from database import SessionLocal
+    from vector_index import UserVectorIndex
+
+    db = SessionLocal()
+    index = UserVectorIndex(backend="exact")
+    index.load(db)
+    db.close()
+    return index.snapshot()
+
+
+def exact_top_k(data, queries, k):
+    # Servisteki gibi sorgu başına tek matris-vektör çarpımı (adil gecikme karşılaştırması)
+    result = []
+    for q in queries:
+        scores = data @ q
+        result.append(set(np.argpartition(-scores, k - 1)[:k]))
+    return result
+
+
+def run(data, ids, n_queries: int, k: int, n_lists: int, nprobes, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    query_rows = rng.choice(len(data), min(n_queries, len(data)), replace=False)
+    queries = data[query_rows]
+
+    print(f"📊 N={len(data)}, dim={data.shape[1]}, n_lists={n_lists}, k={k}, sorgu={len(queries)}")
+
+    start = time.perf_counter()
+    truth = exact_top_k(data, queries, k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    truth_ids = [set(ids[list(t)]) for t in truth]
+
+    start = time.perf_counter()
+    index = IVFIndex(dim=data.shape[1], n_lists=n_lists)
+    index.build(ids, data)
+    print(f"🏗️  İndeks kurulumu: {time.perf_counter() - start:.2f} sn")
+    print(f"🔎 Tam tarama: {exact_ms:.3f} ms/sorgu\n")
+
+    print(f"{'nprobe':>7} {'recall@k':>9} {'ort ms':>8} {'p95 ms':>8} {'QPS':>9}")
+    for nprobe in nprobes:
+        latencies = []
+        hits = 0
+        for q, expected in zip(queries, truth_ids):
+            t0 = time.perf_counter()
+            found, _ = index.search(q, top_k=k, nprobe=nprobe)
+            latencies.append(time.perf_counter() - t0)
+            hits += len(expected.intersection(found.tolist()))
+        latencies = np.array(latencies) * 1000
+        recall = hits / (k * len(queries))
+        print(f"{nprobe:>7} {recall:>9.3f} {latencies.mean():>8.3f} "
+              f"{np.percentile(latencies, 95):>8.3f} {1000 / latencies.mean():>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IVF recall/gecikme benchmark'ı")
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-lists", type=int, default=0)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--db", action="store_true", help="Sentetik yerine veritabanı vektörlerini kullan")
+    args = parser.parse_args()
+
+    if args.db:
+        ids, data = database_vectors()
+        if len(ids) == 0:
+            print("⚠️ Veritabanında vektörlü profil yok.")
+            return
+    else:
+        data = synthetic_vectors(args.n, args.dim)
+        ids = np.arange(len(data), dtype=np.int64)
+
+    n_lists = args.n_lists or default_n_lists(len(data))
+    run(data, ids, args.queries, min(args.k, len(data)), n_lists, args.nprobe)
+
+
+if __name__ == "__main__":
+    main()
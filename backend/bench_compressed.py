@@ -0,0 +1,93 @@
+"""
+Sıkıştırılmış vektör katmanı (PCA + int8) için bellek / recall benchmark'ı
+(tam kosinüs taramasına karşı).
+
+Kullanım:
+    python bench_compressed.py                      -> sentetik kümelenmiş vektörlerle (varsayılan 100k x 384)
+    python bench_compressed.py --dims 32 64 128 --rerank 1 5 10 20
+    python bench_compressed.py --db                 -> user_profiles tablosundaki gerçek vektörlerle
+
+Her (PCA boyutu, rerank çarpanı) için vektör başına bellek, float32'ye oranı,
+recall@k ve sorgu başına gecikme yazdırılır. Gecikmeye adayların tam
+vektörlerinin veritabanından okunması dahil değildir (bellekteki kopyadan
+alınır); serviste bu, sorgu başına top_k * rerank satırlık tek bir IN sorgusudur.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from bench_ann import database_vectors, exact_top_k, synthetic_vectors
+from compressed_index import CompressedVectors, PCAProjection, rerank
+
+
+def run(data, ids, n_queries: int, k: int, dims, rerank_factors, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    query_rows = rng.choice(len(data), min(n_queries, len(data)), replace=False)
+    queries = data[query_rows]
+
+    print(f"📊 N={len(data)}, dim={data.shape[1]}, k={k}, sorgu={len(queries)}")
+
+    start = time.perf_counter()
+    truth = exact_top_k(data, queries, k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    truth_ids = [set(ids[list(t)]) for t in truth]
+    float32_mb = data.nbytes / 2**20
+    print(f"🔎 Tam tarama: {exact_ms:.3f} ms/sorgu, float32 matris {float32_mb:.1f} MB\n")
+
+    print(f"{'boyut':>6} {'varyans':>8} {'B/vektör':>9} {'MB':>8} {'oran':>6} {'rerank':>7} "
+          f"{'recall@k':>9} {'ort ms':>8} {'p95 ms':>8}")
+    for dim in dims:
+        start = time.perf_counter()
+        projection = PCAProjection.fit(data, dim=dim)
+        store = CompressedVectors(projection, capacity=len(data))
+        store.put(np.arange(len(data)), data)
+        build_s = time.perf_counter() - start
+        footprint = store.memory_footprint(len(data), data.shape[1])
+        total_mb = (footprint["codes_bytes"] + footprint["projection_bytes"]) / 2**20
+        variance = projection.explained_variance(data[:50_000])
+
+        for factor in rerank_factors:
+            latencies = []
+            hits = 0
+            n_candidates = min(k * factor, len(data))
+            for q, expected in zip(queries, truth_ids):
+                t0 = time.perf_counter()
+                scores = store.scores(q, len(data))
+                rows = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+                found, _ = rerank(ids[rows], data[rows], q, k)
+                latencies.append(time.perf_counter() - t0)
+                hits += len(expected.intersection(found.tolist()))
+            latencies = np.array(latencies) * 1000
+            recall = hits / (k * len(queries))
+            print(f"{projection.dim:>6} {variance:>8.3f} {footprint['codes_bytes'] / len(data):>9.0f} "
+                  f"{total_mb:>8.1f} {footprint['codes_ratio']:>5.1f}x {factor:>7} {recall:>9.3f} "
+                  f"{latencies.mean():>8.3f} {np.percentile(latencies, 95):>8.3f}")
+        print(f"       (PCA + kodlama: {build_s:.2f} sn)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PCA + int8 sıkıştırma bellek/recall benchmark'ı")
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dims", type=int, nargs="+", default=[32, 64, 128])
+    parser.add_argument("--rerank", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--db", action="store_true", help="Sentetik yerine veritabanı vektörlerini kullan")
+    args = parser.parse_args()
+
+    if args.db:
+        ids, data = database_vectors()
+        if len(ids) == 0:
+            print("⚠️ Veritabanında vektörlü profil yok.")
+            return
+    else:
+        data = synthetic_vectors(args.n, args.dim)
+        ids = np.arange(len(data), dtype=np.int64)
+
+    run(data, ids, args.queries, min(args.k, len(data)), args.dims, args.rerank)
+
+
+if __name__ == "__main__":
+    main()
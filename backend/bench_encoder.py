@@ -0,0 +1,85 @@
+"""
+Encoder motorlarını karşılaştırır: doğruluk (PyTorch vektörlerine kosinüs
+benzerliği) + gecikme / throughput.
+
+Kullanım:
+    python bench_encoder.py                       -> torch, onnx, onnx-int8
+    python bench_encoder.py --backends torch onnx-int8 --n 512
+"""
+import argparse
+import itertools
+import time
+
+import numpy as np
+
+# Onboarding sorularındaki seçeneklerle (main.startup_event) gerçekçi profil metinleri
+ACTIVITIES = ["Ders çalışırken 📚", "Spor yaparken 🏃", "Arabada 🚗", "Yürürken 🚶",
+              "Dinlenirken ☕", "Oyun oynarken 🎮", "Yemek yaparken 🍳", "Uyku öncesi 🌙"]
+GENRES = ["Classic Rock", "Blues", "Metalcore", "Punk", "J-Pop", "Anime",
+          "Indie Folk", "Vocal Jazz", "Art Pop", "Avant-Garde", "Baroque Pop"]
+MOODS = ["Mutluluk 😃", "Üzüntü 😔", "Savaş ⚔️", "Korku 😨", "Sakinlik 😌", "Enerji ⚡", "Aşk ❤️"]
+
+
+def profile_texts(n: int):
+    combos = itertools.cycle(itertools.product(ACTIVITIES, itertools.combinations(GENRES, 2), MOODS))
+    texts = []
+    for activity, genres, mood in itertools.islice(combos, n):
+        texts.append(f"Aktivite: {activity}. Sevdiği Türler: {', '.join(genres)}. Ruh Hali: {mood}")
+    return texts
+
+
+def measure(encoder, texts, batch_size: int):
+    # Isınma (ilk çağrıdaki graph/bellek hazırlığı ölçüme girmesin)
+    encoder.encode(texts[:8], batch_size=batch_size)
+
+    single = []
+    for text in texts[:64]:
+        t0 = time.perf_counter()
+        encoder.encode([text])
+        single.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    vectors = encoder.encode(texts, batch_size=batch_size)
+    throughput = len(texts) / (time.perf_counter() - t0)
+    return vectors, np.array(single), throughput
+
+
+def main():
+    from ai_service import create_encoder
+
+    parser = argparse.ArgumentParser(description="Encoder motoru benchmark'ı")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--n", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    texts = profile_texts(args.n)
+    reference = None
+    print(f"{'motor':>10} {'tek ms p50':>11} {'tek ms p95':>11} {'batch/sn':>9} {'kos. ort':>9} {'kos. min':>9} {'top-5 örtüşme':>14}")
+    for backend in args.backends:
+        encoder = create_encoder(backend)
+        vectors, single, throughput = measure(encoder, texts, args.batch_size)
+
+        if reference is None:
+            # İlk motor (varsayılan: torch) referans kabul edilir
+            reference = vectors
+        cos = np.sum(vectors * reference, axis=1) / (
+            np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference, axis=1)
+        )
+
+        # Benzer kullanıcı sıralaması ne kadar korunuyor?
+        k = min(5, len(texts) - 1)
+        ref_sim = reference @ reference.T
+        new_sim = vectors @ vectors.T
+        np.fill_diagonal(ref_sim, -np.inf)
+        np.fill_diagonal(new_sim, -np.inf)
+        ref_top = np.argpartition(-ref_sim, k - 1, axis=1)[:, :k]
+        new_top = np.argpartition(-new_sim, k - 1, axis=1)[:, :k]
+        overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(ref_top, new_top)])
+
+        print(f"{backend:>10} {np.percentile(single, 50):>11.2f} {np.percentile(single, 95):>11.2f} "
+              f"{throughput:>9.1f} {cos.mean():>9.4f} {cos.min():>9.4f} {overlap:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+Endpoint benchmark paketi (regresyon eşikli).
+
+main.py'deki her rotayı süreç içinde (ASGI, ağ yok) sentetik veri üzerinde
+(bkz. synthetic_data.py) eşzamanlı isteklerle çalıştırır. Her rota için:
+p50/p95/p99 gecikme, throughput (istek/sn), istek başına SQL ifadesi ve hata (5xx).
+
+- Model yüklenmez: MOOD_ENCODER_BACKEND varsayılan olarak "random".
+- main.py'ye senaryosu olmayan yeni bir rota eklenirse benchmark hata verir.
+- --save-baseline ile sonuçlar JSON'a yazılır; --baseline ile verilen ölçüme göre
+  izlenen metrikler eşiği aşacak kadar kötüleşirse 1 koduyla çıkar (CI için).
+
+Kullanım:
+    python bench_endpoints.py --save-baseline bench_baseline.json
+    python bench_endpoints.py --baseline bench_baseline.json [--threshold 0.30]
+    python bench_endpoints.py --users 20000 --songs 200000 --requests 500 --concurrency 32
+
+Geçici bir veritabanı kullanır; muzik_app.db'ye dokunmaz.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+# İzlenen metrikler: (ad, yön) — "up" değerin artması, "down" azalması kötüleşmedir.
+# p99 raporlanır ama izlenmez: rota başına birkaç yüz istekte tek bir yavaş istekle oynar.
+TRACKED_METRICS = [("p95_ms", "up"), ("rps", "down"), ("sql_per_request", "up"), ("errors", "up")]
+MIN_LATENCY_DELTA_MS = 2.0   # Bundan küçük gecikme farkları gürültü sayılır
+MIN_SQL_DELTA = 0.5          # İstek başına yarım sorgudan az fark gürültü sayılır
+SLOW_SCENARIO_REQUESTS = 50  # bcrypt'li kayıt gibi pahalı senaryolarda istek sayısı üst sınırı
+
+
+# --- SENARYOLAR ---
+# (method, rota şablonu, istek üretici, pahalı mı); üretici (url, json gövdesi) döner.
+# Sıra önemli: okumalar önce, silme en sonda (silinen playlistler 404 döner).
+
+class BenchData:
+    """Senaryoların istek üretirken kullandığı sentetik id'ler."""
+
+    def __init__(self, generated, titles, deletable_playlists, seed: int):
+        self.rng = np.random.default_rng(seed)
+        self.user_ids = generated["user_ids"]
+        self.song_ids = generated["song_ids"]
+        self.playlist_ids = generated["playlist_ids"]
+        self.words = [w for title in titles for w in title.split()] or ["ka"]
+        self.deletable = list(deletable_playlists)
+        self.run_id = int(time.time())
+        self.counter = 0
+
+    def user(self):
+        return int(self.rng.choice(self.user_ids))
+
+    def song(self):
+        # Popüler şarkılar daha sık (synthetic_data ile aynı çarpıklık)
+        return int(self.song_ids[int(len(self.song_ids) * self.rng.random() ** 3)])
+
+    def songs(self, n: int):
+        return list(dict.fromkeys(self.song() for _ in range(n)))
+
+    def playlist(self):
+        return int(self.rng.choice(self.playlist_ids))
+
+    def word(self):
+        return str(self.rng.choice(self.words))
+
+    def next(self):
+        self.counter += 1
+        return self.counter
+
+
+def _signup(d):
+    n = d.next()
+    return "/users/", {"username": f"bench{d.run_id}_{n}", "email": f"bench{d.run_id}_{n}@ornek.com",
+                       "password": "sifre123"}
+
+
+def _profile(d):
+    return f"/users/{d.user()}/profile/", {
+        "age": 25, "location": "İstanbul", "hobbies": "Spor yaparken", "favorite_genres": "Blues",
+        "mood_description": f"Enerji {d.next()}",  # Her istek yeni metin (önbellekten dönmesin)
+    }
+
+
+def _delete_playlist(d):
+    return f"/playlists/{d.deletable.pop() if d.deletable else 0}", None
+
+
+SCENARIOS = [
+    ("GET", "/", lambda d: ("/", None), False),
+    ("GET", "/content/questions", lambda d: ("/content/questions", None), False),
+    ("GET", "/users/{user_id}", lambda d: (f"/users/{d.user()}", None), False),
+    ("GET", "/users/{user_id}/recommendations/", lambda d: (f"/users/{d.user()}/recommendations/", None), False),
+    ("GET", "/users/{user_id}/recommendations/?mode=hybrid",
+     lambda d: (f"/users/{d.user()}/recommendations/?mode=hybrid", None), False),
+    ("GET", "/users/{user_id}/song-recommendations/",
+     lambda d: (f"/users/{d.user()}/song-recommendations/", None), False),
+    ("GET", "/users/{user_id}/because-you-listened/",
+     lambda d: (f"/users/{d.user()}/because-you-listened/", None), False),
+    ("GET", "/songs/search", lambda d: (f"/songs/search?q={d.word()}", None), False),
+    ("GET", "/songs/autocomplete",
+     lambda d: (f"/songs/autocomplete?q={d.word()[:int(d.rng.integers(2, 5))]}", None), False),
+    ("GET", "/songs/{song_id}/similar/", lambda d: (f"/songs/{d.song()}/similar/", None), False),
+    ("GET", "/users/{user_id}/playlists/", lambda d: (f"/users/{d.user()}/playlists/", None), False),
+    ("GET", "/playlists/{playlist_id}/items", lambda d: (f"/playlists/{d.playlist()}/items", None), False),
+    ("GET", "/users/{user_id}/favorites/", lambda d: (f"/users/{d.user()}/favorites/", None), False),
+    ("GET", "/users/{user_id}/export", lambda d: (f"/users/{d.user()}/export", None), False),
+    ("POST", "/users/", _signup, True),
+    ("POST", "/users/{user_id}/profile/", _profile, False),
+    ("POST", "/users/{user_id}/playlists/",
+     lambda d: (f"/users/{d.user()}/playlists/", {"name": f"Bench {d.next()}"}), False),
+    ("POST", "/playlists/{playlist_id}/songs/{song_id}",
+     lambda d: (f"/playlists/{d.playlist()}/songs/{d.song()}", None), False),
+    ("DELETE", "/playlists/{playlist_id}/songs/{song_id}",
+     lambda d: (f"/playlists/{d.playlist()}/songs/{d.song()}", None), False),
+    ("POST", "/playlists/{playlist_id}/songs/batch",
+     lambda d: (f"/playlists/{d.playlist()}/songs/batch", {"song_ids": d.songs(20)}), False),
+    ("POST", "/playlists/{playlist_id}/songs/batch-remove",
+     lambda d: (f"/playlists/{d.playlist()}/songs/batch-remove", {"song_ids": d.songs(20)}), False),
+    ("PUT", "/playlists/{playlist_id}/songs/order",
+     lambda d: (f"/playlists/{d.playlist()}/songs/order", {"song_ids": d.songs(5)}), False),
+    ("POST", "/users/{user_id}/favorites/toggle/{song_id}",
+     lambda d: (f"/users/{d.user()}/favorites/toggle/{d.song()}", None), False),
+    ("DELETE", "/playlists/{playlist_id}", _delete_playlist, False),
+    ("GET", "/ai/cache-stats", lambda d: ("/ai/cache-stats", None), False),
+    ("GET", "/cache/stats", lambda d: ("/cache/stats", None), False),
+    ("GET", "/neighbors/stats", lambda d: ("/neighbors/stats", None), False),
+    ("GET", "/similarity/stats", lambda d: ("/similarity/stats", None), False),
+    ("GET", "/metrics", lambda d: ("/metrics", None), False),
+]
+
+
+# --- ÖLÇÜM ---
+
+class SQLCounter:
+    """Uygulamanın çalıştırdığı SQL ifadelerini sayar (arka plan komşu işi hariç)."""
+
+    def __init__(self, engines):
+        from sqlalchemy import event
+        self.count = 0
+        self._lock = threading.Lock()
+        for engine in {id(e): e for e in engines}.values():
+            event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.current_thread().name == "user-neighbors":
+            return
+        with self._lock:
+            self.count += 1
+
+
+async def _run_scenario(client, method, make, data, n_requests, concurrency, sql):
+    latencies, statuses = [], Counter()
+    pending = iter(range(n_requests))
+
+    async def worker():
+        for _ in pending:  # Tüm worker'lar aynı iteratörü paylaşır
+            url, body = make(data)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=body)
+                statuses[f"{response.status_code // 100}xx"] += 1
+            except Exception:
+                statuses["exception"] += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    sql_before = sql.count
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": n_requests,
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "rps": round(n_requests / elapsed, 1),
+        "sql_per_request": round((sql.count - sql_before) / n_requests, 2),
+        "errors": statuses["5xx"] + statuses["exception"],
+        "status": dict(statuses),
+    }
+
+
+def check_coverage(app):
+    """main.py'deki her API rotasının bir senaryosu olmalı."""
+    from fastapi.routing import APIRoute
+    covered = {(method, path) for method, path, _, _ in SCENARIOS}
+    return sorted(
+        f"{method} {route.path}"
+        for route in app.routes if isinstance(route, APIRoute)
+        for method in route.methods if (method, route.path) not in covered
+    )
+
+
+def compare(results, baseline, threshold: float, sql_threshold: float):
+    """Kötüleşen metrikleri [(rota, metrik, eski, yeni)] olarak döner."""
+    regressions = []
+    for route, old in baseline["routes"].items():
+        new = results.get(route)
+        if new is None:
+            continue
+        for metric, direction in TRACKED_METRICS:
+            if metric not in old:
+                continue
+            before, after = old[metric], new[metric]
+            if metric.endswith("_ms"):
+                worse = after > before * (1 + threshold) and after - before > MIN_LATENCY_DELTA_MS
+            elif metric == "rps":
+                worse = after < before * (1 - threshold)
+            elif metric == "sql_per_request":
+                worse = after > before * (1 + sql_threshold) and after - before > MIN_SQL_DELTA
+            else:  # errors
+                worse = after > before
+            if worse:
+                regressions.append((route, metric, before, after))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Endpoint benchmark paketi")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--songs", type=int, default=20_000)
+    parser.add_argument("--requests", type=int, default=200, help="Rota başına ölçülen istek")
+    parser.add_argument("--warmup", type=int, default=10, help="Rota başına ölçülmeyen ısınma isteği")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-response-cache", action="store_true", help="Yanıt önbelleğini kapat")
+    parser.add_argument("--only", help="Sadece yolunda bu metin geçen rotalar")
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--baseline", metavar="PATH")
+    parser.add_argument("--threshold", type=float, default=0.30, help="Gecikme/throughput için izin verilen oran")
+    parser.add_argument("--sql-threshold", type=float, default=0.10, help="Sorgu sayısı için izin verilen oran")
+    args = parser.parse_args()
+
+    # database / ai_service import edilmeden önce: geçici dosyalar ve sahte encoder
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+    for name in ("DATABASE_READ_URL", "DATABASE_ASYNC_URL"):
+        os.environ.pop(name, None)
+    os.environ["SONG_VECTORS_PATH"] = os.path.join(tmp.name, "song_vectors.npy")
+    os.environ["SONG_META_PATH"] = os.path.join(tmp.name, "song_meta.npz")
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(tmp.name, "embedding_cache.db")
+    os.environ["ANN_INDEX_PATH"] = os.path.join(tmp.name, "user_ivf.npz")
+    os.environ.setdefault("MOOD_ENCODER_BACKEND", "random")
+    if args.no_response_cache:
+        os.environ["RESPONSE_CACHE_ENABLED"] = "0"
+
+    import httpx
+    from sqlalchemy import select
+
+    import models
+    import synthetic_data
+    from database import SessionLocal, engine, read_engine, async_engine, async_read_engine
+
+    start = time.perf_counter()
+    generated = synthetic_data.generate(engine, users=args.users, songs=args.songs, seed=args.seed)
+    with SessionLocal() as db:
+        titles = db.scalars(select(models.Song.title).limit(500)).all()
+        deletable = db.scalars(select(models.Playlist.id).where(models.Playlist.is_favorite.is_(False))).all()
+    print(f"📦 Sentetik veri: {time.perf_counter() - start:.1f} sn")
+
+    import main as app_module
+    from user_neighbors import neighbor_job
+
+    missing = check_coverage(app_module.app)
+    if missing:
+        print("❌ Senaryosu olmayan rotalar (SCENARIOS listesine ekleyin):")
+        for route in missing:
+            print(f"   {route}")
+        sys.exit(1)
+
+    with SessionLocal() as db:
+        neighbor_job.refresh_all(db)  # Öneri tablosu ölçümden önce dolu olsun
+
+    data = BenchData(generated, titles, deletable, args.seed)
+    sql = SQLCounter([engine, read_engine, async_engine.sync_engine, async_read_engine.sync_engine])
+    scenarios = [s for s in SCENARIOS if not args.only or args.only in s[1]]
+
+    async def run():
+        results = {}
+        app = app_module.app
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+                for method, path, make, slow in scenarios:
+                    n = min(args.requests, SLOW_SCENARIO_REQUESTS) if slow else args.requests
+                    if args.warmup:
+                        await _run_scenario(client, method, make, data, min(args.warmup, n), args.concurrency, sql)
+                    results[f"{method} {path}"] = await _run_scenario(
+                        client, method, make, data, n, args.concurrency, sql)
+        return results
+
+    results = asyncio.run(run())
+
+    print(f"\n{'rota':<52} {'istek/sn':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'SQL/istek':>9} {'hata':>5}")
+    for route, r in results.items():
+        print(f"{route:<52} {r['rps']:>9.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+              f"{r['sql_per_request']:>9.2f} {r['errors']:>5}")
+
+    meta = {
+        "users": args.users, "songs": args.songs, "requests": args.requests, "concurrency": args.concurrency,
+        "seed": args.seed, "response_cache": not args.no_response_cache,
+        "encoder": os.environ["MOOD_ENCODER_BACKEND"],
+        "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+    }
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "routes": results}, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Baseline kaydedildi: {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        changed = {k: (v, meta.get(k)) for k, v in baseline.get("meta", {}).items() if meta.get(k) != v}
+        if changed:
+            print(f"\n⚠️ Baseline farklı koşullarda ölçülmüş: {changed}")
+        regressions = compare(results, baseline, args.threshold, args.sql_threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} metrik eşiği aştı:")
+            for route, metric, before, after in regressions:
+                print(f"   {route:<52} {metric:<16} {before} -> {after}")
+            sys.exit(1)
+        print(f"\n✅ Baseline'a göre regresyon yok (eşik %{int(args.threshold * 100)}).")
+
+
+if __name__ == "__main__":
+    main()
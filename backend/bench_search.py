@@ -0,0 +1,101 @@
+"""
+FTS5 arama/otomatik tamamlama gecikme benchmark'ı (sentetik katalog).
+
+Kullanım:
+    python bench_search.py [--songs 2000000] [--queries 200]
+
+Geçici bir veritabanı dosyası kullanır; muzik_app.db'ye dokunmaz.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+import song_search
+
+SYLLABLES = ["ka", "ra", "se", "vi", "lo", "ne", "mu", "zi", "ta", "ay", "gö", "şa", "ım", "ol", "de", "ri"]
+GENRES = ["Pop", "Rock", "Jazz", "Rap", "Arabesk", "Elektronik", "Klasik", "Türk Halk"]
+THEMES = ["Aşk", "Hüzün", "Enerji", "Huzur", "Özlem", "Parti"]
+
+
+def _word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def _prepare(engine, n_songs: int, rng):
+    vocab = [_word(rng) for _ in range(50000)]
+    artists = [f"{_word(rng).title()} {_word(rng).title()}" for _ in range(20000)]
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE songs (id INTEGER PRIMARY KEY, title VARCHAR, artist VARCHAR, "
+                          "genre VARCHAR, theme VARCHAR, url VARCHAR)"))
+        batch = []
+        for i in range(1, n_songs + 1):
+            batch.append({
+                "id": i,
+                "title": " ".join(rng.choice(vocab) for _ in range(rng.randint(1, 4))).title(),
+                "artist": rng.choice(artists),
+                "genre": rng.choice(GENRES),
+                "theme": rng.choice(THEMES),
+            })
+            if len(batch) == 50000:
+                conn.execute(text("INSERT INTO songs (id, title, artist, genre, theme) "
+                                  "VALUES (:id, :title, :artist, :genre, :theme)"), batch)
+                batch = []
+        if batch:
+            conn.execute(text("INSERT INTO songs (id, title, artist, genre, theme) "
+                              "VALUES (:id, :title, :artist, :genre, :theme)"), batch)
+    return vocab, artists
+
+
+def _timed(fn, queries):
+    times = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        times.append((time.perf_counter() - start) * 1000)
+    return np.percentile(times, 50), np.percentile(times, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FTS5 arama benchmark'ı")
+    parser.add_argument("--songs", type=int, default=2_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'search.db')}")
+        start = time.perf_counter()
+        vocab, artists = _prepare(engine, args.songs, rng)
+        print(f"📥 {args.songs} şarkı yazıldı ({time.perf_counter() - start:.1f} sn)")
+
+        start = time.perf_counter()
+        song_search.ensure_search_index(engine)
+        print(f"🔎 FTS5 indeksi kuruldu ({time.perf_counter() - start:.1f} sn)")
+
+        word_queries = [rng.choice(vocab) for _ in range(args.queries)]
+        two_word = [f"{rng.choice(vocab)} {rng.choice(GENRES)}" for _ in range(args.queries)]
+        artist_queries = [rng.choice(artists) for _ in range(args.queries)]
+        prefixes = [rng.choice(vocab)[:rng.randint(1, 4)] for _ in range(args.queries)]
+
+        with Session(engine) as db:
+            cases = {
+                "arama (1 kelime)": (lambda q: song_search.search_songs(db, q), word_queries),
+                "arama (kelime + tür)": (lambda q: song_search.search_songs(db, q), two_word),
+                "arama (sanatçı)": (lambda q: song_search.search_songs(db, q), artist_queries),
+                "autocomplete (1-4 harf)": (lambda q: song_search.autocomplete(db, q), prefixes),
+            }
+            print(f"{'sorgu':>26} {'p50 ms':>8} {'p99 ms':>8}")
+            for name, (fn, queries) in cases.items():
+                p50, p99 = _timed(fn, queries)
+                print(f"{name:>26} {p50:>8.2f} {p99:>8.2f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Kayıt (signup) dalgası sırasında ucuz okuma isteklerinin gecikmesi.
+
+Çalışan bir sunucuya N eşzamanlı POST /users/ (bcrypt) gönderirken aynı anda
+GET / ve GET /content/questions gecikmelerini ölçer.
+
+Kullanım:
+    uvicorn main:app --port 8000          (ayrı terminalde)
+    python bench_signup_burst.py [--url http://127.0.0.1:8000] [--signups 200]
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+import numpy as np
+
+
+async def _probe(client, path, stop, latencies):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get(path)
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.01)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Signup dalgası altında okuma gecikmesi")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--signups", type=int, default=200)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.signups + 10)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=120) as client:
+        stop = asyncio.Event()
+        home, questions = [], []
+        probes = [
+            asyncio.create_task(_probe(client, "/", stop, home)),
+            asyncio.create_task(_probe(client, "/content/questions", stop, questions)),
+        ]
+
+        run_id = uuid.uuid4().hex[:8]
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.post("/users/", json={"username": f"bench_{run_id}_{i}",
+                                         "email": f"bench_{run_id}_{i}@ornek.com", "password": "sifre123"})
+            for i in range(args.signups)
+        ))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await asyncio.gather(*probes)
+
+    ok = sum(r.status_code == 200 for r in responses)
+    print(f"📊 {ok}/{args.signups} kayıt {elapsed:.1f} sn ({ok / elapsed:.0f} kayıt/sn)")
+    for name, values in (("GET /", home), ("GET /content/questions", questions)):
+        if values:
+            print(f"{name:>24}: p50 {np.percentile(values, 50):7.1f} ms  "
+                  f"p99 {np.percentile(values, 99):7.1f} ms  max {max(values):7.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
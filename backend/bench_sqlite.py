@@ -0,0 +1,125 @@
+"""
+Çok thread'li okuma/yazma benchmark'ı: varsayılan SQLite ayarları vs. üretim profili
+(WAL + PRAGMA'lar + bağlantı havuzu, bkz. database.py).
+
+Kullanım:
+    python bench_sqlite.py [--writers 4] [--readers 8] [--seconds 10]
+
+Geçici bir veritabanı dosyası kullanır; muzik_app.db'ye dokunmaz.
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from database import SQLITE_PRAGMAS, create_sqlite_engine, read_only_url
+
+SCHEMA = [
+    "CREATE TABLE playlists (id INTEGER PRIMARY KEY, user_id INTEGER, name VARCHAR, is_favorite BOOLEAN)",
+    "CREATE TABLE playlist_items (id INTEGER PRIMARY KEY, playlist_id INTEGER, song_id INTEGER, added_at DATETIME)",
+    "CREATE INDEX ix_items_playlist ON playlist_items (playlist_id, song_id)",
+]
+
+
+def _prepare(path: str, n_playlists: int = 200):
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        for stmt in SCHEMA:
+            conn.execute(text(stmt))
+        conn.execute(
+            text("INSERT INTO playlists (id, user_id, name, is_favorite) VALUES (:id, :u, 'p', 0)"),
+            [{"id": i, "u": i % 50} for i in range(1, n_playlists + 1)],
+        )
+    engine.dispose()
+
+
+def _run(write_engine, read_engine, writers: int, readers: int, seconds: float):
+    stop = time.perf_counter() + seconds
+    counts = {"write": 0, "read": 0, "locked": 0}
+    lock = threading.Lock()
+
+    def writer():
+        rng = random.Random()
+        while time.perf_counter() < stop:
+            try:
+                # Playlist'e şarkı ekleme benzeri küçük yazma işlemi
+                with write_engine.begin() as conn:
+                    conn.execute(
+                        text("INSERT INTO playlist_items (playlist_id, song_id, added_at) "
+                             "VALUES (:p, :s, CURRENT_TIMESTAMP)"),
+                        {"p": rng.randint(1, 200), "s": rng.randint(1, 100000)},
+                    )
+                key = "write"
+            except OperationalError:
+                key = "locked"  # "database is locked"
+            with lock:
+                counts[key] += 1
+
+    def reader():
+        rng = random.Random()
+        while time.perf_counter() < stop:
+            try:
+                with read_engine.connect() as conn:
+                    conn.execute(
+                        text("SELECT song_id, added_at FROM playlist_items WHERE playlist_id = :p "
+                             "ORDER BY added_at DESC LIMIT 50"),
+                        {"p": rng.randint(1, 200)},
+                    ).fetchall()
+                key = "read"
+            except OperationalError:
+                key = "locked"
+            with lock:
+                counts[key] += 1
+
+    threads = [threading.Thread(target=writer) for _ in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {k: v / seconds for k, v in counts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite eşzamanlılık benchmark'ı")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    def default_profile(path):
+        # Eski database.py: rollback journal, sqlite3 varsayılan 5 sn bekleme, okuma/yazma aynı motor
+        engine = create_sqlite_engine(
+            f"sqlite:///{path}", pragmas={"journal_mode": "DELETE", "synchronous": "FULL", "busy_timeout": 5000}
+        )
+        return engine, engine
+
+    def production_profile(path):
+        # Yeni database.py: WAL + PRAGMA'lar + ayrı salt-okunur havuz
+        return (
+            create_sqlite_engine(f"sqlite:///{path}", pragmas=SQLITE_PRAGMAS),
+            create_sqlite_engine(read_only_url(f"sqlite:///{path}"), read_only=True, pragmas=SQLITE_PRAGMAS),
+        )
+
+    profiles = {"varsayılan": default_profile, "üretim": production_profile}
+
+    print(f"📊 {args.writers} yazıcı, {args.readers} okuyucu thread, {args.seconds:.0f} sn")
+    print(f"{'profil':>12} {'yazma/sn':>10} {'okuma/sn':>10} {'kilit hatası/sn':>16}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, factory in profiles.items():
+            path = os.path.join(tmp, f"{name}.db")
+            _prepare(path)
+            write_engine, read_engine = factory(path)
+            result = _run(write_engine, read_engine, args.writers, args.readers, args.seconds)
+            write_engine.dispose()
+            read_engine.dispose()
+            print(f"{name:>12} {result['write']:>10.0f} {result['read']:>10.0f} {result['locked']:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
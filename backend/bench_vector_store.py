@@ -0,0 +1,91 @@
+"""
+Paylaşılan vektör deposu (vector_store.py) için çok süreçli bellek benchmark'ı.
+
+Kullanım:
+    python bench_vector_store.py                          -> 100k x 384 sentetik depo, 1/2/4 worker
+    python bench_vector_store.py --n 500000 --workers 1 2 4 8
+
+Her worker sayısı için iki düzen karşılaştırılır:
+    shared  -> worker'lar depoyu np.memmap ile salt-okunur map eder (sayfa önbelleği paylaşılır)
+    private -> her worker matrisi kendi belleğine kopyalar (UserVectorIndex gibi)
+Worker başına PSS (paylaşılan sayfalar süreçlere bölünmüş) ve toplam, ayrıca
+açılış süresi (map / kopyalama) yazdırılır. PSS /proc/self/smaps_rollup'tan
+okunur; sadece Linux'ta çalışır.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+import vector_store
+
+WORKER = r"""
+import sys, time
+import numpy as np
+import vector_store
+
+path, mode = sys.argv[1], sys.argv[2]
+start = time.perf_counter()
+store = vector_store.VectorStore(path)
+count = store.refresh()[0]
+matrix = store.matrix[:count] if mode == "shared" else np.array(store.matrix[:count])
+open_ms = (time.perf_counter() - start) * 1000
+query = np.ones(matrix.shape[1], dtype=np.float32)
+for _ in range(3):
+    int((matrix @ query).argmax())  # Tüm sayfalara dokun
+pss = next(int(line.split()[1]) for line in open("/proc/self/smaps_rollup") if line.startswith("Pss:"))
+print(f"{open_ms:.1f} {pss}", flush=True)
+sys.stdin.read()  # Diğer worker'lar ölçene kadar eşlemeyi açık tut
+"""
+
+
+def build_store(path: str, n: int, dim: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+
+    def chunks():
+        for start in range(0, n, 10_000):
+            vectors = rng.standard_normal((min(10_000, n - start), dim)).astype(np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            yield np.arange(start, start + len(vectors), dtype=np.int64), vectors
+
+    vector_store.VectorStore(path).build(dim, n, chunks, force=True)
+
+
+def measure(path: str, mode: str, workers: int):
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    procs = [
+        subprocess.Popen([sys.executable, "-c", WORKER, path, mode], stdin=subprocess.PIPE,
+                         stdout=subprocess.PIPE, text=True, env=env)
+        for _ in range(workers)
+    ]
+    results = [p.stdout.readline().split() for p in procs]
+    for p in procs:
+        p.communicate("")
+    open_ms = [float(r[0]) for r in results]
+    pss_mb = [int(r[1]) / 1024 for r in results]
+    return float(np.mean(open_ms)), float(np.mean(pss_mb)), float(np.sum(pss_mb))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paylaşılan mmap vektör deposu bellek benchmark'ı")
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "user_vectors.bin")
+        build_store(path, args.n, args.dim)
+        print(f"📊 N={args.n}, dim={args.dim}, dosya {os.path.getsize(path) / 2**20:.1f} MB\n")
+        print(f"{'mod':>8} {'worker':>7} {'açılış ms':>10} {'PSS/worker MB':>14} {'toplam MB':>10}")
+        for workers in args.workers:
+            for mode in ("shared", "private"):
+                open_ms, pss, total = measure(path, mode, workers)
+                print(f"{mode:>8} {workers:>7} {open_ms:>10.1f} {pss:>14.1f} {total:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
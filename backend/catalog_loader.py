@@ -0,0 +1,154 @@
+"""
+Şarkı kataloğu yükleyicisi (sunucu başlangıcından bağımsız komut).
+
+CSV dosyası sabit boyutlu parçalar (chunk) halinde okunur, her parça Core
+executemany ile yazılır. Mevcut şarkılar bellekte tüm katalog olarak değil,
+parça başına title indeksinden (title IN (...)) aranır; bellek kullanımı
+katalog boyutundan bağımsızdır. Tekrar çalıştırıldığında (title, artist)
+eşleşen şarkıların tür/tema bilgisi değiştiyse güncellenir (upsert), yeni
+şarkılar eklenir. Güncellenen şarkıların vektörleri bir sonraki
+song_embeddings build'inde (metin özeti değiştiği için) yeniden kodlanır.
+
+Kullanım:
+    python catalog_loader.py [csv_dosyası]
+"""
+import ast
+import csv
+import os
+import re
+import sys
+
+from sqlalchemy import bindparam, insert, select, update
+
+import models
+from database import engine
+from song_search import ensure_search_index
+
+# Senin verdiğin dosya yolu
+DEFAULT_CSV_PATHS = [
+    r"C:\Users\Beliz\Desktop\music_project\backend\songs_labeled_FINAL_EN_TR_THEME_TFIDF_v2.csv",
+    # Alternatif: Dosya proje klasöründeyse sadece ismi
+    "songs_labeled_FINAL_EN_TR_THEME_TFIDF_v2.csv",
+]
+CHUNK_SIZE = 5000
+LOOKUP_CHUNK = 500  # title IN (...) sorgusu başına başlık sayısı
+
+# "['A', "B's"]" içindeki tırnaklı parçalar
+_QUOTED = re.compile(r"'((?:[^'\\]|\\.)*)'|\"((?:[^\"\\]|\\.)*)\"")
+
+
+def parse_artists(artist_raw: str) -> str:
+    """
+    Sanatçı İsmi Temizliği (['Artist1', 'Artist2'] -> Artist1, Artist2).
+    Hızlı yol regex; sadece kaçış karakteri (\\) varsa literal_eval'e düşer.
+    """
+    if not artist_raw:
+        return "Bilinmiyor"
+    text = artist_raw.strip()
+    if not (text.startswith("[") and text.endswith("]")):
+        return text
+    if "\\" in text:
+        try:
+            return ", ".join(ast.literal_eval(text))
+        except (ValueError, SyntaxError):
+            return text
+    parts = [single or double for single, double in _QUOTED.findall(text)]
+    return ", ".join(parts) if parts else text
+
+
+def _row_to_song(row: dict) -> dict:
+    # Sütun Eşleştirme (CSV başlıkları: name, artists, genre, THEME / emotion_final_adjusted)
+    return {
+        "title": row.get("name") or "İsimsiz",
+        "artist": parse_artists(row.get("artists", "Bilinmiyor")),
+        "genre": row.get("genre") or "Genel",
+        "theme": row.get("THEME") or row.get("emotion_final_adjusted") or None,  # Hangi sütun varsa
+    }
+
+
+def _existing_songs(conn, titles):
+    """Verilen başlıklardaki mevcut şarkılar: (title, artist) -> (id, genre, theme); düz tuple."""
+    existing = {}
+    for start in range(0, len(titles), LOOKUP_CHUNK):
+        result = conn.execute(
+            select(models.Song.id, models.Song.title, models.Song.artist, models.Song.genre, models.Song.theme)
+            .where(models.Song.title.in_(titles[start:start + LOOKUP_CHUNK]))
+            .order_by(models.Song.id)
+        )
+        for song_id, title, artist, genre, theme in result:
+            existing.setdefault((title, artist), (song_id, genre, theme))
+    return existing
+
+
+def _flush(conn, to_insert, to_update):
+    if to_insert:
+        conn.execute(insert(models.Song), to_insert)
+    if to_update:
+        conn.execute(
+            update(models.Song)
+            .where(models.Song.id == bindparam("b_id"))
+            .values(genre=bindparam("b_genre"), theme=bindparam("b_theme")),
+            to_update,
+        )
+
+
+def _load_chunk(rows):
+    """
+    Bir CSV parçasını tek transaction'da yazar. Önceki parçalar commit edildiği
+    için CSV içindeki tekrarlar da bir sonraki parçanın aramasında görülür.
+    Döner: (eklenen, güncellenen, değişmeyen)
+    """
+    songs = [_row_to_song(row) for row in rows]
+    to_insert, to_update = [], []
+    unchanged = 0
+    with engine.begin() as conn:
+        existing = _existing_songs(conn, list(dict.fromkeys(song["title"] for song in songs)))
+        for song in songs:
+            key = (song["title"], song["artist"])
+            current = existing.get(key)
+
+            if current is None:
+                to_insert.append(song)
+                existing[key] = (None, song["genre"], song["theme"])  # Parça içi tekrarları engelle
+            elif current[0] is not None and (current[1], current[2]) != (song["genre"], song["theme"]):
+                to_update.append({"b_id": current[0], "b_genre": song["genre"], "b_theme": song["theme"]})
+                existing[key] = (current[0], song["genre"], song["theme"])
+            else:
+                unchanged += 1
+        _flush(conn, to_insert, to_update)
+    return len(to_insert), len(to_update), unchanged
+
+
+def load_catalog(csv_path: str = None, chunk_size: int = CHUNK_SIZE):
+    if csv_path is None:
+        csv_path = next((p for p in DEFAULT_CSV_PATHS if os.path.exists(p)), DEFAULT_CSV_PATHS[-1])
+    if not os.path.exists(csv_path):
+        print(f"❌ HATA: Dosya bulunamadı -> {csv_path}")
+        return
+
+    models.Base.metadata.create_all(bind=engine)
+    ensure_search_index(engine)  # Eklenen şarkılar tetikleyicilerle aranabilir olur
+    print(f"📂 CSV Okunuyor: {csv_path}")
+
+    totals = [0, 0, 0]  # eklenen, güncellenen, değişmeyen
+    rows = []
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            rows.append(row)
+            if len(rows) >= chunk_size:
+                totals = [t + c for t, c in zip(totals, _load_chunk(rows))]
+                rows = []
+                print(f"   ... {totals[0]} eklendi, {totals[1]} güncellendi")
+    if rows:
+        totals = [t + c for t, c in zip(totals, _load_chunk(rows))]
+    inserted, updated, unchanged = totals
+
+    print("\n----------------KATALOG RAPORU----------------")
+    print(f"✅ Eklenen:     {inserted}")
+    print(f"🔁 Güncellenen: {updated}")
+    print(f"➖ Değişmeyen:  {unchanged}")
+    print("----------------------------------------------")
+
+
+if __name__ == "__main__":
+    load_catalog(sys.argv[1] if len(sys.argv) > 1 else None)
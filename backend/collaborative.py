@@ -0,0 +1,387 @@
+"""
+Item-item collaborative filtering (ListeningHistory + PlaylistItem).
+
+- Kullanıcı x şarkı etkileşim matrisi scipy.sparse CSR olarak kurulur (ikili: dinledi/ekledi).
+- Şarkı-şarkı birlikte görülme (co-occurrence) matrisi C = X^T X hesaplanır,
+  kosinüs benzerliği C_ij / sqrt(n_i * n_j) ile her şarkı için en iyi N komşu saklanır.
+- "Bunu dinlediğin için" önerisi = kullanıcının şarkılarının komşu satırlarının birleşimi.
+  İstek başına tablo taraması yoktur.
+- Yeni etkileşimler add_interaction ile artımlı işlenir: sadece etkilenen
+  şarkıların komşu satırları (tembel olarak) yeniden hesaplanır.
+- Silmeler (playlistten çıkarma, playlist silme) sync_user ile kullanıcının
+  veritabanındaki güncel şarkı kümesine göre negatif delta olarak işlenir.
+- Başka süreçlerin yazdıkları (import_data gibi) bu sürecin haberi olmadan
+  gelir; model CF_REBUILD_SECONDS'ta bir arka planda baştan kurulur.
+"""
+import os
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+import scipy.sparse as sp
+from sqlalchemy.orm import Session
+
+import models
+
+NEIGHBORS_PER_ITEM = 50       # Her şarkı için saklanan komşu sayısı
+COMPACT_THRESHOLD = 100_000   # Delta bu kadar farklı hücreye ulaşınca ana matrise katılır
+CF_REBUILD_SECONDS = float(os.getenv("CF_REBUILD_SECONDS", "3600"))  # 0 = periyodik kurulum kapalı
+
+
+class ItemCFEngine:
+
+    def __init__(self, neighbors_per_item: int = NEIGHBORS_PER_ITEM):
+        self.n_neighbors = neighbors_per_item
+        self._lock = threading.RLock()
+        self.built = False
+        self.built_at = 0.0
+        self._rebuilding = False
+        self._touched = None          # Arka plan kurulumu sürerken değişen kullanıcılar
+        self._reset()
+
+    def _reset(self):
+        self.item_ids = []            # sütun no -> song_id
+        self.item_pos = {}            # song_id -> sütun no
+        self.user_items = {}          # user_id -> set(sütun no)
+        self.base_cooc = sp.csr_matrix((0, 0), dtype=np.float32)
+        self.base_counts = np.zeros(0, dtype=np.float32)
+        self.delta = defaultdict(lambda: defaultdict(float))  # artımlı co-occurrence
+        self.count_delta = defaultdict(float)
+        self.delta_size = 0
+        self.neighbors = {}           # sütun no -> (komşu sütunlar, benzerlikler)
+        self.dirty = set()
+
+    # --- KURULUM ---
+
+    # Arka plan kurulumunda yeni motordan devralınan alanlar
+    _STATE = ("item_ids", "item_pos", "user_items", "base_cooc", "base_counts",
+              "delta", "count_delta", "delta_size", "neighbors", "dirty")
+
+    @staticmethod
+    def _load_interactions(db: Session):
+        # İki tablo, iki sorgu: dinleme geçmişi + playlistlerdeki şarkılar
+        history = db.query(models.ListeningHistory.user_id, models.ListeningHistory.song_id).all()
+        playlist_items = (
+            db.query(models.Playlist.user_id, models.PlaylistItem.song_id)
+            .join(models.PlaylistItem, models.PlaylistItem.playlist_id == models.Playlist.id)
+            .all()
+        )
+        return [(u, s) for u, s in history + playlist_items if u is not None and s is not None]
+
+    @staticmethod
+    def _load_user_songs(db: Session, user_id: int):
+        """Tek kullanıcının güncel şarkı kümesi (dinleme geçmişi + playlistler)."""
+        history = db.query(models.ListeningHistory.song_id).filter(models.ListeningHistory.user_id == user_id)
+        playlist_items = (
+            db.query(models.PlaylistItem.song_id)
+            .join(models.Playlist, models.PlaylistItem.playlist_id == models.Playlist.id)
+            .filter(models.Playlist.user_id == user_id)
+        )
+        return {s for (s,) in history.all() + playlist_items.all() if s is not None}
+
+    def build(self, db: Session):
+        """Etkileşim matrisini ve komşu tablosunu baştan kurar."""
+        pairs = self._load_interactions(db)
+
+        with self._lock:
+            self._reset()
+            if not pairs:
+                self.built = True
+                self.built_at = time.monotonic()
+                return
+
+            users = np.array([u for u, _ in pairs], dtype=np.int64)
+            songs = np.array([s for _, s in pairs], dtype=np.int64)
+            user_ids, user_rows = np.unique(users, return_inverse=True)
+            item_ids, item_cols = np.unique(songs, return_inverse=True)
+
+            # Kullanıcı x şarkı (ikili) CSR matrisi; tekrarlar 1'e indirilir
+            X = sp.csr_matrix(
+                (np.ones(len(pairs), dtype=np.float32), (user_rows, item_cols)),
+                shape=(len(user_ids), len(item_ids)),
+            )
+            X.sum_duplicates()
+            X.data[:] = 1.0
+
+            self.item_ids = item_ids.tolist()
+            self.item_pos = {int(s): i for i, s in enumerate(item_ids)}
+            for row, user_id in enumerate(user_ids):
+                self.user_items[int(user_id)] = set(X.indices[X.indptr[row]:X.indptr[row + 1]].tolist())
+
+            self.base_cooc = (X.T @ X).tocsr().astype(np.float32)
+            self.base_counts = self.base_cooc.diagonal().astype(np.float32)
+            self.dirty = set(range(len(item_ids)))
+            self._refresh_dirty()
+            self.built = True
+            self.built_at = time.monotonic()
+
+        print(f"🤝 CF modeli kuruldu: {len(user_ids)} kullanıcı, {len(item_ids)} şarkı, {len(pairs)} etkileşim")
+
+    def ensure_built(self, db: Session):
+        if not self.built:
+            with self._lock:
+                if not self.built:
+                    self.build(db)
+        elif CF_REBUILD_SECONDS and time.monotonic() - self.built_at > CF_REBUILD_SECONDS:
+            self._rebuild_in_background()
+
+    def _rebuild_in_background(self):
+        """Modeli yeni bir motorda kurar ve hazır olunca devralır; istekler eski modelle sürer."""
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+            self._touched = set()
+
+        def run():
+            from database import SessionLocal
+            try:
+                fresh = ItemCFEngine(self.n_neighbors)
+                with SessionLocal() as db:
+                    fresh.build(db)
+                with self._lock:
+                    for name in self._STATE:
+                        setattr(self, name, getattr(fresh, name))
+                    self.built_at = fresh.built_at
+                    touched, self._touched = self._touched, None
+                # Kurulum okunduktan sonra değişen kullanıcıları yeni modele yeniden uygula
+                if touched:
+                    with SessionLocal() as db:
+                        for user_id in touched:
+                            self.sync_user(db, user_id)
+            except Exception as e:
+                print(f"⚠️ CF modeli yeniden kurulamadı: {e}")
+                with self._lock:
+                    self.built_at = time.monotonic()  # Bir sonraki deneme periyot sonunda
+            finally:
+                with self._lock:
+                    self._rebuilding = False
+                    self._touched = None
+
+        threading.Thread(target=run, daemon=True, name="cf-rebuild").start()
+
+    # --- KOMŞU HESABI ---
+
+    def _counts(self, cols):
+        """Şarkıların toplam etkileşim sayıları (ana matris köşegeni + delta)."""
+        cols = np.asarray(cols, dtype=np.int64)
+        counts = np.zeros(len(cols), dtype=np.float32)
+        in_base = cols < len(self.base_counts)
+        counts[in_base] = self.base_counts[cols[in_base]]
+        if self.count_delta:
+            counts += np.array([self.count_delta.get(int(c), 0.0) for c in cols], dtype=np.float32)
+        return counts
+
+    def _row_cooc(self, col: int):
+        """Bir şarkının co-occurrence satırı = ana CSR satırı + artımlı delta."""
+        if col < self.base_cooc.shape[0]:
+            start, end = self.base_cooc.indptr[col], self.base_cooc.indptr[col + 1]
+            cols = self.base_cooc.indices[start:end]
+            values = self.base_cooc.data[start:end]
+        else:
+            cols = np.zeros(0, dtype=np.int32)
+            values = np.zeros(0, dtype=np.float32)
+
+        extra = self.delta.get(col)
+        if extra:
+            cols = np.concatenate([cols, np.fromiter(extra.keys(), dtype=np.int64, count=len(extra))])
+            values = np.concatenate([values, np.fromiter(extra.values(), dtype=np.float32, count=len(extra))])
+            cols, inverse = np.unique(cols, return_inverse=True)
+            values = np.bincount(inverse, weights=values).astype(np.float32)
+        return cols.astype(np.int64), values
+
+    def _recompute(self, col: int):
+        cols, co = self._row_cooc(col)
+        keep = cols != col
+        cols, co = cols[keep], co[keep]
+        if len(cols) == 0:
+            self.neighbors[col] = (cols, co)
+            return
+
+        # Silmeler sonrası sıfıra inen hücreler komşu sayılmaz
+        keep = co > 0
+        cols, co = cols[keep], co[keep]
+        if len(cols) == 0:
+            self.neighbors[col] = (cols, co)
+            return
+
+        sims = co / np.sqrt(self._counts([col])[0] * self._counts(cols))
+        if len(sims) > self.n_neighbors:
+            top = np.argpartition(-sims, self.n_neighbors - 1)[:self.n_neighbors]
+            cols, sims = cols[top], sims[top]
+        self.neighbors[col] = (cols, sims.astype(np.float32))
+
+    def _refresh_dirty(self):
+        for col in self.dirty:
+            self._recompute(col)
+        self.dirty.clear()
+
+    # --- ARTIMLI GÜNCELLEME ---
+
+    def _bump(self, a: int, b: int, value: float):
+        row = self.delta[a]
+        if b not in row:
+            self.delta_size += 1  # Eşiği çift sayısı değil, delta'daki farklı hücreler belirler
+        row[b] += value
+
+    def _column(self, song_id: int) -> int:
+        col = self.item_pos.get(song_id)
+        if col is None:
+            col = len(self.item_ids)
+            self.item_ids.append(song_id)
+            self.item_pos[song_id] = col
+        return col
+
+    def _apply(self, user_id: int, added, removed):
+        """Kullanıcının şarkı kümesindeki eklemeleri/çıkarmaları delta'ya işler (kilit altında)."""
+        items = self.user_items.setdefault(user_id, set())
+        changed = False
+        for col in removed:
+            if col not in items:
+                continue
+            items.discard(col)
+            # Şarkı kullanıcının kalan şarkılarıyla artık birlikte görülmüyor
+            for other in items:
+                self._bump(col, other, -1.0)
+                self._bump(other, col, -1.0)
+            self.count_delta[col] -= 1.0
+            self.dirty.add(col)
+            changed = True
+        for col in added:
+            if col in items:
+                continue
+            # Yeni şarkı kullanıcının diğer tüm şarkılarıyla birlikte görülmüş olur
+            for other in items:
+                self._bump(col, other, 1.0)
+                self._bump(other, col, 1.0)
+            self.count_delta[col] += 1.0
+            items.add(col)
+            self.dirty.add(col)
+            changed = True
+        if not items:
+            self.user_items.pop(user_id, None)
+        if not changed:
+            return
+
+        # Sadece bu kullanıcının şarkılarının satırları değişti. (Değişen şarkının
+        # sayacı kaydığı için diğer komşuların skorları da çok az kayar;
+        # bu fark bir sonraki compact/build'de düzelir.)
+        self.dirty.update(items)
+        if self._touched is not None:
+            self._touched.add(user_id)
+        if self.delta_size >= COMPACT_THRESHOLD:
+            self.compact()
+
+    def add_interaction(self, user_id: int, song_id: int):
+        """Yeni dinleme / playlist eklemesi. Tam yeniden kurulum gerektirmez."""
+        with self._lock:
+            if not self.built:
+                return  # İlk build zaten veritabanından okuyacak
+            self._apply(user_id, [self._column(song_id)], ())
+
+    def sync_user(self, db: Session, user_id: int, songs=None):
+        """
+        Kullanıcının şarkı kümesini veritabanıyla eşitler (silmelerden sonra çağrılır).
+        Etkileşim ikilidir: playlistten çıkarılan şarkı geçmişte ya da başka bir
+        playlistte duruyorsa etkileşim sürer, bu yüzden fark güncel kümeden alınır.
+        songs: çağıran zaten okuduysa kullanıcının şarkı kümesi.
+        """
+        if not self.built:
+            return
+        if songs is None:
+            songs = self._load_user_songs(db, user_id)
+
+        with self._lock:
+            current = self.user_items.get(user_id, set())
+            actual = {self._column(s) for s in songs}
+            self._apply(user_id, actual - current, current - actual)
+
+    def compact(self):
+        """Artımlı delta'yı ana CSR matrisine katar."""
+        with self._lock:
+            n = len(self.item_ids)
+            rows, cols, values = [], [], []
+            for row, extra in self.delta.items():
+                for col, value in extra.items():
+                    rows.append(row)
+                    cols.append(col)
+                    values.append(value)
+            for col, value in self.count_delta.items():
+                rows.append(col)
+                cols.append(col)
+                values.append(value)
+
+            base = self.base_cooc
+            if base.shape[0] < n:
+                base = sp.csr_matrix((base.data, base.indices, np.concatenate(
+                    [base.indptr, np.full(n - base.shape[0], base.indptr[-1])]
+                )), shape=(n, n))
+            delta = sp.csr_matrix((np.array(values, dtype=np.float32), (rows, cols)), shape=(n, n))
+            self.base_cooc = (base + delta).tocsr()
+            self.base_cooc.eliminate_zeros()  # Silmelerle sıfırlanan hücreler
+            self.base_counts = self.base_cooc.diagonal().astype(np.float32)
+            self.delta.clear()
+            self.count_delta.clear()
+            self.delta_size = 0
+
+    # --- SERVİS ---
+
+    def recommend(self, user_id: int, top_k: int = 10):
+        """
+        Kullanıcının şarkılarının komşu satırlarını birleştirip skorlar.
+        Sonuç: [(song_id, score, because_song_id), ...]
+        """
+        if top_k <= 0:
+            return []
+        with self._lock:
+            seeds = self.user_items.get(user_id)
+            if not seeds:
+                return []
+            seed_cols = np.fromiter(seeds, dtype=np.int64, count=len(seeds))
+
+            parts_cols, parts_sims, parts_seeds = [], [], []
+            for seed in seed_cols.tolist():
+                if seed in self.dirty or seed not in self.neighbors:
+                    self._recompute(seed)
+                    self.dirty.discard(seed)
+                cols, sims = self.neighbors[seed]
+                if len(cols):
+                    parts_cols.append(cols)
+                    parts_sims.append(sims)
+                    parts_seeds.append(np.full(len(cols), seed, dtype=np.int64))
+            item_ids = self.item_ids
+
+        if not parts_cols:
+            return []
+
+        cols = np.concatenate(parts_cols)
+        sims = np.concatenate(parts_sims)
+        seed_of = np.concatenate(parts_seeds)
+
+        # Kullanıcının zaten sahip olduğu şarkıları çıkar
+        keep = ~np.isin(cols, seed_cols)
+        cols, sims, seed_of = cols[keep], sims[keep], seed_of[keep]
+        if len(cols) == 0:
+            return []
+
+        # Aday başına toplam skor + en çok katkı veren şarkı ("bunu dinlediğin için")
+        candidates, inverse = np.unique(cols, return_inverse=True)
+        scores = np.bincount(inverse, weights=sims)
+        order = np.lexsort((-sims, inverse))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = inverse[order][1:] != inverse[order][:-1]
+        because = np.empty(len(candidates), dtype=np.int64)
+        because[inverse[order][first]] = seed_of[order][first]
+
+        k = min(top_k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (int(item_ids[candidates[i]]), float(scores[i]), int(item_ids[because[i]]))
+            for i in top
+        ]
+
+
+# Süreç çapında tek CF motoru
+cf_engine = ItemCFEngine()
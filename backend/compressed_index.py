@@ -0,0 +1,136 @@
+"""
+Sıkıştırılmış vektör katmanı: PCA izdüşümü + vektör başına int8 quantization.
+
+384 boyutlu float32 bir profil vektörü 1536 bayttır. Burada her vektör:
+  1) eğitilmiş PCA ile COMPRESSED_DIM boyuta izdüşürülür (varsayılan 64),
+  2) vektör başına tek bir ölçekle (scale = max|y| / 127) int8'e çevrilir.
+Kod başına maliyet ~ COMPRESSED_DIM + 8 bayt (64 boyutta 72 bayt, float32'den ~21x
+küçük). İndeksin satır başı kayıtları (user_id, kullanıcı adı, sözlük) buna dahil
+değildir ve toplamın büyük kısmını oluşturur; gerçek oran için bkz.
+UserVectorIndex.memory_footprint (total_ratio).
+
+Skor (normalize vektörler için kosinüs = iç çarpım):
+    x·q = (x-m)·(q-m) + m·x + (q·m - m·m)
+        ≈ scale_x * (code_x · P(q-m)) + bias_x        (bias_x = m·x saklanır)
+Son terim sorgu için sabit olduğundan sıralamayı değiştirmez ve atlanır.
+
+Arama iki aşamalıdır: tüm kodlar üzerinde yaklaşık skor ile top_k * rerank aday
+seçilir, sonra sadece bu adayların tam vektörleriyle kesin skor hesaplanır
+(bkz. vector_index.UserVectorIndex, SIMILARITY_BACKEND="compressed").
+"""
+import os
+
+import numpy as np
+
+COMPRESSED_DIM = int(os.getenv("COMPRESSED_DIM", "64"))
+COMPRESSED_RERANK = int(os.getenv("COMPRESSED_RERANK", "20"))  # top_k * bu kadar aday kesin skorla sıralanır
+PCA_FIT_SAMPLE = 50_000   # PCA bu kadar vektörlük örnek üzerinde eğitilir
+SCORE_BLOCK = 65_536      # Yaklaşık skorlar bu kadar satırlık bloklarla (geçici float32 bellek sınırı)
+
+
+class PCAProjection:
+    """Ortalama + ilk `dim` temel bileşen (SVD ile)."""
+
+    def __init__(self, mean, components):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)  # (dim, D)
+
+    @property
+    def dim(self) -> int:
+        return self.components.shape[0]
+
+    @classmethod
+    def fit(cls, vectors, dim: int = COMPRESSED_DIM, sample: int = PCA_FIT_SAMPLE, seed: int = 0):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) > sample:
+            vectors = vectors[np.random.default_rng(seed).choice(len(vectors), sample, replace=False)]
+        mean = vectors.mean(axis=0)
+        # Ekonomik SVD: (N, D) -> bileşenler Vt'nin ilk satırları
+        _, _, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+        dim = min(dim, vt.shape[0])
+        return cls(mean, vt[:dim])
+
+    def transform(self, vectors):
+        return (np.asarray(vectors, dtype=np.float32) - self.mean) @ self.components.T
+
+    def explained_variance(self, vectors) -> float:
+        """Örneğin ortalamadan sapmasının izdüşümde kalan oranı (0-1)."""
+        centered = np.asarray(vectors, dtype=np.float32) - self.mean
+        total = float((centered ** 2).sum())
+        return float((self.transform(vectors) ** 2).sum()) / total if total else 1.0
+
+
+class CompressedVectors:
+    """
+    Satır numarasıyla adreslenen int8 kod deposu (UserVectorIndex'in float32
+    matrisinin yerine geçer; satır -> user_id eşlemesi çağıranda tutulur).
+    """
+
+    def __init__(self, projection: PCAProjection, capacity: int = 1024):
+        self.projection = projection
+        self.codes = np.zeros((capacity, projection.dim), dtype=np.int8)
+        self.scales = np.zeros(capacity, dtype=np.float32)
+        self.bias = np.zeros(capacity, dtype=np.float32)
+
+    @property
+    def capacity(self) -> int:
+        return len(self.scales)
+
+    def grow(self, capacity: int):
+        if capacity <= self.capacity:
+            return
+        codes = np.zeros((capacity, self.projection.dim), dtype=np.int8)
+        codes[:self.capacity] = self.codes
+        self.codes = codes
+        self.scales = np.concatenate([self.scales, np.zeros(capacity - len(self.scales), dtype=np.float32)])
+        self.bias = np.concatenate([self.bias, np.zeros(capacity - len(self.bias), dtype=np.float32)])
+
+    def encode(self, vectors):
+        """Normalize vektörler -> (int8 kodlar, ölçekler, bias)."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        projected = self.projection.transform(vectors)
+        scales = np.abs(projected).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(projected / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32), (vectors @ self.projection.mean).astype(np.float32)
+
+    def put(self, rows, vectors):
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) and rows.max() >= self.capacity:
+            self.grow(max(int(rows.max()) + 1, self.capacity * 2))
+        self.codes[rows], self.scales[rows], self.bias[rows] = self.encode(vectors)
+
+    def scores(self, query, n: int):
+        """İlk n satırın yaklaşık skorları (sıralama için; mutlak değer kosinüs değildir)."""
+        q = self.projection.transform(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        out = np.empty(n, dtype=np.float32)
+        for start in range(0, n, SCORE_BLOCK):
+            end = min(start + SCORE_BLOCK, n)
+            out[start:end] = self.codes[start:end].astype(np.float32) @ q
+        out *= self.scales[:n]
+        out += self.bias[:n]
+        return out
+
+    def memory_footprint(self, n: int, full_dim: int):
+        """n vektör için sıkıştırılmış katmanın bellek kullanımı ve float32 karşılığı (bayt)."""
+        per_vector = self.projection.dim + 8  # int8 kod + float32 ölçek + float32 bias
+        return {
+            "vectors": n,
+            "dim": full_dim,
+            "compressed_dim": self.projection.dim,
+            "codes_bytes": n * per_vector,
+            "projection_bytes": int(self.projection.mean.nbytes + self.projection.components.nbytes),
+            "float32_bytes": n * full_dim * 4,
+            "codes_ratio": round(full_dim * 4 / per_vector, 1),
+        }
+
+
+def rerank(candidate_ids, full_vectors, query, top_k: int):
+    """Adayları tam vektörlerle kesin kosinüs skoruna göre sıralar: (id'ler, skorlar)."""
+    if len(candidate_ids) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    exact = np.asarray(full_vectors, dtype=np.float32) @ np.asarray(query, dtype=np.float32)
+    k = min(top_k, len(exact))
+    top = np.argpartition(-exact, k - 1)[:k]
+    top = top[np.argsort(-exact[top])]
+    return np.asarray(candidate_ids)[top], exact[top]
@@ -1,10 +1,20 @@
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
 import models, schemas
+from vector_index import user_index
+from vector_codec import decode_vector
+from response_cache import response_cache
+from user_neighbors import neighbor_job
+from instrumentation import stage
 
 # Şifreleme ayarları (Bcrypt kullanıyoruz)
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Aynı email / kullanıcı adıyla eşzamanlı kayıt (unique indeks ihlali)
+DUPLICATE_USER_DETAIL = "Bu email veya kullanıcı adı zaten kayıtlı."
+
 # --- YARDIMCI FONKSİYONLAR (Hashleme) ---
 
 def get_password_hash(password):
@@ -25,7 +35,8 @@ def get_user_by_email(db: Session, email: str):
 # 2. Yeni Kullanıcı Oluştur (Create)
 def create_user(db: Session, user: schemas.UserCreate):
     # Şifreyi hashle
-    hashed_password = get_password_hash(user.password)
+    with stage("password_hash"):
+        hashed_password = get_password_hash(user.password)
     
     # Model objesini hazırla (mapping)
     db_user = models.User(
@@ -36,7 +47,12 @@ def create_user(db: Session, user: schemas.UserCreate):
     
     # Kullanıcıyı veritabanına ekle
     db.add(db_user)
-    db.commit()      
+    try:
+        db.commit()
+    except IntegrityError:
+        # Ön kontrolü aynı anda geçen iki kayıt: unique indeks ikincisini reddeder
+        db.rollback()
+        raise HTTPException(status_code=400, detail=DUPLICATE_USER_DETAIL)
     db.refresh(db_user) # ID'si oluşmuş halini geri al
 
     # --- YENİ EKLENEN KISIM: OTOMATİK FAVORİ LİSTESİ ---
@@ -53,19 +69,37 @@ def create_user(db: Session, user: schemas.UserCreate):
     return db_user
 
 # 3. Profil Oluştur (Onboarding Cevapları)
-def create_user_profile(db: Session, profile: schemas.ProfileCreate, user_id: int, mood_vector_json: str):
+def create_user_profile(db: Session, profile: schemas.ProfileCreate, user_id: int, mood_vector: bytes):
     # Gelen veriyi (ProfileCreate şeması) veritabanı modeline (UserProfile) çevir
     db_profile = models.UserProfile(
         **profile.dict(), 
         user_id=user_id, 
-        mood_vector=mood_vector_json
+        mood_vector=mood_vector
     )
     
     db.add(db_profile)
     db.commit()
     db.refresh(db_profile)
+
+    username = db_profile.owner.username if db_profile.owner else None
+    profile_committed(db_profile, username)
     return db_profile
 
+def profile_committed(db_profile: models.UserProfile, username: str):
+    """
+    Profil commit edildikten sonra bellekteki yapıları günceller (crud ve crud_async ortak).
+    """
+    # Bellekteki benzerlik indeksini yerinde güncelle (tam yeniden yükleme gerekmez)
+    if user_index.loaded and db_profile.mood_vector:
+        user_index.upsert(db_profile.user_id, username, decode_vector(db_profile.mood_vector),
+                          source_id=db_profile.id)
+
+    # Yeni profil herkesin benzer kullanıcı / şarkı önerilerini etkileyebilir
+    response_cache.invalidate("recommendations")
+    # Önceden hesaplanmış komşu tablosunu arka planda artımlı yenile
+    if db_profile.mood_vector:
+        neighbor_job.mark_dirty(db_profile.user_id)
+
 # 4. Profil Getir (Eşleştirme/Öneri için lazım olacak)
 def get_profile_by_user_id(db: Session, user_id: int):
     return db.query(models.UserProfile).filter(models.UserProfile.user_id == user_id).first()
\ No newline at end of file
@@ -0,0 +1,72 @@
+"""
+crud.py'nin AsyncSession (aiosqlite) karşılıkları — async endpointler için.
+
+Sorgu beklerken event loop serbest kalır; bcrypt hash'i ayrı havuzda
+(executors.password_executor) çalışır. İş kuralları crud.py ile aynıdır;
+commit sonrası indeks / önbellek güncellemesi crud.profile_committed'ta ortaktır.
+Async oturumda lazy-load yapılamadığı için yanıtta dönen ilişkiler
+(User.profile) sorguda açıkça yüklenir.
+"""
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+import models, schemas
+from crud import DUPLICATE_USER_DETAIL, get_password_hash, profile_committed
+from executors import password_executor, run_in
+from instrumentation import stage
+
+
+async def get_questions(db: AsyncSession):
+    result = await db.scalars(select(models.Question).order_by(models.Question.question_order))
+    return result.all()
+
+
+async def get_user(db: AsyncSession, user_id: int):
+    return await db.scalar(
+        select(models.User).options(selectinload(models.User.profile)).where(models.User.id == user_id)
+    )
+
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(models.User).where(models.User.email == email))
+
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    # Hash sürerken (önceki sorgulardan kalan) bağlantıyı havuza geri ver; dalgada havuz tükenmesin
+    if db.in_transaction():
+        await db.rollback()
+    # Şifreyi hashle (bcrypt ~100 ms CPU: event loop'ta değil, kendi havuzunda)
+    with stage("password_hash"):
+        hashed_password = await run_in(password_executor, get_password_hash, user.password)
+
+    db_user = models.User(username=user.username, email=user.email, password_hash=hashed_password)
+    db.add(db_user)
+    try:
+        await db.flush()  # ID'yi al
+
+        # Otomatik favori listesi (aynı transaction'da)
+        db.add(models.Playlist(name="Favorilenler", user_id=db_user.id, is_favorite=True))
+        await db.commit()
+    except IntegrityError:
+        # Ön kontrolü aynı anda geçen iki kayıt: unique indeks ikincisini reddeder
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=DUPLICATE_USER_DETAIL)
+
+    return await get_user(db, db_user.id)
+
+
+async def create_user_profile(db: AsyncSession, profile: schemas.ProfileCreate, user_id: int, mood_vector: bytes):
+    db_profile = models.UserProfile(**profile.dict(), user_id=user_id, mood_vector=mood_vector)
+    db.add(db_profile)
+    await db.commit()
+
+    username = await db.scalar(select(models.User.username).where(models.User.id == user_id))
+    profile_committed(db_profile, username)
+    return db_profile
+
+
+async def get_profile_by_user_id(db: AsyncSession, user_id: int):
+    return await db.scalar(select(models.UserProfile).where(models.UserProfile.user_id == user_id))
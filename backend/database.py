@@ -1,18 +1,128 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
 # SQLite veritabanı dosyası backend klasöründe "muzik_app.db" adıyla oluşacak
-SQLALCHEMY_DATABASE_URL = "sqlite:///./muzik_app.db"
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./muzik_app.db")
+# Okuma ağırlıklı endpointler için ayrı (salt-okunur) bağlantı. Verilmezse aynı dosya
+# "mode=ro" ile açılır; WAL modunda okuyucular yazıcıları beklemez.
+SQLALCHEMY_READ_DATABASE_URL = os.getenv("DATABASE_READ_URL")
+# Async endpointler için sürücü (aiosqlite). Verilmezse DATABASE_URL'den türetilir.
+SQLALCHEMY_ASYNC_DATABASE_URL = os.getenv("DATABASE_ASYNC_URL")
+
+# --- SQLite AYARLARI (her bağlantıda PRAGMA olarak uygulanır) ---
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),          # Okuyucu + yazıcı aynı anda
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),         # WAL ile güvenli ve hızlı
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),  # Kilitte hemen hata verme, bekle
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),      # Negatif = KiB (64 MB)
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": "MEMORY",
+}
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+
+
+def read_only_url(url: str) -> str:
+    """sqlite:///./x.db -> sqlite:///file:./x.db?mode=ro&uri=true"""
+    path = url[len("sqlite:///"):]
+    return f"sqlite:///file:{path}?mode=ro&uri=true"
+
+
+def async_url(url: str) -> str:
+    """sqlite:///x.db -> sqlite+aiosqlite:///x.db (diğer URL'ler olduğu gibi)"""
+    if url.startswith("sqlite:///"):
+        return "sqlite+aiosqlite:///" + url[len("sqlite:///"):]
+    return url
+
+
+def _apply_pragmas_on_connect(engine, pragmas: dict, read_only: bool):
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            # journal_mode veritabanı dosyasına yazılır; salt-okunur bağlantı değiştiremez
+            if read_only and name == "journal_mode":
+                continue
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def create_sqlite_engine(url: str, read_only: bool = False, pragmas: dict = None,
+                         pool_size: int = DB_POOL_SIZE, max_overflow: int = DB_MAX_OVERFLOW):
+    """
+    Veritabanı motorunu (engine) oluşturur.
+    SQLite ise bağlantı havuzu (QueuePool) kullanılır ve her yeni bağlantıda PRAGMA'lar uygulanır.
+    """
+    if not url.startswith("sqlite"):
+        return create_engine(url, pool_size=pool_size, max_overflow=max_overflow, pool_pre_ping=True)
+
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+    busy_timeout = pragmas.get("busy_timeout", 5000)
+
+    # connect_args={"check_same_thread": False} sadece SQLite için gereklidir
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": busy_timeout / 1000},
+        poolclass=QueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+    )
+    _apply_pragmas_on_connect(engine, pragmas, read_only)
+    return engine
+
+
+def create_async_sqlite_engine(url: str, read_only: bool = False, pragmas: dict = None,
+                               pool_size: int = DB_POOL_SIZE, max_overflow: int = DB_MAX_OVERFLOW):
+    """
+    create_sqlite_engine'in async karşılığı (AsyncSession için).
+    aiosqlite her bağlantıyı kendi thread'inde çalıştırır; sorgu beklerken event loop serbest kalır.
+    """
+    if "sqlite" not in url:
+        return create_async_engine(url, pool_size=pool_size, max_overflow=max_overflow, pool_pre_ping=True)
+
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+    busy_timeout = pragmas.get("busy_timeout", 5000)
+    engine = create_async_engine(
+        url,
+        connect_args={"timeout": busy_timeout / 1000},
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+    )
+    _apply_pragmas_on_connect(engine.sync_engine, pragmas, read_only)
+    return engine
+
 
 # Veritabanı motorunu (engine) oluşturuyoruz
-# connect_args={"check_same_thread": False} sadece SQLite için gereklidir
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+engine = create_sqlite_engine(SQLALCHEMY_DATABASE_URL)
+
+# Salt-okunur motor (okuma ağırlıklı endpointler için)
+if SQLALCHEMY_READ_DATABASE_URL:
+    read_engine = create_sqlite_engine(SQLALCHEMY_READ_DATABASE_URL, read_only=True)
+elif SQLALCHEMY_DATABASE_URL.startswith("sqlite:///") and ":memory:" not in SQLALCHEMY_DATABASE_URL:
+    read_engine = create_sqlite_engine(read_only_url(SQLALCHEMY_DATABASE_URL), read_only=True)
+else:
+    read_engine = engine
+
+# Async motorlar (async endpointler; aynı dosya, aynı PRAGMA'lar)
+async_engine = create_async_sqlite_engine(SQLALCHEMY_ASYNC_DATABASE_URL or async_url(SQLALCHEMY_DATABASE_URL))
+if SQLALCHEMY_READ_DATABASE_URL:
+    async_read_engine = create_async_sqlite_engine(async_url(SQLALCHEMY_READ_DATABASE_URL), read_only=True)
+elif read_engine is not engine and not SQLALCHEMY_ASYNC_DATABASE_URL:
+    async_read_engine = create_async_sqlite_engine(async_url(read_only_url(SQLALCHEMY_DATABASE_URL)), read_only=True)
+else:
+    async_read_engine = async_engine
 
 # Veritabanı oturumu (Session) oluşturucu
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+# expire_on_commit=False: commit sonrası nesne alanları (await'siz) okunabilir kalsın
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, class_=AsyncSession, autoflush=False,
+                                           expire_on_commit=False)
 
 # Modellerimizin (Tabloların) miras alacağı temel sınıf
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
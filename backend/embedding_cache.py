@@ -0,0 +1,136 @@
+"""
+İki katmanlı embedding önbelleği (ai_service için).
+
+1. katman: süreç içi, boyutu sınırlı LRU (OrderedDict)
+2. katman: diskte SQLite tablosu (yeniden başlatmalarda kaybolmaz)
+
+Anahtar = sha256(model adı + normalize edilmiş metin). Model "uncased" olduğu
+için (all-MiniLM-L6-v2 küçük harfe çevirir) metin küçük harfe indirgenip
+boşlukları sadeleştirilir; böylece aynı anlama gelen tekrarlar tek kayıt olur.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from vector_codec import encode_vector, decode_vector
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.db")
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFC", str(text))
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def cache_key(model_name: str, text: str) -> str:
+    return hashlib.sha256(f"{model_name}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+
+    def __init__(self, model_name: str, path: str = EMBEDDING_CACHE_PATH, max_items: int = EMBEDDING_CACHE_SIZE):
+        self.model_name = model_name
+        self.path = path
+        self.max_items = max_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+
+        # Sayaçlar
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk(self):
+        if self._conn is None and self.path:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, texts):
+        """Her metin için vektör (NumPy) veya None döner."""
+        keys = [cache_key(self.model_name, t) for t in texts]
+        result = [None] * len(keys)
+        missing = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    result[i] = vector
+                else:
+                    missing.setdefault(key, []).append(i)
+
+            conn = self._disk()
+            if missing and conn is not None:
+                found = {}
+                key_list = list(missing)
+                # SQLite parametre limiti için parçalara böl
+                for start in range(0, len(key_list), 500):
+                    chunk = key_list[start:start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    for key, blob in conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                    ):
+                        found[key] = decode_vector(blob)
+                for key, vector in found.items():
+                    self._remember(key, vector)
+                    for i in missing.pop(key):
+                        result[i] = vector
+                        self.disk_hits += 1
+
+            self.misses += sum(len(positions) for positions in missing.values())
+        return result
+
+    def get(self, text):
+        return self.get_many([text])[0]
+
+    def put_many(self, texts, vectors):
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = cache_key(self.model_name, text)
+                blob = encode_vector(vector)
+                self._remember(key, decode_vector(blob))
+                rows.append((key, blob))
+
+            conn = self._disk()
+            if conn is not None and rows:
+                conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+                conn.commit()
+
+    def put(self, text, vector):
+        self.put_many([text], [vector])
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "model": self.model_name,
+                "memory_items": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                # Her hit, atlanmış bir transformer forward pass'i demektir
+                "saved_forward_passes": self.memory_hits + self.disk_hits,
+            }
@@ -0,0 +1,149 @@
+"""
+Mikro-batch encoder kuyruğu.
+
+Aynı anda gelen profil oluşturma istekleri kısa bir pencere (max_wait_ms)
+boyunca toplanır ve tek bir batch'li model.encode çağrısıyla kodlanır.
+Sonuçlar bekleyen isteklere geri dağıtılır. Kuyruk doluysa istek beklemeden
+EncoderQueueFull ile reddedilir (load shedding).
+
+Benchmark:
+    python encoder_queue.py [istek_sayısı]   -> tek tek vs. batch'li kodlama hızı
+"""
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ENCODER_MAX_BATCH = int(os.getenv("ENCODER_MAX_BATCH", "32"))
+ENCODER_MAX_WAIT_MS = float(os.getenv("ENCODER_MAX_WAIT_MS", "10"))
+ENCODER_MAX_QUEUE = int(os.getenv("ENCODER_MAX_QUEUE", "256"))
+
+
+class EncoderQueueFull(Exception):
+    """Kuyruk dolu: istek kabul edilmedi."""
+
+
+class BatchingEncoder:
+
+    def __init__(self, encode_fn, max_batch_size: int = ENCODER_MAX_BATCH,
+                 max_wait_ms: float = ENCODER_MAX_WAIT_MS, max_queue: int = ENCODER_MAX_QUEUE,
+                 executor=None):
+        # encode_fn: list[str] -> (N, dim) dizi (örn. ai_service.get_mood_vectors)
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self._queue = None
+        self._worker = None
+        # Model çağrıları özel bir havuzda (varsayılan: tek thread); FastAPI'nin threadpool'unu meşgul etmez
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="encoder")
+
+        # İstatistikler
+        self.batches = 0
+        self.encoded = 0
+        self.rejected = 0
+
+    async def start(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def encode(self, text: str):
+        """Metni kuyruğa koyar ve batch tamamlanınca vektörünü (list) döner."""
+        await self.start()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((text, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise EncoderQueueFull(f"Encoder kuyruğu dolu ({self.max_queue} istek bekliyor)")
+        return await future
+
+    async def _collect(self):
+        # İlk isteği bekle, sonra pencere dolana / batch dolana kadar topla
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Pencere bittiğinde kuyrukta hazır bekleyenleri de al
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            texts = [text for text, _ in batch]
+            try:
+                vectors = await loop.run_in_executor(self._executor, self.encode_fn, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.encoded += len(batch)
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():  # İstek iptal edilmiş olabilir
+                    future.set_result(vector.tolist())
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "encoded": self.encoded,
+            "rejected": self.rejected,
+            "avg_batch_size": self.encoded / self.batches if self.batches else 0.0,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+
+def _benchmark(n_requests: int = 256):
+    import ai_service
+
+    texts = [f"Aktivite: Test {i}. Sevdiği Türler: Pop. Ruh Hali: Mutluluk {i}" for i in range(n_requests)]
+
+    # 1) Tek tek: her istek kendi forward pass'i
+    start = time.perf_counter()
+    for text in texts:
+        ai_service.get_mood_vectors([text], use_cache=False)
+    single = time.perf_counter() - start
+
+    # 2) Aynı anda gelen istekler mikro-batch kuyruğundan
+    encoder = BatchingEncoder(lambda batch: ai_service.get_mood_vectors(batch, use_cache=False),
+                              max_queue=n_requests)
+
+    async def run_all():
+        results = await asyncio.gather(*(encoder.encode(t) for t in texts))
+        await encoder.stop()
+        return results
+
+    start = time.perf_counter()
+    asyncio.run(run_all())
+    batched = time.perf_counter() - start
+
+    print(f"📊 {n_requests} istek")
+    print(f"   Tek tek:     {n_requests / single:8.1f} embedding/sn")
+    print(f"   Mikro-batch: {n_requests / batched:8.1f} embedding/sn (ort. batch {encoder.stats()['avg_batch_size']:.1f})")
+
+
+if __name__ == "__main__":
+    _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 256)
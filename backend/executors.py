@@ -0,0 +1,32 @@
+"""
+CPU-yoğun işler için ayrı, boyutu ayarlanabilir thread havuzları.
+
+Async endpointler bcrypt hash'ini ve model kodlamasını doğrudan event loop'ta
+çalıştırmaz; FastAPI/anyio'nun ortak threadpool'unu da kullanmaz. Böylece bir
+kayıt (signup) dalgası ucuz okuma isteklerini (GET /, sorular, playlistler)
+bekletemez: en kötü ihtimalle kendi havuzunun kuyruğunda sıra bekler.
+
+bcrypt ve torch/onnxruntime hesaplama sırasında GIL'i bıraktığı için thread
+havuzu gerçek paralellik sağlar.
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+ENCODER_WORKERS = int(os.getenv("ENCODER_WORKERS", "1"))  # Model zaten kendi içinde çok çekirdekli
+
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+encoder_executor = ThreadPoolExecutor(max_workers=ENCODER_WORKERS, thread_name_prefix="encoder")
+
+
+async def run_in(executor, fn, *args, **kwargs):
+    """fn(*args, **kwargs) çağrısını verilen havuzda çalıştırır ve sonucunu bekler."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+
+
+def shutdown():
+    password_executor.shutdown(wait=False, cancel_futures=True)
+    encoder_executor.shutdown(wait=False, cancel_futures=True)
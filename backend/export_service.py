@@ -0,0 +1,147 @@
+"""
+Kullanıcı verisinin (playlistler, playlist şarkıları, dinleme geçmişi) akışlı
+dışa aktarımı: NDJSON veya CSV.
+
+- Kayıtlar üç bölüm halinde sırayla yazılır: playlist -> item -> history.
+  Her bölüm id sırasıyla yield_per partileriyle okunur; hesap ne kadar büyük
+  olursa olsun bellekte en fazla bir parti (EXPORT_BATCH satır) tutulur.
+- Her kaydın "cursor" alanı o kayda kadar yazılanları temsil eder; bağlantı
+  koparsa son eksiksiz satırın cursor'ı ile kalınan yerden devam edilir
+  (CSV'de devam isteğinde başlık satırı tekrar yazılmaz, dosyaya eklenebilir).
+- Yanıt parti başına bir parça (chunk) olarak gönderilir.
+"""
+import base64
+import csv
+import io
+import json
+import os
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+import models
+
+EXPORT_BATCH = int(os.getenv("EXPORT_BATCH", "1000"))
+
+SECTIONS = ("playlist", "item", "history")
+CSV_COLUMNS = ["type", "playlist_id", "name", "is_favorite", "item_count", "updated_at",
+               "history_id", "song_id", "title", "artist", "added_at", "cursor"]
+
+
+def encode_cursor(section: str, last_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{section}|{last_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        section, last_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        if section not in SECTIONS:
+            raise ValueError(section)
+        return section, int(last_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Geçersiz cursor.")
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+# --- BÖLÜM SORGULARI (hepsi id sırasıyla, id > after) ---
+
+def _playlists(db: Session, user_id: int, after: int):
+    query = (
+        db.query(models.Playlist.id, models.Playlist.name, models.Playlist.is_favorite,
+                 models.Playlist.item_count, models.Playlist.updated_at)
+        .filter(models.Playlist.user_id == user_id, models.Playlist.id > after)
+        .order_by(models.Playlist.id)
+    )
+    for row in query.yield_per(EXPORT_BATCH):
+        yield row.id, {
+            "type": "playlist", "playlist_id": row.id, "name": row.name, "is_favorite": bool(row.is_favorite),
+            "item_count": row.item_count, "updated_at": _isoformat(row.updated_at),
+        }
+
+
+def _items(db: Session, user_id: int, after: int):
+    query = (
+        db.query(models.PlaylistItem.id, models.PlaylistItem.playlist_id, models.PlaylistItem.song_id,
+                 models.PlaylistItem.added_at, models.Song.title, models.Song.artist)
+        .join(models.Playlist, models.Playlist.id == models.PlaylistItem.playlist_id)
+        .outerjoin(models.Song, models.Song.id == models.PlaylistItem.song_id)
+        .filter(models.Playlist.user_id == user_id, models.PlaylistItem.id > after)
+        .order_by(models.PlaylistItem.id)
+    )
+    for row in query.yield_per(EXPORT_BATCH):
+        yield row.id, {
+            "type": "item", "playlist_id": row.playlist_id, "song_id": row.song_id,
+            "title": row.title, "artist": row.artist, "added_at": _isoformat(row.added_at),
+        }
+
+
+def _history(db: Session, user_id: int, after: int):
+    query = (
+        db.query(models.ListeningHistory.id, models.ListeningHistory.song_id, models.Song.title, models.Song.artist)
+        .outerjoin(models.Song, models.Song.id == models.ListeningHistory.song_id)
+        .filter(models.ListeningHistory.user_id == user_id, models.ListeningHistory.id > after)
+        .order_by(models.ListeningHistory.id)
+    )
+    for row in query.yield_per(EXPORT_BATCH):
+        yield row.id, {
+            "type": "history", "history_id": row.id, "song_id": row.song_id,
+            "title": row.title, "artist": row.artist,
+        }
+
+
+_READERS = {"playlist": _playlists, "item": _items, "history": _history}
+
+
+def iter_records(db: Session, user_id: int, cursor: str = None):
+    """Kayıtları cursor'dan sonrasından itibaren (cursor alanıyla birlikte) üretir."""
+    start_section, after = decode_cursor(cursor) if cursor else (SECTIONS[0], 0)
+    for section in SECTIONS[SECTIONS.index(start_section):]:
+        for record_id, record in _READERS[section](db, user_id, after if section == start_section else 0):
+            record["cursor"] = encode_cursor(section, record_id)
+            yield record
+
+
+# --- FORMATLAR ---
+
+def _batches(records):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= EXPORT_BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_export(session_factory, user_id: int, fmt: str = "ndjson", cursor: str = None):
+    """
+    StreamingResponse gövdesi: kendi (read-only) oturumunu açar, yanıt bitince kapatır.
+    Senkron generator olduğu için Starlette onu thread havuzunda tüketir.
+    """
+    if cursor:
+        decode_cursor(cursor)  # Geçersizse yanıt başlamadan 400
+
+    def body():
+        with session_factory() as db:
+            records = iter_records(db, user_id, cursor)
+            if fmt == "csv":
+                buffer = io.StringIO()
+                writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+                if not cursor:
+                    writer.writeheader()
+                for batch in _batches(records):
+                    writer.writerows(batch)
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                if buffer.tell():
+                    yield buffer.getvalue()
+            else:
+                for batch in _batches(records):
+                    yield "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch)
+
+    return body()
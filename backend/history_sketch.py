@@ -0,0 +1,327 @@
+"""
+Dinleme geçmişi + playlist şarkıları üzerinden MinHash imzaları ve LSH indeksi.
+
+- Her kullanıcının şarkı kümesi MINHASH_PERMUTATIONS adet hash fonksiyonunun
+  minimumlarıyla özetlenir; iki imzanın eşit konum oranı Jaccard benzerliğinin
+  tahminidir (tam küme kesişimi hesaplanmaz).
+- İmza LSH_BANDS banta bölünür; en az bir bandı aynı olan kullanıcılar aday
+  olur (bant başına sıralı anahtar dizisi üzerinde ikili arama, alt doğrusal).
+  Jaccard eşiği yaklaşık (1/bant)^(1/satır): 16 x 4 için ~0.5.
+- Yeni etkileşimler add ile artımlı işlenir: imza min ile güncellenir, sadece
+  değişen bantlar delta sözlüğüne yazılır; delta büyüyünce sıralı dizilere
+  katılır (collaborative.py ile aynı ana + delta düzeni).
+- Silmeler (playlistten çıkarma) MinHash ile geri alınamaz; resync kullanıcının
+  imzasını veritabanındaki güncel şarkı kümesinden yeniden hesaplar.
+- Başka süreçlerin yazdıkları (import_data gibi) için indeks
+  SKETCH_REBUILD_SECONDS'ta bir arka planda baştan kurulur.
+"""
+import os
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from collaborative import ItemCFEngine
+
+MINHASH_PERMUTATIONS = int(os.getenv("MINHASH_PERMUTATIONS", "64"))
+LSH_BANDS = int(os.getenv("LSH_BANDS", "16"))
+LSH_MAX_BUCKET = 500           # Çok kalabalık bantlardan (popüler şarkılar) en fazla bu kadar aday
+COMPACT_THRESHOLD = 50_000     # Bu kadar bant değişikliğinden sonra delta sıralı dizilere katılır
+BUILD_CHUNK = 100_000          # build sırasında bir seferde işlenen etkileşim sayısı
+SKETCH_REBUILD_SECONDS = float(os.getenv("SKETCH_REBUILD_SECONDS", "3600"))  # 0 = periyodik kurulum kapalı
+
+_PRIME = np.uint64(2**31 - 1)  # a * x + b taşmadan uint64'e sığar
+_MAX_HASH = np.uint32(2**32 - 1)
+
+
+class HistorySketchIndex:
+
+    def __init__(self, permutations: int = MINHASH_PERMUTATIONS, bands: int = LSH_BANDS, seed: int = 1):
+        if permutations % bands:
+            raise ValueError(f"MINHASH_PERMUTATIONS ({permutations}) LSH_BANDS ({bands}) ile tam bölünmeli")
+        self.permutations = permutations
+        self.bands = bands
+        self.rows_per_band = permutations // bands
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIME), size=permutations, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), size=permutations, dtype=np.uint64)
+        self._lock = threading.RLock()
+        self.built = False
+        self.built_at = 0.0
+        self._rebuilding = False
+        self._touched = None          # Arka plan kurulumu sürerken değişen kullanıcılar
+        self._reset(0)
+
+    def _reset(self, capacity: int):
+        self.size = 0
+        self.user_ids = np.zeros(capacity, dtype=np.int64)
+        self.user_pos = {}                                         # user_id -> satır no
+        self.signatures = np.full((capacity, self.permutations), _MAX_HASH, dtype=np.uint32)
+        self.band_keys = np.zeros((capacity, self.bands), dtype=np.uint64)
+        self.base = [(np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64))] * self.bands
+        self.delta = [defaultdict(set) for _ in range(self.bands)]  # bant -> anahtar -> satırlar
+        self.delta_size = 0
+
+    # Arka plan kurulumunda yeni indeksten devralınan alanlar
+    _STATE = ("size", "user_ids", "user_pos", "signatures", "band_keys", "base", "delta", "delta_size")
+
+    # --- HASH ---
+
+    def _hash(self, song_ids):
+        """(n,) şarkı id -> (n, permutations) uint32 hash değerleri."""
+        # Ardışık id'ler doğrusal hash'te düzenli örüntü bırakır; önce splitmix64 ile karıştır
+        x = np.asarray(song_ids, dtype=np.uint64).reshape(-1, 1) + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        x = (x ^ (x >> np.uint64(31))) % _PRIME
+        return ((self._a * x + self._b) % _PRIME).astype(np.uint32)
+
+    def _band_keys(self, signatures):
+        """(m, permutations) imza -> (m, bands) uint64 bant anahtarı."""
+        parts = signatures.reshape(len(signatures), self.bands, self.rows_per_band).astype(np.uint64)
+        keys = np.zeros(parts.shape[:2], dtype=np.uint64)
+        for r in range(self.rows_per_band):
+            keys = keys * np.uint64(0x100000001B3) ^ parts[:, :, r]  # uint64 taşması bilerek (FNV benzeri)
+        return keys
+
+    def _grow(self, min_capacity: int):
+        capacity = max(min_capacity, len(self.user_ids) * 2, 1024)
+        self.user_ids = np.concatenate([self.user_ids, np.zeros(capacity - len(self.user_ids), dtype=np.int64)])
+        self.signatures = np.concatenate([
+            self.signatures,
+            np.full((capacity - len(self.signatures), self.permutations), _MAX_HASH, dtype=np.uint32),
+        ])
+        self.band_keys = np.concatenate([
+            self.band_keys, np.zeros((capacity - len(self.band_keys), self.bands), dtype=np.uint64),
+        ])
+
+    # --- KURULUM ---
+
+    def build(self, db: Session):
+        """İmzaları ve bant dizilerini ListeningHistory + PlaylistItem'dan baştan kurar."""
+        pairs = ItemCFEngine._load_interactions(db)
+
+        with self._lock:
+            users = np.array([u for u, _ in pairs], dtype=np.int64)
+            songs = np.array([s for _, s in pairs], dtype=np.int64)
+            user_ids, user_rows = np.unique(users, return_inverse=True)
+            song_ids, song_cols = np.unique(songs, return_inverse=True)
+            self._reset(len(user_ids))
+            self.size = len(user_ids)
+            self.user_ids[:] = user_ids
+            self.user_pos = {int(u): i for i, u in enumerate(user_ids)}
+
+            if len(pairs):
+                hashes = self._hash(song_ids)
+                order = np.argsort(user_rows, kind="stable")
+                user_rows, song_cols = user_rows[order], song_cols[order]
+                # Kullanıcı sınırlarında bölünmüş parçalar: her kullanıcının satırları
+                # hashes[şarkılar].min() ile tek reduceat çağrısında imzalanır
+                starts = np.flatnonzero(np.r_[True, user_rows[1:] != user_rows[:-1]])
+                bounds = np.append(starts, len(user_rows))
+                first = 0
+                while first < len(starts):
+                    last = np.searchsorted(bounds, bounds[first] + BUILD_CHUNK, side="right") - 1
+                    last = max(last, first + 1)
+                    lo, hi = bounds[first], bounds[last]
+                    self.signatures[user_rows[starts[first:last]]] = np.minimum.reduceat(
+                        hashes[song_cols[lo:hi]], starts[first:last] - lo, axis=0
+                    )
+                    first = last
+
+            self.band_keys[:self.size] = self._band_keys(self.signatures[:self.size])
+            self.compact()
+            self.built = True
+            self.built_at = time.monotonic()
+
+        print(f"🧩 MinHash imzaları kuruldu: {len(user_ids)} kullanıcı, {len(pairs)} etkileşim, "
+              f"{self.bands} bant x {self.rows_per_band} satır")
+
+    def ensure_built(self, db: Session):
+        if not self.built:
+            with self._lock:
+                if not self.built:
+                    self.build(db)
+        elif SKETCH_REBUILD_SECONDS and time.monotonic() - self.built_at > SKETCH_REBUILD_SECONDS:
+            self._rebuild_in_background()
+
+    def _rebuild_in_background(self):
+        """İndeksi yeni bir nesnede kurar ve hazır olunca devralır; istekler eski imzalarla sürer."""
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+            self._touched = set()
+
+        def run():
+            from database import SessionLocal
+            try:
+                fresh = HistorySketchIndex(self.permutations, self.bands)
+                fresh._a, fresh._b = self._a, self._b
+                with SessionLocal() as db:
+                    fresh.build(db)
+                with self._lock:
+                    for name in self._STATE:
+                        setattr(self, name, getattr(fresh, name))
+                    self.built_at = fresh.built_at
+                    touched, self._touched = self._touched, None
+                # Kurulum okunduktan sonra değişen kullanıcıları yeni imzalara yeniden uygula
+                if touched:
+                    with SessionLocal() as db:
+                        for user_id in touched:
+                            self.resync(db, user_id)
+            except Exception as e:
+                print(f"⚠️ MinHash imzaları yeniden kurulamadı: {e}")
+                with self._lock:
+                    self.built_at = time.monotonic()  # Bir sonraki deneme periyot sonunda
+            finally:
+                with self._lock:
+                    self._rebuilding = False
+                    self._touched = None
+
+        threading.Thread(target=run, daemon=True, name="sketch-rebuild").start()
+
+    def compact(self):
+        """Delta'yı bant başına sıralı (anahtar, satır) dizilerine katar."""
+        with self._lock:
+            keys = self.band_keys[:self.size]
+            base = []
+            for band in range(self.bands):
+                order = np.argsort(keys[:, band], kind="stable")
+                base.append((keys[order, band], order.astype(np.int64)))
+            self.base = base
+            self.delta = [defaultdict(set) for _ in range(self.bands)]
+            self.delta_size = 0
+
+    # --- ARTIMLI GÜNCELLEME ---
+
+    def _row_for(self, user_id: int):
+        """Kullanıcının satırı; yoksa yeni (boş imzalı) satır açar. İkinci değer: yeni mi."""
+        row = self.user_pos.get(user_id)
+        if row is not None:
+            return row, False
+        if self.size >= len(self.user_ids):
+            self._grow(self.size + 1)
+        row = self.size
+        self.size += 1
+        self.user_pos[user_id] = row
+        self.user_ids[row] = user_id
+        self.signatures[row] = _MAX_HASH
+        return row, True
+
+    def _set_signature(self, row: int, signature, new: bool):
+        if not new and np.array_equal(signature, self.signatures[row]):
+            return  # İmza değişmedi
+        old_keys = None if new else self.band_keys[row].copy()
+        self.signatures[row] = signature
+        keys = self._band_keys(signature[None, :])[0]
+        self.band_keys[row] = keys
+
+        # Sadece değişen bantlar deltaya; eski kayıtlar arama sırasında ayıklanır
+        changed = np.arange(self.bands) if old_keys is None else np.flatnonzero(keys != old_keys)
+        for band in changed.tolist():
+            self.delta[band][int(keys[band])].add(row)
+        self.delta_size += len(changed)
+
+        if self.delta_size >= COMPACT_THRESHOLD:
+            self.compact()
+
+    def add(self, user_id: int, song_ids):
+        """Kullanıcının yeni şarkılarını imzasına katar. Tam yeniden kurulum gerektirmez."""
+        if not len(song_ids):
+            return
+        with self._lock:
+            if not self.built:
+                return  # İlk build zaten veritabanından okuyacak
+            row, new = self._row_for(user_id)
+            self._set_signature(row, np.minimum(self.signatures[row], self._hash(song_ids).min(axis=0)), new)
+            if self._touched is not None:
+                self._touched.add(user_id)
+
+    def resync(self, db: Session, user_id: int, songs=None):
+        """
+        Kullanıcının imzasını güncel şarkı kümesinden yeniden hesaplar (silmelerden sonra).
+        MinHash'ten şarkı çıkarılamadığı için kümenin tamamı yeniden hash'lenir.
+        """
+        if not self.built:
+            return
+        if songs is None:
+            songs = ItemCFEngine._load_user_songs(db, user_id)
+        hashes = self._hash(sorted(songs)).min(axis=0) if songs else np.full(self.permutations, _MAX_HASH, dtype=np.uint32)
+        with self._lock:
+            row, new = self._row_for(user_id)
+            self._set_signature(row, hashes, new)
+            if self._touched is not None:
+                self._touched.add(user_id)
+
+    # --- SERVİS ---
+
+    def _empty(self, row: int) -> bool:
+        # Hash'ler < 2^31 olduğundan _MAX_HASH sadece şarkısı kalmamış (resync) imzalarda görülür
+        return self.signatures[row, 0] == _MAX_HASH
+
+    def _candidate_rows(self, row: int):
+        keys = self.band_keys[row]
+        found = []
+        for band in range(self.bands):
+            key = keys[band]
+            base_keys, base_rows = self.base[band]
+            lo = np.searchsorted(base_keys, key, side="left")
+            hi = np.searchsorted(base_keys, key, side="right")
+            found.append(base_rows[lo:min(hi, lo + LSH_MAX_BUCKET)])
+            extra = self.delta[band].get(int(key))
+            if extra:
+                found.append(np.fromiter(extra, dtype=np.int64, count=len(extra)))
+        rows = np.unique(np.concatenate(found))
+        # Anahtarı sonradan değişmiş (bayat) kayıtları ve kullanıcının kendisini çıkar
+        rows = rows[(self.band_keys[rows] == keys).any(axis=1) & (rows != row)]
+        return rows
+
+    def similar(self, user_id: int, limit: int = 100):
+        """
+        LSH adayları arasında tahmini Jaccard'a göre en benzer kullanıcılar.
+        Sonuç: [(user_id, jaccard), ...] azalan sırada.
+        """
+        with self._lock:
+            row = self.user_pos.get(user_id)
+            if row is None or self._empty(row):
+                return []
+            rows = self._candidate_rows(row)
+            if len(rows) == 0:
+                return []
+            scores = (self.signatures[rows] == self.signatures[row]).mean(axis=1)
+            k = min(limit, len(rows))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(int(self.user_ids[rows[i]]), float(scores[i])) for i in top]
+
+    def estimate(self, user_id: int, other_ids):
+        """Verilen kullanıcılarla tahmini Jaccard (imzası olmayanlar için 0)."""
+        with self._lock:
+            result = np.zeros(len(other_ids), dtype=np.float32)
+            row = self.user_pos.get(user_id)
+            if row is None or self._empty(row):
+                return result
+            positions = np.array([self.user_pos.get(int(i), -1) for i in other_ids], dtype=np.int64)
+            known = positions >= 0
+            result[known] = (self.signatures[positions[known]] == self.signatures[row]).mean(axis=1)
+            return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "built": self.built,
+                "users": self.size,
+                "permutations": self.permutations,
+                "bands": self.bands,
+                "rows_per_band": self.rows_per_band,
+                "jaccard_threshold": round((1 / self.bands) ** (1 / self.rows_per_band), 3),
+                "delta_size": self.delta_size,
+                "signature_bytes": int(self.size * self.permutations * 4),
+            }
+
+
+# Süreç çapında tek imza indeksi
+history_sketches = HistorySketchIndex()
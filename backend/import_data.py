@@ -1,7 +1,9 @@
 import pandas as pd
-from sqlalchemy.orm import Session
-from database import SessionLocal, engine
+from sqlalchemy import insert, select
+from concurrent.futures import ProcessPoolExecutor
+from database import engine
 import models, schemas, crud, ai_service
+from vector_codec import encode_vector
 import json
 import os
 import sys
@@ -9,124 +11,233 @@ import sys
 # Veritabanı tablolarını oluştur
 models.Base.metadata.create_all(bind=engine)
 
-def veri_yukle_baslat():
-    # --- AYARLAR ---
-    csv_dosya_adi = "kullancı veri setimiz 23.12.csv"
-    
-    # Dosya kontrolü
-    if not os.path.exists(csv_dosya_adi):
-        print(f"❌ HATA: '{csv_dosya_adi}' bulunamadı!")
-        return
+# --- AYARLAR ---
+CSV_DOSYA_ADI = "kullancı veri setimiz 23.12.csv"
+CHUNK_SIZE = 1000                         # Her parçada (chunk) işlenecek satır sayısı
+CHECKPOINT_PATH = "import_checkpoint.json"  # Yarıda kalan import buradan devam eder
+HASH_WORKERS = os.cpu_count() or 2        # bcrypt için süreç (process) sayısı
 
-    print("📊 Veri seti okunuyor...")
-    try:
-        df = pd.read_csv(csv_dosya_adi, encoding='utf-8')
-        df.columns = df.columns.str.strip() # Sütun isimlerindeki boşlukları temizle
-    except Exception as e:
-        print(f"❌ CSV okuma hatası: {e}")
-        return
 
-    db = SessionLocal()
-    print(f"🚀 Toplam {len(df)} satır veri işlenecek...")
+def _checkpoint_oku(csv_dosya_adi):
+    if not os.path.exists(CHECKPOINT_PATH):
+        return None
+    with open(CHECKPOINT_PATH, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    # Farklı bir dosyanın checkpoint'i ise yok say
+    return checkpoint if checkpoint.get("csv") == csv_dosya_adi else None
 
-    basarili = 0
-    hatali = 0
-    
-    for index, row in df.iterrows():
-        # EN KRİTİK NOKTA: db_user değişkenini burada güvenli başlatıyoruz
-        db_user = None 
 
+def _checkpoint_yaz(checkpoint):
+    tmp_path = CHECKPOINT_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(tmp_path, CHECKPOINT_PATH)  # Atomik: yarım yazılmış checkpoint kalmaz
+
+
+def _satirlari_hazirla(chunk, start_index):
+    """CSV satırlarını doğrular, temizler. (kayıtlar, hatalı sayısı) döner."""
+    kayitlar = []
+    hatali = 0
+    for offset, row in enumerate(chunk.to_dict("records")):
+        index = start_index + offset
         try:
-            # 1. Verileri Hazırla
             email = str(row['Email']).strip()
             username = str(row['Nickname']).strip()
             password = str(row['Şifre']).strip()
-            
-            # NLP Alanları
-            activity = str(row['Ne Yaparken Dinlediği'])
-            genres = str(row['Şarkı Türü'])
-            mood = str(row['Şarkı Duygusu'])
-
-            # 2. Kullanıcı Var mı Kontrol Et
-            existing_user = crud.get_user_by_email(db, email=email)
-            
-            if existing_user:
-                print(f"⚠️ Satır {index}: {email} zaten kayıtlı. Atlanıyor...")
-                continue # Döngünün başına dön
-            
-            # 3. Kullanıcı Yoksa Oluştur
-            print(f"➕ Yeni kullanıcı oluşturuluyor: {username}")
-            user_in = schemas.UserCreate(username=username, email=email, password=password)
-            
-            # Veritabanına kaydet
-            db_user = crud.create_user(db=db, user=user_in)
-            db.flush() # ID oluşsun diye zorla
-
-            # Hata Kontrolü: Eğer db_user hala yoksa hata fırlat
-            if db_user is None:
-                raise ValueError("Kullanıcı oluşturulamadı (db_user None döndü).")
-
-            # 4. Profil ve Vektör İşlemleri
-            combined_text = f"Aktivite: {activity}. Sevdiği Türler: {genres}. Ruh Hali: {mood}"
-            vector_list = ai_service.get_mood_vector(combined_text)
-            
+
+            # Email formatı vb. kontroller (şema üzerinden)
+            schemas.UserCreate(username=username, email=email, password=password)
+
             # Yaş verisi bazen boş gelebilir, kontrol et
-            try: 
+            try:
                 age_val = int(row['Yaş'])
-            except: 
+            except (TypeError, ValueError):
                 age_val = 18
 
-            profile_in = schemas.ProfileCreate(
-                age=age_val,
-                location="İstanbul",
-                hobbies=activity,
-                favorite_genres=genres,
-                mood_description=mood
-            )
-
-            # Profili kaydet
-            crud.create_user_profile(
-                db=db, 
-                profile=profile_in, 
-                user_id=db_user.id, 
-                mood_vector_json=json.dumps(vector_list)
-            )
-            
-            # 5. Geçmiş Şarkıları Ekle
-            if 'Geçmiş Şarkıları' in row and str(row['Geçmiş Şarkıları']) != 'nan':
-                songs = str(row['Geçmiş Şarkıları']).split(';')
-                for song_name in songs:
-                    s_name = song_name.strip()
-                    if s_name:
-                        # Şarkıyı bul veya oluştur
-                        db_song = db.query(models.Song).filter(models.Song.title == s_name).first()
-                        if not db_song:
-                            db_song = models.Song(title=s_name, artist="Bilinmiyor", genre="Pop", theme="Genel")
-                            db.add(db_song)
-                            db.commit()
-                            db.refresh(db_song)
-                        
-                        # Geçmişe işle
-                        hist = models.ListeningHistory(user_id=db_user.id, song_id=db_song.id)
-                        db.add(hist)
-                        db.commit()
-
-            basarili += 1
-            if basarili % 10 == 0:
-                print(f"✅ {basarili} kullanıcı tamamlandı...")
+            gecmis = row.get('Geçmiş Şarkıları')
+            sarkilar = []
+            if gecmis is not None and str(gecmis) != 'nan':
+                sarkilar = [s.strip() for s in str(gecmis).split(';') if s.strip()]
 
+            kayitlar.append({
+                "index": index,
+                "email": email,
+                "username": username,
+                "password": password,
+                "age": age_val,
+                # NLP Alanları
+                "activity": str(row['Ne Yaparken Dinlediği']),
+                "genres": str(row['Şarkı Türü']),
+                "mood": str(row['Şarkı Duygusu']),
+                "songs": sarkilar,
+            })
         except Exception as e:
-            db.rollback() # Hata olursa veritabanını geri al
             hatali += 1
             print(f"❌ SATIR {index} HATASI: {e}")
-            
+    return kayitlar, hatali
+
+
+def _mevcutlari_ele(conn, kayitlar):
+    """Email / kullanıcı adı zaten kayıtlı olanları TEK sorguyla (küme bazlı) eler."""
+    emails = [k["email"] for k in kayitlar]
+    usernames = [k["username"] for k in kayitlar]
+    mevcut_email = set(conn.execute(select(models.User.email).where(models.User.email.in_(emails))).scalars())
+    mevcut_username = set(conn.execute(
+        select(models.User.username).where(models.User.username.in_(usernames))
+    ).scalars())
+
+    yeni, atlanan = [], 0
+    gorulen_email, gorulen_username = set(), set()
+    for k in kayitlar:
+        if k["email"] in mevcut_email or k["email"] in gorulen_email or \
+                k["username"] in mevcut_username or k["username"] in gorulen_username:
+            atlanan += 1
             continue
+        gorulen_email.add(k["email"])
+        gorulen_username.add(k["username"])
+        yeni.append(k)
+    return yeni, atlanan
+
+
+def _chunk_yaz(conn, kayitlar, hashler, vektorler, sarki_map):
+    """
+    Bir chunk'ın tüm kayıtlarını toplu (bulk) insert'lerle yazar.
+    Bu chunk'ta eklenen şarkıların başlık -> id haritasını döner; sarki_map'e
+    çağıran tarafından transaction commit edildikten SONRA katılmalıdır
+    (geri alınan chunk'ın id'leri haritada kalırsa sonraki chunk'lar var
+    olmayan şarkılara geçmiş yazar).
+    """
+    # 1. Kullanıcılar
+    conn.execute(insert(models.User), [
+        {"username": k["username"], "email": k["email"], "password_hash": h}
+        for k, h in zip(kayitlar, hashler)
+    ])
+    user_ids = dict(conn.execute(
+        select(models.User.email, models.User.id).where(models.User.email.in_([k["email"] for k in kayitlar]))
+    ).all())
+
+    # 2. Otomatik favori listeleri (bkz. crud.create_user)
+    conn.execute(insert(models.Playlist), [
+        {"name": "Favorilenler", "user_id": user_ids[k["email"]], "is_favorite": True}
+        for k in kayitlar
+    ])
+
+    # 3. Profiller + vektörler
+    conn.execute(insert(models.UserProfile), [
+        {
+            "user_id": user_ids[k["email"]],
+            "age": k["age"],
+            "location": "İstanbul",
+            "hobbies": k["activity"],
+            "favorite_genres": k["genres"],
+            "mood_description": k["mood"],
+            "mood_vector": encode_vector(v),
+        }
+        for k, v in zip(kayitlar, vektorler)
+    ])
+
+    # 4. Geçmiş şarkıları: bellekteki başlık -> id haritası, olmayanlar toplu eklenir
+    yeni_basliklar = list(dict.fromkeys(
+        s for k in kayitlar for s in k["songs"] if s not in sarki_map
+    ))
+    yeni_sarkilar = {}
+    if yeni_basliklar:
+        conn.execute(insert(models.Song), [
+            {"title": t, "artist": "Bilinmiyor", "genre": "Pop", "theme": "Genel"} for t in yeni_basliklar
+        ])
+        for start in range(0, len(yeni_basliklar), 500):
+            parca = yeni_basliklar[start:start + 500]
+            for song_id, title in conn.execute(
+                select(models.Song.id, models.Song.title).where(models.Song.title.in_(parca))
+            ):
+                yeni_sarkilar.setdefault(title, song_id)
+
+    gecmis = [
+        {"user_id": user_ids[k["email"]], "song_id": sarki_map.get(s) or yeni_sarkilar[s]}
+        for k in kayitlar for s in k["songs"]
+    ]
+    if gecmis:
+        conn.execute(insert(models.ListeningHistory), gecmis)
+    return yeni_sarkilar
+
+
+def veri_yukle_baslat(csv_dosya_adi: str = CSV_DOSYA_ADI, chunk_size: int = CHUNK_SIZE):
+    # Dosya kontrolü
+    if not os.path.exists(csv_dosya_adi):
+        print(f"❌ HATA: '{csv_dosya_adi}' bulunamadı!")
+        return
+
+    checkpoint = _checkpoint_oku(csv_dosya_adi) or {
+        "csv": csv_dosya_adi, "chunk": -1, "basarili": 0, "hatali": 0, "atlanan": 0
+    }
+    if checkpoint["chunk"] >= 0:
+        print(f"⏯️ Checkpoint bulundu, {checkpoint['chunk'] + 1}. chunk'tan devam ediliyor...")
+
+    print("📊 Veri seti parça parça okunuyor...")
+    try:
+        reader = pd.read_csv(csv_dosya_adi, encoding='utf-8', chunksize=chunk_size)
+    except Exception as e:
+        print(f"❌ CSV okuma hatası: {e}")
+        return
+
+    # Şarkı başlığı -> id haritası bir kez yüklenir (satır başına SELECT yok)
+    with engine.connect() as conn:
+        sarki_map = {}
+        for song_id, title in conn.execute(select(models.Song.id, models.Song.title)):
+            sarki_map.setdefault(title, song_id)
+
+    with ProcessPoolExecutor(max_workers=HASH_WORKERS) as pool:
+        for chunk_no, chunk in enumerate(reader):
+            if chunk_no <= checkpoint["chunk"]:
+                continue  # Daha önce tamamlanmış
+
+            chunk.columns = chunk.columns.str.strip() # Sütun isimlerindeki boşlukları temizle
+            kayitlar, hatali = _satirlari_hazirla(chunk, chunk_no * chunk_size)
+
+            with engine.connect() as conn:
+                kayitlar, atlanan = _mevcutlari_ele(conn, kayitlar)
+
+            if kayitlar:
+                # bcrypt CPU'yu yorar: süreç havuzunda paralel
+                hashler = list(pool.map(crud.get_password_hash, [k["password"] for k in kayitlar], chunksize=16))
+
+                # Tüm profil metinleri batch'li encode ile (önbellek tekrarları atlar)
+                metinler = [
+                    f"Aktivite: {k['activity']}. Sevdiği Türler: {k['genres']}. Ruh Hali: {k['mood']}"
+                    for k in kayitlar
+                ]
+                vektorler = ai_service.get_mood_vectors(metinler)
+
+                try:
+                    # Chunk başına TEK transaction
+                    with engine.begin() as conn:
+                        yeni_sarkilar = _chunk_yaz(conn, kayitlar, hashler, vektorler, sarki_map)
+                    sarki_map.update(yeni_sarkilar)  # Sadece commit edilen şarkılar haritaya girer
+                except Exception as e:
+                    print(f"❌ CHUNK {chunk_no} HATASI (geri alındı): {e}")
+                    hatali += len(kayitlar)
+                    kayitlar = []
+
+            checkpoint.update(
+                chunk=chunk_no,
+                basarili=checkpoint["basarili"] + len(kayitlar),
+                hatali=checkpoint["hatali"] + hatali,
+                atlanan=checkpoint["atlanan"] + atlanan,
+            )
+            _checkpoint_yaz(checkpoint)
+            print(f"✅ Chunk {chunk_no}: {len(kayitlar)} kullanıcı eklendi, {atlanan} zaten kayıtlı, {hatali} hatalı "
+                  f"(toplam {checkpoint['basarili']})")
+
+    # İş bitti: bir sonraki import baştan başlasın
+    if os.path.exists(CHECKPOINT_PATH):
+        os.remove(CHECKPOINT_PATH)
 
-    db.close()
     print("\n----------------SONUÇ RAPORU----------------")
-    print(f"✅ Başarılı: {basarili}")
-    print(f"❌ Hatalı:   {hatali}")
+    print(f"✅ Başarılı: {checkpoint['basarili']}")
+    print(f"⚠️ Atlanan:  {checkpoint['atlanan']}")
+    print(f"❌ Hatalı:   {checkpoint['hatali']}")
+    print(f"🧠 Embedding önbelleği: {ai_service.embedding_cache.stats()}")
     print("--------------------------------------------")
 
 if __name__ == "__main__":
-    veri_yukle_baslat()
+    veri_yukle_baslat(sys.argv[1] if len(sys.argv) > 1 else CSV_DOSYA_ADI)
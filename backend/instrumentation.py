@@ -0,0 +1,257 @@
+"""
+İstek başına ölçüm (instrumentation) ve /metrics (Prometheus metin formatı).
+
+- SQL: engine olaylarıyla her isteğin sorgu sayısı ve toplam sorgu süresi
+  (sync, read-only ve async motorlar dahil).
+- Aşamalar: kodun pahalı kısımları stage("embedding") gibi bir context manager
+  ile işaretlenir; süreler o anki isteğe yazılır. İstek dışında (CLI, arka plan
+  işi) çağrılırsa hiçbir şey yapmaz.
+- "handler" aşaması endpoint fonksiyonunun kendisidir; toplam süreden handler'ın
+  düşülmesiyle kalan "framework" (doğrulama, response_model serileştirme,
+  middleware) da raporlanır.
+- Rota başına gecikme histogramları, SQL sayısı histogramı ve aşama toplamları
+  /metrics üzerinden Prometheus metin formatında okunur.
+- SLOW_REQUEST_MS > 0 ise bu süreyi aşan istekler çalıştırdıkları SQL
+  ifadeleriyle birlikte loglanır (ifadeler sadece bu durumda tutulur).
+- Yanıtlara Server-Timing başlığı eklenir (tarayıcı geliştirici araçlarında görünür).
+
+Ek yük istek başına birkaç mikro saniyedir (contextvar + perf_counter).
+"""
+import functools
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi import Request
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from starlette.routing import Match
+
+INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "1") != "0"
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))  # 0 = yavaş istek logu kapalı
+SLOW_REQUEST_MAX_STATEMENTS = int(os.getenv("SLOW_REQUEST_MAX_STATEMENTS", "100"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class RequestStats:
+    """Tek bir isteğin ölçümleri (contextvar ile thread'ler arasında paylaşılır)."""
+
+    __slots__ = ("sql_count", "sql_seconds", "stages", "statements")
+
+    def __init__(self, keep_statements: bool):
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.stages = {}
+        self.statements = [] if keep_statements else None
+
+
+_current = ContextVar("request_stats", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """Kod bloğunun süresini o anki isteğin `name` aşamasına ekler."""
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.stages[name] = stats.stages.get(name, 0.0) + time.perf_counter() - start
+
+
+# --- SQL OLAYLARI ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _current.get() is not None:
+        context._instrumentation_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    start = getattr(context, "_instrumentation_start", None)
+    if stats is None or start is None:
+        return
+    elapsed = time.perf_counter() - start
+    stats.sql_count += 1
+    stats.sql_seconds += elapsed
+    if stats.statements is not None and len(stats.statements) < SLOW_REQUEST_MAX_STATEMENTS:
+        stats.statements.append((elapsed, statement))
+
+
+def instrument_engines(*engines):
+    """SQL sayım/süre dinleyicilerini motorlara bağlar (async motorlar için .sync_engine verin)."""
+    for engine in {id(e): e for e in engines}.values():
+        if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# --- ENDPOINT SÜRESİ ---
+
+def _timed_endpoint(endpoint):
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            with stage("handler"):
+                return await endpoint(*args, **kwargs)
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            with stage("handler"):
+                return endpoint(*args, **kwargs)
+    return wrapper
+
+
+class InstrumentedRoute(APIRoute):
+    """Endpoint fonksiyonunu "handler" aşaması olarak ölçen rota sınıfı (app.router.route_class)."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+
+# --- METRİK KAYDI ---
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, buckets):
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, buckets, value):
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+def _labels(**labels):
+    return ",".join(f'{k}="{str(v)}"' for k, v in labels.items())
+
+
+class Metrics:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}    # (method, route, status) -> adet
+        self.latency = {}     # (method, route) -> _Histogram (saniye)
+        self.statements = {}  # (method, route) -> _Histogram (istek başına SQL sayısı)
+        self.sql_seconds = {}  # (method, route) -> toplam SQL süresi
+        self.stages = {}      # (method, route, aşama) -> [toplam saniye, adet]
+        self.slow_requests = {}  # (method, route) -> adet
+
+    def record(self, method, route, status, seconds, stats, slow):
+        key = (method, route)
+        with self._lock:
+            self.requests[(method, route, status)] = self.requests.get((method, route, status), 0) + 1
+            self.latency.setdefault(key, _Histogram(LATENCY_BUCKETS)).observe(LATENCY_BUCKETS, seconds)
+            self.statements.setdefault(key, _Histogram(STATEMENT_BUCKETS)).observe(STATEMENT_BUCKETS, stats.sql_count)
+            self.sql_seconds[key] = self.sql_seconds.get(key, 0.0) + stats.sql_seconds
+            for name, value in stats.stages.items():
+                entry = self.stages.setdefault((method, route, name), [0.0, 0])
+                entry[0] += value
+                entry[1] += 1
+            if slow:
+                self.slow_requests[key] = self.slow_requests.get(key, 0) + 1
+
+    @staticmethod
+    def _histogram_lines(name, buckets, histograms):
+        lines = [f"# TYPE {name} histogram"]
+        for (method, route), h in sorted(histograms.items()):
+            base = _labels(method=method, route=route)
+            for bound, count in zip(buckets, h.counts):
+                lines.append(f'{name}_bucket{{{base},le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{{base},le="+Inf"}} {h.count}')
+            lines.append(f"{name}_sum{{{base}}} {h.total}")
+            lines.append(f"{name}_count{{{base}}} {h.count}")
+        return lines
+
+    def render(self) -> str:
+        """Prometheus metin formatı (text/plain; version=0.0.4)."""
+        with self._lock:
+            lines = ["# TYPE http_requests_total counter"]
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(f"http_requests_total{{{_labels(method=method, route=route, status=status)}}} {count}")
+            lines += self._histogram_lines("http_request_duration_seconds", LATENCY_BUCKETS, self.latency)
+            lines += self._histogram_lines("db_statements_per_request", STATEMENT_BUCKETS, self.statements)
+            lines.append("# TYPE db_statement_seconds_total counter")
+            for (method, route), value in sorted(self.sql_seconds.items()):
+                lines.append(f"db_statement_seconds_total{{{_labels(method=method, route=route)}}} {value}")
+            lines.append("# TYPE request_stage_seconds summary")
+            for (method, route, name), (total, count) in sorted(self.stages.items()):
+                base = _labels(method=method, route=route, stage=name)
+                lines.append(f"request_stage_seconds_sum{{{base}}} {total}")
+                lines.append(f"request_stage_seconds_count{{{base}}} {count}")
+            lines.append("# TYPE http_slow_requests_total counter")
+            for (method, route), count in sorted(self.slow_requests.items()):
+                lines.append(f"http_slow_requests_total{{{_labels(method=method, route=route)}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+# --- MIDDLEWARE ---
+
+def _route_template(request: Request) -> str:
+    """Etiket olarak ham yol değil rota şablonu (kardinalite sınırlı kalsın)."""
+    route = request.scope.get("route")
+    if route is None:
+        # Yanıt önbelleğinden dönen istekler router'a hiç uğramaz
+        for candidate in request.app.router.routes:
+            match, _ = candidate.matches(request.scope)
+            if match == Match.FULL:
+                route = candidate
+                break
+    return getattr(route, "path", "unmatched")
+
+
+def _server_timing(total, stats):
+    parts = [f"db;dur={stats.sql_seconds * 1000:.1f};desc=\"{stats.sql_count} sorgu\""]
+    parts += [f"{name};dur={value * 1000:.1f}" for name, value in stats.stages.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def _log_slow(method, route, path, total, stats):
+    stages = ", ".join(f"{name}={value * 1000:.1f}ms" for name, value in stats.stages.items())
+    print(f"🐢 Yavaş istek: {method} {path} ({route}) {total * 1000:.1f} ms | "
+          f"SQL {stats.sql_count} sorgu {stats.sql_seconds * 1000:.1f} ms | {stages}")
+    for elapsed, statement in stats.statements or ():
+        print(f"     {elapsed * 1000:7.2f} ms  {' '.join(statement.split())}")
+
+
+async def middleware(request: Request, call_next):
+    if not INSTRUMENTATION_ENABLED:
+        return await call_next(request)
+
+    stats = RequestStats(keep_statements=SLOW_REQUEST_MS > 0)
+    token = _current.set(stats)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        total = time.perf_counter() - start
+        _current.reset(token)
+        if "handler" in stats.stages:
+            stats.stages["framework"] = max(0.0, total - stats.stages["handler"])
+        route = _route_template(request)
+        slow = SLOW_REQUEST_MS > 0 and total * 1000 >= SLOW_REQUEST_MS
+        metrics.record(request.method, route, status, total, stats, slow)
+        if slow:
+            _log_slow(request.method, route, request.url.path, total, stats)
+
+    response.headers["Server-Timing"] = _server_timing(total, stats)
+    return response
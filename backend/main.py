@@ -1,22 +1,58 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 import json 
 from playlist_service import PlaylistManager
-import csv
-import ast
-import os
 
 
 # Kendi yazdığımız modülleri içeri alıyoruz
-import models, schemas, crud
+import models, schemas, crud_async, executors, instrumentation, export_service
+from vector_codec import encode_vector
 import ai_service 
-from database import SessionLocal, engine
+import song_search
+from encoder_queue import BatchingEncoder, EncoderQueueFull
+from database import SessionLocal, ReadSessionLocal, AsyncSessionLocal, AsyncReadSessionLocal, engine
+from database import read_engine, async_engine, async_read_engine
+from response_cache import response_cache, user_playlists_tag, playlist_tag
 
 # Veritabanı tablolarını oluştur
 models.Base.metadata.create_all(bind=engine)
+song_search.ensure_search_index(engine, backfill=False)  # Dolu katalogda indeksi migrate_schema kurar
 
 app = FastAPI()
+# Her endpoint "handler" aşaması olarak ölçülür (bkz. instrumentation.py)
+app.router.route_class = instrumentation.InstrumentedRoute
+instrumentation.instrument_engines(engine, read_engine, async_engine.sync_engine, async_read_engine.sync_engine)
+
+# --- YANIT ÖNBELLEĞİ (ETag / 304, bkz. response_cache.py) ---
+# Yazma yolları etiketleri invalidate eder: profil -> "recommendations", playlist -> kullanıcı/playlist etiketleri
+response_cache.cache_route("/content/questions", ttl=3600, tags=lambda p: ["questions"])
+response_cache.cache_route(
+    "/users/{user_id}/recommendations/", ttl=300,
+    # Sadece mode=hybrid kullanıcının playlistlerine bakar; mood yanıtları playlist yazmalarında düşmez
+    tags=lambda p: ["recommendations"] + ([user_playlists_tag(p["user_id"])] if p.get("mode") == "hybrid" else []),
+)
+response_cache.cache_route(
+    "/users/{user_id}/song-recommendations/", ttl=300,
+    tags=lambda p: ["recommendations", user_playlists_tag(p["user_id"])],  # Playlistteki şarkılar hariç tutulur
+)
+response_cache.cache_route("/users/{user_id}/because-you-listened/", ttl=60,
+                           tags=lambda p: [user_playlists_tag(p["user_id"])])
+response_cache.cache_route("/users/{user_id}/playlists/", ttl=300, tags=lambda p: [user_playlists_tag(p["user_id"])])
+response_cache.cache_route("/users/{user_id}/favorites/", ttl=300, tags=lambda p: [user_playlists_tag(p["user_id"])])
+response_cache.cache_route("/playlists/{playlist_id}/items", ttl=300, tags=lambda p: [playlist_tag(p["playlist_id"])])
+# Katalog ayrı bir komutla (catalog_loader) yüklendiği için sadece TTL ile tazelenir
+response_cache.cache_route("/songs/search", ttl=300, tags=lambda p: ["catalog"])
+response_cache.cache_route("/songs/autocomplete", ttl=300, tags=lambda p: ["catalog"])
+app.middleware("http")(response_cache.middleware)
+
+# En dışta: önbellekten dönen yanıtlar dahil her isteği ölçer (/metrics)
+app.middleware("http")(instrumentation.middleware)
+
+# Eşzamanlı profil oluşturma istekleri tek bir batch'li model çağrısını paylaşır
+mood_encoder = BatchingEncoder(ai_service.get_mood_vectors, executor=executors.encoder_executor)
 
 # --- DEPENDENCY ---
 def get_db():
@@ -26,6 +62,23 @@ def get_db():
     finally:
         db.close()
 
+# Sadece okuma yapan endpointler için (salt-okunur bağlantı havuzu)
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Async endpointler için (aiosqlite): istek beklerken threadpool'dan thread tutmaz
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
 # ==========================================
 # 1. BAŞLANGIÇ AYARLARI (RAPORA GÖRE GÜNCELLENDİ)
 # ==========================================
@@ -93,90 +146,52 @@ def startup_event():
         db.add_all([q1, q2, q3])
         db.commit()
         print("✅ Rapora uygun sorular veritabanına eklendi!")
-    if db.query(models.Song).count() == 0:
-        print("📥 Şarkı veritabanı hazırlanıyor...")
-        
-        # Senin verdiğin dosya yolu
-        csv_path = r"C:\Users\Beliz\Desktop\music_project\backend\songs_labeled_FINAL_EN_TR_THEME_TFIDF_v2.csv"
-        
-        if not os.path.exists(csv_path):
-            print(f"❌ HATA: Dosya bulunamadı -> {csv_path}")
-            # Alternatif: Dosya proje klasöründeyse sadece ismini dene
-            csv_path = "songs_labeled_FINAL_EN_TR_THEME_TFIDF_v2.csv"
-
-        if os.path.exists(csv_path):
-            try:
-                with open(csv_path, "r", encoding="utf-8") as f:
-                    reader = csv.DictReader(f)
-                    songs_to_add = []
-                    
-                    print(f"📂 CSV Okunuyor: {csv_path}")
-                    
-                    for row in reader:
-                        # --- VERİ TEMİZLEME ---
-                        
-                        # 1. Sanatçı İsmi Temizliği (['Artist'] -> Artist)
-                        artist_raw = row.get("artists", "Bilinmiyor") # CSV'deki sütun adı 'artists' ise
-                        try:
-                            if artist_raw.startswith("['"):
-                                artist_list = ast.literal_eval(artist_raw)
-                                artist_clean = ", ".join(artist_list)
-                            else:
-                                artist_clean = artist_raw
-                        except:
-                            artist_clean = artist_raw
-
-                        # 2. Sütun Eşleştirme
-                        # CSV başlıklarının tam olarak böyle olduğunu varsayıyorum.
-                        # Değilse row["..."] içindeki kısımları CSV'ne göre değiştir.
-                        song = models.Song(
-                            title=row.get("name", "İsimsiz"),   # CSV'de 'name' mi 'track_name' mi kontrol et
-                            artist=artist_clean,
-                            genre=row.get("genre", "Genel"),
-                            theme=row.get("THEME", None) or row.get("emotion_final_adjusted", None) # Hangi sütun varsa
-                        )
-                        songs_to_add.append(song)
-                    
-                    # Veritabanına kaydet
-                    db.add_all(songs_to_add)
-                    db.commit()
-                    print(f"✅ Başarılı: {len(songs_to_add)} şarkı veritabanına yüklendi!")
-                    
-            except Exception as e:
-                print(f"❌ Şarkılar yüklenirken hata oluştu: {e}")
-        else:
-            print("⚠️ CSV dosyası bulunamadığı için şarkı yüklenemedi.")
+    # Şarkı kataloğu artık ayrı bir komutla yüklenir (sunucu açılışını bloklamasın diye)
+    if db.query(models.Song.id).first() is None:
+        print("⚠️ Şarkı kataloğu boş! Yüklemek için: python catalog_loader.py <csv_dosyası>")
     db.close()
 
 
+@app.on_event("startup")
+async def start_mood_encoder():
+    await mood_encoder.start()
+    neighbor_job.start()
+
+@app.on_event("shutdown")
+async def stop_mood_encoder():
+    await mood_encoder.stop()
+    neighbor_job.stop()
+    executors.shutdown()
+
+
 # ==========================================
 # 2. API ENDPOINTLERİ
 # ==========================================
 
 @app.get("/")
-def home():
+async def home():
     return {"message": "Sistem Aktif! /docs adresine giderek test et."}
 
 # --- SORULARI GETİR ---
 @app.get("/content/questions", response_model=List[schemas.Question])
-def get_questions(db: Session = Depends(get_db)):
+async def get_questions(db: AsyncSession = Depends(get_async_read_db)):
     """Frontend'in ekrana çizeceği soruları buradan çekiyoruz"""
-    return db.query(models.Question).order_by(models.Question.question_order).all()
+    return await crud_async.get_questions(db)
 
 # --- KULLANICI KAYIT ---
 @app.post("/users/", response_model=schemas.User)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, email=user.email)
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await crud_async.get_user_by_email(db, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Bu email zaten kayıtlı.")
-    return crud.create_user(db=db, user=user)
+    return await crud_async.create_user(db=db, user=user)
 
 # --- PROFİL OLUŞTURMA (NLP BURADA) ---
 @app.post("/users/{user_id}/profile/", response_model=schemas.Profile)
-def create_profile_for_user(
+async def create_profile_for_user(
     user_id: int, 
     profile: schemas.ProfileCreate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # 1. ÇORBA YAPMA (SOUP)
     # 3. sorunun cevabı artık seçmeli geldiği için onu da metne ekliyoruz.
@@ -186,37 +201,175 @@ def create_profile_for_user(
         f"Ruh Hali: {profile.mood_description}"
     )
 
-    # 2. NLP ile Vektör Hesapla
-    vector_list = ai_service.get_mood_vector(combined_text)
+    # 2. NLP ile Vektör Hesapla (mikro-batch kuyruğu üzerinden, event loop'u bloklamadan)
+    try:
+        with instrumentation.stage("embedding"):
+            vector_list = await mood_encoder.encode(combined_text)
+    except EncoderQueueFull:
+        raise HTTPException(status_code=503, detail="Sunucu şu an çok yoğun, lütfen tekrar deneyin.")
     
-    # 3. Vektörü String'e çevir
-    vector_json_str = json.dumps(vector_list)
+    # 3. Vektörü binary float32 formatına çevir (JSON yerine)
+    vector_blob = encode_vector(vector_list)
     
     print(f"🤖 NLP Vektörü Oluştu. Boyut: {len(vector_list)}")
 
-    # 4. Kaydet
-    return crud.create_user_profile(
+    # 4. Kaydet (AsyncSession: yazma beklenirken event loop serbest)
+    return await crud_async.create_user_profile(
         db=db, 
         profile=profile, 
         user_id=user_id,
-        mood_vector_json=vector_json_str 
+        mood_vector=vector_blob
     )
 
+# --- EMBEDDING ÖNBELLEK İSTATİSTİKLERİ ---
+@app.get("/ai/cache-stats")
+async def get_embedding_cache_stats():
+    """Önbellek sayesinde atlanan model çağrılarını gösterir"""
+    return {**ai_service.embedding_cache.stats(), "encoder_queue": mood_encoder.stats()}
+
+# --- YANIT ÖNBELLEĞİ İSTATİSTİKLERİ ---
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Rota başına gecikme, SQL ve aşama metrikleri (Prometheus metin formatı)"""
+    return PlainTextResponse(instrumentation.metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+async def get_response_cache_stats():
+    """Rota bazında isabet oranları, bellek kullanımı, 304 ve silme sayıları"""
+    return response_cache.stats()
+
 @app.get("/users/{user_id}", response_model=schemas.User)
-def read_user(user_id: int, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+async def read_user(user_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    db_user = await crud_async.get_user(db, user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
     return db_user
 
 # --- ÖNERİ SİSTEMİ (Şimdilik boş döner, sonra dataset eklenince çalışacak) ---
 import recommendation 
+from user_neighbors import neighbor_job, NEIGHBORS_K
+import vector_index
+
+
+@app.on_event("startup")
+def map_user_vector_store():
+    # Paylaşılan depo açıksa her worker açılışta map etsin: yazdığı profiller depoya gider,
+    # diğer worker'ların eklemeleri de ilk aramayı beklemeden görünür
+    if vector_index.USER_VECTOR_STORE_PATH:
+        with SessionLocal() as db:
+            recommendation.user_index.ensure_loaded(db)
+
+
 @app.get("/users/{user_id}/recommendations/")
-def get_recommendations(user_id: int, db: Session = Depends(get_db)):
-    matches = recommendation.get_similar_users(db, current_user_id=user_id)
+def get_recommendations(
+    user_id: int,
+    top_k: int = Query(3, ge=1, le=NEIGHBORS_K),
+    mode: str = Query("mood", pattern="^(mood|hybrid)$"),
+    history_weight: float = Query(recommendation.HYBRID_HISTORY_WEIGHT, ge=0.0, le=1.0),
+    db: Session = Depends(get_read_db),
+):
+    if mode == "hybrid":
+        # Mood kosinüsü + dinleme geçmişi (MinHash/LSH) harmanı, canlı hesaplanır
+        return {
+            "user_id": user_id,
+            "recommended_users": recommendation.get_hybrid_similar_users(
+                db, current_user_id=user_id, top_k=top_k, history_weight=history_weight
+            ),
+            "source": "hybrid",
+            "history_weight": history_weight,
+        }
+
+    # user_neighbors tablosundan tek indeksli okuma (arka plan işi doldurur); bayatlık bilgisiyle döner
+    result = recommendation.get_precomputed_similar_users(db, current_user_id=user_id, top_k=top_k)
+    return {
+        "user_id": user_id,
+        **result
+    }
+
+@app.get("/neighbors/stats")
+async def get_neighbor_job_stats():
+    """Komşu tablosu arka plan işinin durumu (bekleyen kullanıcılar, son yenileme)."""
+    return neighbor_job.stats()
+
+@app.get("/similarity/stats")
+async def get_similarity_index_stats():
+    """Kullanıcı vektör indeksi (motor, bellek) ve dinleme geçmişi MinHash imzalarının durumu."""
+    return {
+        "user_index": recommendation.user_index.memory_footprint(),
+        "history_sketches": recommendation.history_sketches.stats(),
+    }
+
+# --- ŞARKI ÖNERİLERİ (Şarkı vektör matrisi: python song_embeddings.py ile oluşturulur) ---
+from song_embeddings import song_index
+
+@app.get("/users/{user_id}/song-recommendations/")
+def get_song_recommendations(
+    user_id: int,
+    top_k: int = Query(10, ge=1, le=100),
+    genre: Optional[str] = None,
+    theme: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Kullanıcının mood vektörüne en uygun şarkılar (playlistlerindekiler hariç)"""
+    if not song_index.ensure_loaded():
+        raise HTTPException(status_code=503, detail="Şarkı vektörleri henüz oluşturulmadı.")
+    songs = recommendation.get_song_recommendations(db, user_id, top_k=top_k, genre=genre, theme=theme)
     return {
         "user_id": user_id,
-        "recommended_users": matches
+        "recommended_songs": songs
+    }
+
+# --- ŞARKI ARAMA (SQLite FTS5, bkz. song_search.py) ---
+
+@app.get("/songs/search", response_model=schemas.SongSearchPage)
+def search_songs(q: str, limit: int = Query(20, ge=1, le=100), offset: int = Query(0, ge=0, le=1000),
+                 db: Session = Depends(get_read_db)):
+    """Başlık, sanatçı, tür ve temada BM25 sıralı arama (sonraki sayfa için next_offset)"""
+    results, next_offset = song_search.search_songs(db, q, limit=limit, offset=offset)
+    return {"results": results, "next_offset": next_offset}
+
+@app.get("/songs/autocomplete", response_model=List[schemas.SongBase])
+def autocomplete_songs(q: str, limit: int = Query(10, ge=1, le=20), db: Session = Depends(get_read_db)):
+    """Arama kutusu için başlık/sanatçı önek tamamlama"""
+    return song_search.autocomplete(db, q, limit=limit)
+
+@app.get("/songs/{song_id}/similar/")
+def get_similar_songs(song_id: int, top_k: int = Query(10, ge=1, le=100), db: Session = Depends(get_read_db)):
+    """'Buna benzer şarkılar' listesi"""
+    if not song_index.ensure_loaded():
+        raise HTTPException(status_code=503, detail="Şarkı vektörleri henüz oluşturulmadı.")
+    return {
+        "song_id": song_id,
+        "similar_songs": recommendation.get_similar_songs(db, song_id, top_k=top_k)
+    }
+
+# --- "BUNU DİNLEDİĞİN İÇİN" (Item-item collaborative filtering) ---
+from collaborative import cf_engine
+
+@app.get("/users/{user_id}/because-you-listened/")
+def get_because_you_listened(user_id: int, top_k: int = Query(10, ge=1, le=100),
+                             db: Session = Depends(get_read_db)):
+    """Dinleme geçmişi ve playlistlere göre benzer kullanıcıların da sevdiği şarkılar"""
+    cf_engine.ensure_built(db)
+    with instrumentation.stage("similarity"):
+        matches = cf_engine.recommend(user_id, top_k=top_k)
+
+    # Önerilen ve 'sebep' şarkıların bilgileri tek sorguda
+    song_ids = {song_id for song_id, _, _ in matches} | {because for _, _, because in matches}
+    songs = {s.id: s for s in db.query(models.Song).filter(models.Song.id.in_(song_ids)).all()} if song_ids else {}
+
+    return {
+        "user_id": user_id,
+        "recommended_songs": [
+            {
+                "song_id": song_id,
+                "title": songs[song_id].title if song_id in songs else None,
+                "score": score,
+                "because_of_song_id": because,
+                "because_of": songs[because].title if because in songs else None,
+            }
+            for song_id, score, because in matches
+        ]
     }
 
 # --- PLAYLIST ENDPOINTLERİ ---
@@ -227,20 +380,65 @@ def create_playlist(user_id: int, playlist: schemas.PlaylistCreate, db: Session
     manager = PlaylistManager(db)
     return manager.create_playlist(user_id=user_id, name=playlist.name, is_favorite=False)
 
-@app.get("/users/{user_id}/playlists/", response_model=List[schemas.PlaylistOut])
-def get_playlists(user_id: int, db: Session = Depends(get_db)):
-    """Kullanıcının tüm playlistlerini getirir"""
+@app.delete("/playlists/{playlist_id}")
+def delete_playlist(playlist_id: int, db: Session = Depends(get_db)):
+    """Özel playlist'i şarkılarıyla birlikte siler (Favoriler silinemez)"""
+    manager = PlaylistManager(db)
+    return manager.delete_playlist(playlist_id)
+
+@app.get("/users/{user_id}/playlists/", response_model=List[schemas.PlaylistSummaryOut])
+def get_playlists(user_id: int, db: Session = Depends(get_read_db)):
+    """Kullanıcının tüm playlistlerini özet olarak getirir (şarkılar: /playlists/{id}/items)"""
     manager = PlaylistManager(db)
     return manager.get_user_playlists(user_id)
 
+@app.get("/users/{user_id}/export")
+def export_user_data(user_id: int, format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+                     cursor: Optional[str] = None, db: Session = Depends(get_read_db)):
+    """Playlistler, playlist şarkıları ve dinleme geçmişi akış olarak (NDJSON/CSV); cursor ile devam edilir"""
+    if db.get(models.User, user_id) is None:
+        raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
+    media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_service.stream_export(ReadSessionLocal, user_id, fmt=format, cursor=cursor),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="user_{user_id}.{format}"'},
+    )
+
+@app.get("/playlists/{playlist_id}/items", response_model=schemas.PlaylistItemsPage)
+def get_playlist_items(playlist_id: int, limit: int = Query(50, ge=1, le=200), cursor: Optional[str] = None,
+                       db: Session = Depends(get_read_db)):
+    """Playlist şarkılarını sayfa sayfa getirir (en son eklenen en üstte); sonraki sayfa için next_cursor"""
+    manager = PlaylistManager(db)
+    return manager.get_playlist_items(playlist_id, limit=limit, cursor=cursor)
+
 @app.get("/users/{user_id}/favorites/", response_model=schemas.PlaylistOut)
 def get_favorites(user_id: int, db: Session = Depends(get_db)):
     """Sadece favorilenler listesini döner"""
     manager = PlaylistManager(db)
-    return manager.get_favorites_playlist(user_id)
+    return manager.get_favorites_playlist(user_id, with_items=True)
 
 # --- ŞARKI EKLEME / ÇIKARMA ---
 
+# Toplu işlemler: /songs/{song_id} rotalarından önce tanımlı olmalı
+@app.post("/playlists/{playlist_id}/songs/batch", response_model=schemas.PlaylistBatchOut)
+def add_songs_to_playlist(playlist_id: int, batch: schemas.PlaylistSongsBatch, db: Session = Depends(get_db)):
+    """Birden çok şarkıyı tek transaction'da ekler, her şarkı için sonuç döner (Max 500 kontrolü var)"""
+    manager = PlaylistManager(db)
+    return manager.add_songs_to_playlist(playlist_id, batch.song_ids)
+
+@app.post("/playlists/{playlist_id}/songs/batch-remove", response_model=schemas.PlaylistBatchOut)
+def remove_songs_from_playlist(playlist_id: int, batch: schemas.PlaylistSongsBatch, db: Session = Depends(get_db)):
+    """Birden çok şarkıyı tek seferde siler"""
+    manager = PlaylistManager(db)
+    return manager.remove_songs_from_playlist(playlist_id, batch.song_ids)
+
+@app.put("/playlists/{playlist_id}/songs/order", response_model=schemas.PlaylistBatchOut)
+def reorder_playlist(playlist_id: int, batch: schemas.PlaylistSongsBatch, db: Session = Depends(get_db)):
+    """Verilen şarkıları bu sırayla listenin en üstüne taşır"""
+    manager = PlaylistManager(db)
+    return manager.reorder_playlist(playlist_id, batch.song_ids)
+
 @app.post("/playlists/{playlist_id}/songs/{song_id}")
 def add_song_to_playlist(playlist_id: int, song_id: int, db: Session = Depends(get_db)):
     """Bir playliste şarkı ekler (Max 500 kontrolü var)"""
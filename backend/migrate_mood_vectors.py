@@ -0,0 +1,66 @@
+"""
+Tek seferlik migration: user_profiles.mood_vector kolonundaki JSON string
+vektörleri binary float32 formatına (vector_codec) çevirir.
+
+Kullanım:
+    python migrate_mood_vectors.py [veritabanı_dosyası]
+"""
+import sqlite3
+import sys
+import os
+
+from vector_codec import encode_vector, decode_vector
+
+BATCH_SIZE = 1000
+
+
+def migrate(db_path: str = "muzik_app.db"):
+    if not os.path.exists(db_path):
+        print(f"❌ HATA: '{db_path}' bulunamadı!")
+        return
+
+    conn = sqlite3.connect(db_path)
+    size_before = os.path.getsize(db_path)
+
+    # Sadece hâlâ metin olarak saklanan satırlar çevrilir (tekrar çalıştırmak güvenli)
+    rows = conn.execute(
+        "SELECT id, mood_vector FROM user_profiles "
+        "WHERE mood_vector IS NOT NULL AND typeof(mood_vector) = 'text'"
+    )
+
+    converted = 0
+    failed = 0
+    batch = []
+    for profile_id, mood_vector in rows.fetchall():
+        try:
+            batch.append((encode_vector(decode_vector(mood_vector)), profile_id))
+        except (ValueError, TypeError) as e:
+            failed += 1
+            print(f"⚠️ Profil {profile_id} çevrilemedi: {e}")
+            continue
+
+        if len(batch) >= BATCH_SIZE:
+            conn.executemany("UPDATE user_profiles SET mood_vector = ? WHERE id = ?", batch)
+            converted += len(batch)
+            batch = []
+
+    if batch:
+        conn.executemany("UPDATE user_profiles SET mood_vector = ? WHERE id = ?", batch)
+        converted += len(batch)
+
+    conn.commit()
+
+    # Boşalan sayfaları geri kazan
+    conn.execute("VACUUM")
+    conn.close()
+
+    size_after = os.path.getsize(db_path)
+    print("\n----------------MIGRATION RAPORU----------------")
+    print(f"✅ Çevrilen profil: {converted}")
+    print(f"❌ Hatalı:          {failed}")
+    print(f"💾 Dosya boyutu:    {size_before} -> {size_after} byte")
+    print("------------------------------------------------")
+
+
+if __name__ == "__main__":
+    migrate(sys.argv[1] if len(sys.argv) > 1 else "muzik_app.db")
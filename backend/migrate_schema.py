@@ -0,0 +1,95 @@
+"""
+Mevcut veritabanlarını güncel şemaya getiren migration komutu.
+Her adım tekrar çalıştırılabilir (idempotent); yeni veritabanlarında
+create_all zaten aynı sonucu verir.
+
+Kullanım:
+    python migrate_schema.py
+"""
+from sqlalchemy import inspect, text
+
+import models
+from database import engine
+from repair_counters import recompute_counters
+from song_search import ensure_search_index
+
+
+def dedupe_playlist_items(conn):
+    """Unique (playlist_id, song_id) indeksinden önce tekrar eden satırları temizler (ilk ekleneni tutar)."""
+    result = conn.execute(text(
+        "DELETE FROM playlist_items WHERE id NOT IN ("
+        "SELECT MIN(id) FROM playlist_items GROUP BY playlist_id, song_id)"
+    ))
+    if result.rowcount:
+        print(f"🧹 {result.rowcount} tekrar eden playlist kaydı silindi")
+
+
+def create_missing_indexes(conn):
+    """models.py'de tanımlı olup veritabanında olmayan indeksleri oluşturur."""
+    inspector = inspect(conn)
+    for table in models.Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=conn)
+                print(f"➕ İndeks oluşturuldu: {index.name}")
+
+
+def add_counter_columns(conn):
+    """Denormalize sayaç sütunlarını ekler ve ilk değerlerini hesaplar."""
+    inspector = inspect(conn)
+    added = False
+    for table, column, ddl in [
+        ("users", "playlist_count", "INTEGER NOT NULL DEFAULT 0"),
+        ("playlists", "item_count", "INTEGER NOT NULL DEFAULT 0"),
+        ("playlists", "updated_at", "DATETIME"),
+    ]:
+        if column not in {c["name"] for c in inspector.get_columns(table)}:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+            print(f"➕ Sütun eklendi: {table}.{column}")
+            added = True
+    if added:
+        recompute_counters(conn)
+
+
+def add_item_positions(conn):
+    """
+    playlist_items.position sütununu ekler ve eski sıralamadan (added_at, id)
+    doldurur: liste içinde en eski 1, en yeni en büyük. Eski added_at indeksini kaldırır.
+    """
+    if "position" not in {c["name"] for c in inspect(conn).get_columns("playlist_items")}:
+        conn.execute(text("ALTER TABLE playlist_items ADD COLUMN position INTEGER"))
+        print("➕ Sütun eklendi: playlist_items.position")
+    result = conn.execute(text(
+        "UPDATE playlist_items SET position = ranked.rn FROM ("
+        "SELECT id, ROW_NUMBER() OVER (PARTITION BY playlist_id ORDER BY added_at, id) AS rn "
+        "FROM playlist_items) AS ranked "
+        "WHERE ranked.id = playlist_items.id AND playlist_items.position IS NULL"
+    ))
+    if result.rowcount:
+        print(f"🔢 {result.rowcount} playlist kaydının sırası dolduruldu")
+    conn.execute(text("DROP INDEX IF EXISTS ix_playlist_items_playlist_added"))
+
+
+# Sıra önemli: veri temizliği ve yeni sütunlar indekslerden önce
+STEPS = [
+    dedupe_playlist_items,
+    add_item_positions,
+    create_missing_indexes,
+    add_counter_columns,
+]
+
+
+def migrate():
+    models.Base.metadata.create_all(bind=engine)  # Eksik tablolar
+    with engine.begin() as conn:
+        for step in STEPS:
+            step(conn)
+    ensure_search_index(engine)  # FTS5 tablosu + tetikleyiciler (kendi transaction'ı)
+    print("✅ Şema güncel.")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -1,8 +1,8 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index, Float
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
-from sqlalchemy import Boolean, DateTime
+from sqlalchemy import Boolean, DateTime, LargeBinary
 
 class User(Base):
     __tablename__ = "users"
@@ -11,6 +11,8 @@ class User(Base):
     username = Column(String, unique=True, index=True)
     email = Column(String, unique=True, index=True)
     password_hash = Column(String) 
+    # Favori listesi hariç playlist sayısı (PlaylistManager günceller, repair_counters.py yeniden hesaplar)
+    playlist_count = Column(Integer, default=0, server_default="0", nullable=False)
     
     profile = relationship("UserProfile", back_populates="owner", uselist=False)
     # listening_history ilişkisini buraya ekleyebiliriz (opsiyonel ama iyi olur)
@@ -23,17 +25,45 @@ class UserProfile(Base):
     __tablename__ = "user_profiles"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id")) 
+    user_id = Column(Integer, ForeignKey("users.id"), index=True) # Profil -> kullanıcı aramaları için
     
     age = Column(Integer)
     location = Column(String)
     hobbies = Column(String)
     favorite_genres = Column(String)
     mood_description = Column(String) 
-    mood_vector = Column(String) # Vektör verisi
+    mood_vector = Column(LargeBinary) # Vektör verisi (float32 BLOB, bkz. vector_codec)
 
     owner = relationship("User", back_populates="profile")
 
+class UserNeighbor(Base):
+    """Önceden hesaplanmış en benzer kullanıcılar (user_neighbors.py arka plan işi doldurur)."""
+    __tablename__ = "user_neighbors"
+    __table_args__ = (
+        # Artımlı yenileme: "listesinde X olan kullanıcılar" (X'in vektörü değiştiğinde)
+        Index("ix_user_neighbors_neighbor", "neighbor_id"),
+    )
+
+    # PK (user_id, rank): öneri okuması tek bir indeks aralığı taramasıdır
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    rank = Column(Integer, primary_key=True, autoincrement=False)  # 0 = en benzer
+    neighbor_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    score = Column(Float, nullable=False)
+    computed_at = Column(DateTime, nullable=False)
+
+class UserNeighborStaging(Base):
+    """
+    Tam yenilemede yeni komşu listelerinin kısa transaction'larla yazıldığı ara tablo;
+    user_neighbors'a tek INSERT ... SELECT ile aktarılır (indeks/FK yok, sadece sıralı kopya).
+    """
+    __tablename__ = "user_neighbors_staging"
+
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    rank = Column(Integer, primary_key=True, autoincrement=False)
+    neighbor_id = Column(Integer, nullable=False)
+    score = Column(Float, nullable=False)
+    computed_at = Column(DateTime, nullable=False)
+
 class Question(Base):
     __tablename__ = "questions"
 
@@ -60,7 +90,7 @@ class ListeningHistory(Base):
     __tablename__ = "listening_history"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     song_id = Column(Integer, ForeignKey("songs.id"))
     
     user = relationship("User", back_populates="listening_history")
@@ -69,24 +99,41 @@ class ListeningHistory(Base):
 #PLAYLİST KISMI EKLENENLER
 class Playlist(Base):
     __tablename__ = "playlists"
+    __table_args__ = (
+        # "Kullanıcının (favori) listeleri" sorguları: filter(user_id, is_favorite)
+        Index("ix_playlists_user_favorite", "user_id", "is_favorite"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
     user_id = Column(Integer, ForeignKey("users.id"))
     is_favorite = Column(Boolean, default=False) # Bu liste "Favorilenler" mi?
+    # Denormalize sayaçlar: limit kontrolü COUNT(*) yerine bunları kullanır
+    item_count = Column(Integer, default=0, server_default="0", nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
 
     # İlişkiler
     owner = relationship("User", back_populates="playlists")
     # Playlist içindeki şarkıları tutan ara tablo ilişkisi
-    items = relationship("PlaylistItem", back_populates="playlist", cascade="all, delete-orphan")
+    # En son eklenen (veya reorder ile en üste taşınan) şarkı en üstte
+    items = relationship("PlaylistItem", back_populates="playlist", cascade="all, delete-orphan",
+                         order_by="(PlaylistItem.position.desc(), PlaylistItem.id.desc())")
 
 class PlaylistItem(Base):
     __tablename__ = "playlist_items"
+    __table_args__ = (
+        # Aynı şarkı bir listede bir kez olabilir; (playlist_id, song_id) aramaları bu indeksi kullanır
+        Index("uq_playlist_items_playlist_song", "playlist_id", "song_id", unique=True),
+        # Sayfalı okuma: WHERE playlist_id = ? ORDER BY position DESC, id DESC (keyset)
+        Index("ix_playlist_items_playlist_position", "playlist_id", "position", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     playlist_id = Column(Integer, ForeignKey("playlists.id"))
     song_id = Column(Integer, ForeignKey("songs.id"))
-    added_at = Column(DateTime, default=datetime.utcnow) # Sıralama için zaman damgası
+    added_at = Column(DateTime, default=datetime.utcnow) # Gerçek eklenme zamanı (sıralama için kullanılmaz)
+    # Liste içi sıra: büyük olan üstte. Ekleme ve reorder en üste (MAX + 1...) yazar
+    position = Column(Integer)
 
     playlist = relationship("Playlist", back_populates="items")
     song = relationship("Song")
@@ -1,9 +1,41 @@
 # playlist_service.py (Yeni Dosya)
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+import base64
+from datetime import datetime
+from sqlalchemy.orm import Session, joinedload, noload, selectinload
+from sqlalchemy import desc, bindparam, delete, func, insert, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 import models, schemas
+from collaborative import ItemCFEngine, cf_engine
+from history_sketch import history_sketches
+from response_cache import response_cache, user_playlists_tag, playlist_tag
 from fastapi import HTTPException
 
+MAX_PLAYLISTS = 40         # Favori listesi hariç
+MAX_PLAYLIST_SONGS = 500
+
+
+def _insert_or_ignore(db: Session, table):
+    """(playlist_id, song_id) unique indeksine çarpan satırları atlayan çok satırlı INSERT."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing(index_elements=["playlist_id", "song_id"])
+    if dialect == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing(index_elements=["playlist_id", "song_id"])
+    return insert(table).prefix_with("IGNORE")  # MySQL
+
+def _encode_cursor(item) -> str:
+    raw = f"{item.position}|{item.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    try:
+        position, item_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return int(position), int(item_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Geçersiz cursor.")
+
 class PlaylistManager:
     """
     Playlist ve Favori işlemlerini yöneten sınıf.
@@ -13,29 +45,87 @@ class PlaylistManager:
     def __init__(self, db: Session):
         self.db = db
 
+    def _get_playlist_or_404(self, playlist_id: int):
+        playlist = self.db.query(models.Playlist).filter(models.Playlist.id == playlist_id).first()
+        if not playlist:
+            raise HTTPException(status_code=404, detail="Playlist bulunamadı.")
+        return playlist
+
+    def _invalidate(self, user_id: int, playlist_id: int = None):
+        """Yazmadan sonra kullanıcının playlist (ve öneri) yanıtlarını önbellekten düşürür."""
+        tags = [user_playlists_tag(user_id)]
+        if playlist_id is not None:
+            tags.append(playlist_tag(playlist_id))
+        response_cache.invalidate(*tags)
+
+    def _sync_removed(self, user_id: int):
+        """Silmeden sonra CF modelini ve MinHash imzasını kullanıcının güncel şarkı kümesiyle eşitler."""
+        if not (cf_engine.built or history_sketches.built):
+            return
+        songs = ItemCFEngine._load_user_songs(self.db, user_id)
+        cf_engine.sync_user(self.db, user_id, songs)
+        history_sketches.resync(self.db, user_id, songs)
+
     def create_playlist(self, user_id: int, name: str, is_favorite: bool = False):
         # KURAL 1: Max 40 Playlist Kontrolü (Favori listesi hariç ise)
+        # COUNT(*) yerine sayaç tek koşullu UPDATE ile artırılır; eşzamanlı isteklerde de limit aşılamaz
         if not is_favorite:
-            count = self.db.query(models.Playlist).filter(
-                models.Playlist.user_id == user_id, 
-                models.Playlist.is_favorite == False
-            ).count()
-            
-            if count >= 40:
-                raise HTTPException(status_code=400, detail="Maksimum playlist sınırına (40) ulaştınız.")
+            reserved = self.db.execute(
+                update(models.User)
+                .where(models.User.id == user_id, models.User.playlist_count < MAX_PLAYLISTS)
+                .values(playlist_count=models.User.playlist_count + 1)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if not reserved:
+                self.db.rollback()
+                if self.db.get(models.User, user_id) is None:
+                    raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı.")
+                raise HTTPException(status_code=400, detail=f"Maksimum playlist sınırına ({MAX_PLAYLISTS}) ulaştınız.")
 
         new_playlist = models.Playlist(name=name, user_id=user_id, is_favorite=is_favorite)
         self.db.add(new_playlist)
         self.db.commit()
         self.db.refresh(new_playlist)
+        self._invalidate(user_id)
         return new_playlist
 
+    def delete_playlist(self, playlist_id: int):
+        """Playlist'i şarkılarıyla birlikte siler; sahibinin playlist sayacı aynı transaction'da düşer."""
+        playlist = self._get_playlist_or_404(playlist_id)
+        if playlist.is_favorite:
+            raise HTTPException(status_code=400, detail="Favoriler listesi silinemez.")
+        user_id = playlist.user_id
+
+        self.db.execute(delete(models.PlaylistItem).where(models.PlaylistItem.playlist_id == playlist_id))
+        self.db.execute(delete(models.Playlist).where(models.Playlist.id == playlist_id))
+        self.db.execute(
+            update(models.User)
+            .where(models.User.id == user_id)
+            .values(playlist_count=models.User.playlist_count - 1)
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        self._invalidate(user_id, playlist_id)
+        self._sync_removed(user_id)
+        return {"message": "Playlist silindi"}
+
     def get_user_playlists(self, user_id: int):
-        return self.db.query(models.Playlist).filter(models.Playlist.user_id == user_id).all()
+        """Sadece özet (sayaçlar dahil) tek sorguda; şarkılar sayfalı endpoint'ten okunur."""
+        return (
+            self.db.query(models.Playlist)
+            .options(noload(models.Playlist.items))
+            .filter(models.Playlist.user_id == user_id)
+            .order_by(models.Playlist.is_favorite.desc(), models.Playlist.id)
+            .all()
+        )
 
-    def get_favorites_playlist(self, user_id: int):
+    def get_favorites_playlist(self, user_id: int, with_items: bool = False):
         # Kullanıcının favori listesini bul
-        fav_list = self.db.query(models.Playlist).filter(
+        query = self.db.query(models.Playlist)
+        if with_items:
+            # Serileştirme sırasında N+1 olmasın: öğeler tek IN sorgusunda, şarkılar JOIN ile
+            query = query.options(selectinload(models.Playlist.items).joinedload(models.PlaylistItem.song))
+        fav_list = query.filter(
             models.Playlist.user_id == user_id,
             models.Playlist.is_favorite == True
         ).first()
@@ -47,14 +137,7 @@ class PlaylistManager:
         return fav_list
 
     def add_song_to_playlist(self, playlist_id: int, song_id: int):
-        playlist = self.db.query(models.Playlist).filter(models.Playlist.id == playlist_id).first()
-        if not playlist:
-            raise HTTPException(status_code=404, detail="Playlist bulunamadı.")
-
-        # KURAL 2: Max 500 Şarkı Kontrolü
-        song_count = self.db.query(models.PlaylistItem).filter(models.PlaylistItem.playlist_id == playlist_id).count()
-        if song_count >= 500:
-            raise HTTPException(status_code=400, detail="Bu playliste en fazla 500 şarkı eklenebilir.")
+        playlist = self._get_playlist_or_404(playlist_id)
 
         # Şarkı zaten var mı?
         exists = self.db.query(models.PlaylistItem).filter(
@@ -65,23 +148,244 @@ class PlaylistManager:
         if exists:
             return exists # Zaten varsa işlem yapma veya hata döndür
 
-        new_item = models.PlaylistItem(playlist_id=playlist_id, song_id=song_id)
+        # KURAL 2: Max 500 Şarkı Kontrolü (sayaç üzerinden, COUNT(*) yok)
+        if not self._reserve_items(playlist_id, 1):
+            self.db.rollback()
+            raise HTTPException(status_code=400, detail=f"Bu playliste en fazla {MAX_PLAYLIST_SONGS} şarkı eklenebilir.")
+
+        new_item = models.PlaylistItem(playlist_id=playlist_id, song_id=song_id,
+                                       position=self._top_position(playlist_id) + 1)
         self.db.add(new_item)
-        self.db.commit()
+        try:
+            self.db.commit()
+        except IntegrityError:
+            # Aynı şarkı eşzamanlı bir istekle eklendi; sayaç artışı da geri alınır
+            self.db.rollback()
+            return self.db.query(models.PlaylistItem).filter(
+                models.PlaylistItem.playlist_id == playlist_id,
+                models.PlaylistItem.song_id == song_id
+            ).first()
+
+        # CF modeline yeni etkileşimi artımlı olarak işle
+        cf_engine.add_interaction(playlist.user_id, song_id)
+        history_sketches.add(playlist.user_id, [song_id])
+        self._invalidate(playlist.user_id, playlist_id)
         return new_item
 
     def remove_song_from_playlist(self, playlist_id: int, song_id: int):
-        item = self.db.query(models.PlaylistItem).filter(
-            models.PlaylistItem.playlist_id == playlist_id,
-            models.PlaylistItem.song_id == song_id
-        ).first()
-        
-        if item:
-            self.db.delete(item)
+        if self._delete_items(playlist_id, [song_id]):
+            user_id = self.db.scalar(select(models.Playlist.user_id).where(models.Playlist.id == playlist_id))
             self.db.commit()
+            self._invalidate(user_id, playlist_id)
+            self._sync_removed(user_id)
             return {"message": "Şarkı silindi"}
         raise HTTPException(status_code=404, detail="Şarkı bu listede bulunamadı.")
 
+    # --- SAYAÇLAR (her ekleme/silme ile aynı transaction'da güncellenir) ---
+
+    def _reserve_items(self, playlist_id: int, n: int) -> bool:
+        """item_count'u limit aşılmıyorsa n artırır. Tek koşullu UPDATE: kontrol ve artış atomik."""
+        return self.db.execute(
+            update(models.Playlist)
+            .where(models.Playlist.id == playlist_id, models.Playlist.item_count + n <= MAX_PLAYLIST_SONGS)
+            .values(item_count=models.Playlist.item_count + n, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount == 1
+
+    def _release_items(self, playlist_id: int, n: int):
+        self.db.execute(
+            update(models.Playlist)
+            .where(models.Playlist.id == playlist_id)
+            .values(item_count=models.Playlist.item_count - n, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+
+    def _touch(self, playlist_id: int):
+        self.db.execute(
+            update(models.Playlist)
+            .where(models.Playlist.id == playlist_id)
+            .values(updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+
+    def _top_position(self, playlist_id: int) -> int:
+        """Listenin en üstteki sırası (boşsa 0); (playlist_id, position) indeksinde tek arama."""
+        return self.db.scalar(
+            select(func.coalesce(func.max(models.PlaylistItem.position), 0))
+            .where(models.PlaylistItem.playlist_id == playlist_id)
+        )
+
+    def _delete_items(self, playlist_id: int, song_ids) -> int:
+        """Şarkıları siler ve sayacı silinen satır kadar düşürür (commit çağırana ait)."""
+        removed = self.db.execute(
+            delete(models.PlaylistItem).where(
+                models.PlaylistItem.playlist_id == playlist_id,
+                models.PlaylistItem.song_id.in_(song_ids),
+            )
+        ).rowcount
+        if removed:
+            self._release_items(playlist_id, removed)
+        return removed
+
+    def get_playlist_items(self, playlist_id: int, limit: int = 50, cursor: str = None):
+        """
+        Keyset sayfalama: (position, id) azalan sırada, cursor'dan sonraki `limit` öğe.
+        OFFSET kullanılmaz; her sayfa (playlist_id, position, id) indeksinde tek aralık taramasıdır.
+        Şarkılar aynı sorguda JOIN ile yüklenir.
+        """
+        query = (
+            self.db.query(models.PlaylistItem)
+            .options(joinedload(models.PlaylistItem.song))
+            .filter(models.PlaylistItem.playlist_id == playlist_id)
+        )
+        if cursor:
+            position, item_id = _decode_cursor(cursor)
+            query = query.filter(tuple_(models.PlaylistItem.position, models.PlaylistItem.id) < (position, item_id))
+        rows = (
+            query.order_by(models.PlaylistItem.position.desc(), models.PlaylistItem.id.desc())
+            .limit(limit + 1)
+            .all()
+        )
+
+        if not rows and not cursor:
+            self._get_playlist_or_404(playlist_id)  # Boş liste mi, olmayan liste mi?
+
+        next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return {"playlist_id": playlist_id, "items": rows[:limit], "next_cursor": next_cursor}
+
+    # --- TOPLU İŞLEMLER (tek transaction, şarkı sayısından bağımsız sabit sayıda sorgu) ---
+
+    def _songs_in_playlist(self, playlist_id: int, song_ids):
+        return set(self.db.scalars(
+            select(models.PlaylistItem.song_id).where(
+                models.PlaylistItem.playlist_id == playlist_id,
+                models.PlaylistItem.song_id.in_(song_ids),
+            )
+        ))
+
+    def _insert_items(self, rows) -> set:
+        """
+        Satırları çakışanları atlayarak ekler; bu isteğin GERÇEKTEN eklediği song_id'leri döner.
+        RETURNING destekleyen sürücülerde (SQLite 3.35+, PostgreSQL) eklenenler doğrudan
+        döner; desteklemeyenlerde (MySQL) bu isteğin added_at damgasıyla yeniden okunur.
+        """
+        table = models.PlaylistItem.__table__
+        stmt = _insert_or_ignore(self.db, table).values(rows)
+        if self.db.get_bind().dialect.insert_returning:
+            return set(self.db.scalars(stmt.returning(table.c.song_id)))
+        inserted = self.db.execute(stmt).rowcount
+        song_ids = [row["song_id"] for row in rows]
+        if inserted == len(rows):
+            return set(song_ids)
+        return set(self.db.scalars(
+            select(table.c.song_id).where(
+                table.c.playlist_id == rows[0]["playlist_id"],
+                table.c.song_id.in_(song_ids),
+                table.c.added_at == rows[0]["added_at"],
+            )
+        ))
+
+    def add_songs_to_playlist(self, playlist_id: int, song_ids: list):
+        """
+        Birden çok şarkıyı tek seferde ekler. Sonuç her şarkı için durum içerir:
+        added | exists | duplicate (istekte tekrar) | not_found (katalogda yok).
+        Limit tüm batch için bir kez kontrol edilir; aşılırsa hiçbir şey eklenmez.
+        """
+        playlist = self._get_playlist_or_404(playlist_id)
+        unique_ids = list(dict.fromkeys(song_ids))
+
+        existing = self._songs_in_playlist(playlist_id, unique_ids)
+        known = set(self.db.scalars(select(models.Song.id).where(models.Song.id.in_(unique_ids))))
+        to_add = [sid for sid in unique_ids if sid in known and sid not in existing]
+
+        if to_add and not self._reserve_items(playlist_id, len(to_add)):
+            self.db.rollback()
+            raise HTTPException(
+                status_code=400,
+                detail=f"Bu playliste en fazla {MAX_PLAYLIST_SONGS} şarkı eklenebilir "
+                       f"(mevcut: {playlist.item_count}, eklenecek: {len(to_add)}).",
+            )
+
+        if to_add:
+            # İstekteki ilk şarkı en üstte: sıralar en üsttekinin üzerine azalan şekilde
+            top = self._top_position(playlist_id) + len(to_add)
+            now = datetime.utcnow()
+            rows = [
+                {"playlist_id": playlist_id, "song_id": sid, "added_at": now, "position": top - i}
+                for i, sid in enumerate(to_add)
+            ]
+            added = self._insert_items(rows)
+            if len(added) < len(to_add):
+                # Eşzamanlı bir istek bazılarını eklemiş; ayrılan fazla kapasiteyi geri ver
+                self._release_items(playlist_id, len(to_add) - len(added))
+                existing |= set(to_add) - added  # Onlar bu istekte "exists" sayılır
+            self.db.commit()
+            if added:
+                to_add = [sid for sid in to_add if sid in added]
+                for sid in to_add:
+                    cf_engine.add_interaction(playlist.user_id, sid)
+                history_sketches.add(playlist.user_id, to_add)
+                self._invalidate(playlist.user_id, playlist_id)
+
+        results, seen = [], set()
+        for sid in song_ids:
+            if sid in seen:
+                status = "duplicate"
+            elif sid in existing:
+                status = "exists"
+            elif sid not in known:
+                status = "not_found"
+            else:
+                status = "added"
+            seen.add(sid)
+            results.append({"song_id": sid, "status": status})
+        return {"playlist_id": playlist_id, "item_count": playlist.item_count, "results": results}
+
+    def remove_songs_from_playlist(self, playlist_id: int, song_ids: list):
+        """Birden çok şarkıyı tek DELETE ile siler. Durumlar: removed | not_in_playlist."""
+        playlist = self._get_playlist_or_404(playlist_id)
+        present = self._songs_in_playlist(playlist_id, song_ids)
+
+        if present:
+            self._delete_items(playlist_id, present)
+            self.db.commit()
+            self._invalidate(playlist.user_id, playlist_id)
+            self._sync_removed(playlist.user_id)
+
+        results = [{"song_id": sid, "status": "removed" if sid in present else "not_in_playlist"} for sid in song_ids]
+        return {"playlist_id": playlist_id, "item_count": playlist.item_count, "results": results}
+
+    def reorder_playlist(self, playlist_id: int, song_ids: list):
+        """
+        Verilen şarkıları bu sırayla listenin en üstüne taşır (ilk eleman en üstte);
+        listede adı geçmeyen şarkılar göreli sıralarını koruyarak altta kalır.
+        Sadece position yeniden yazılır; added_at (gerçek eklenme zamanı) korunur.
+        Durumlar: moved | not_in_playlist.
+        """
+        playlist = self._get_playlist_or_404(playlist_id)
+        ordered = list(dict.fromkeys(song_ids))
+        present = self._songs_in_playlist(playlist_id, ordered)
+
+        moved = [sid for sid in ordered if sid in present]
+        top = self._top_position(playlist_id) + len(moved) if moved else 0
+        params = [{"b_song_id": sid, "b_position": top - i} for i, sid in enumerate(moved)]
+        if params:
+            self.db.connection().execute(
+                update(models.PlaylistItem.__table__)
+                .where(
+                    models.PlaylistItem.playlist_id == playlist_id,
+                    models.PlaylistItem.song_id == bindparam("b_song_id"),
+                )
+                .values(position=bindparam("b_position")),
+                params,
+            )
+            self._touch(playlist_id)
+            self.db.commit()
+            self._invalidate(playlist.user_id, playlist_id)
+
+        results = [{"song_id": sid, "status": "moved" if sid in present else "not_in_playlist"} for sid in song_ids]
+        return {"playlist_id": playlist_id, "results": results}
+
     def toggle_favorite(self, user_id: int, song_id: int):
         """
         Favori butonuna basıldığında çalışır.
@@ -97,8 +401,11 @@ class PlaylistManager:
 
         if existing_item:
             # Varsa çıkar
-            self.db.delete(existing_item)
+            fav_playlist_id = fav_playlist.id
+            self._delete_items(fav_playlist_id, [song_id])
             self.db.commit()
+            self._invalidate(user_id, fav_playlist_id)
+            self._sync_removed(user_id)
             return {"status": "removed", "message": "Favorilerden çıkarıldı"}
         else:
             # Yoksa ekle (Limit kontrolünü add_song_to_playlist içinde zaten yapıyor)
@@ -0,0 +1,216 @@
+"""
+Sorgu planı regresyon kontrolü.
+
+Geçici bir veritabanında servisin sıcak yollarını (crud, PlaylistManager,
+öneri servisleri) çalıştırır, üretilen her SQL ifadesini yakalar ve
+EXPLAIN QUERY PLAN ile hiçbirinin tam tablo taraması (SCAN) yapmadığını
+doğrular. Okuma yollarında istek başına sorgu sayısı da QUERY_BUDGETS ile
+sınırlanır (N+1 regresyonları). İhlal varsa 1 koduyla çıkar (CI'da çalıştırılabilir).
+
+Kullanım:
+    python query_plan_check.py
+"""
+import os
+import sys
+import tempfile
+
+# database modülü import edilmeden önce geçici veritabanını seç
+_tmp_dir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir.name, 'plan_check.db')}"
+os.environ.pop("DATABASE_READ_URL", None)
+os.environ["SONG_VECTORS_PATH"] = os.path.join(_tmp_dir.name, "song_vectors.npy")
+os.environ["SONG_META_PATH"] = os.path.join(_tmp_dir.name, "song_meta.npz")
+
+import numpy as np
+from sqlalchemy import event
+
+import models, schemas, crud, recommendation, export_service
+from collaborative import cf_engine
+from database import SessionLocal, engine
+from playlist_service import PlaylistManager
+from song_embeddings import song_index
+from user_neighbors import neighbor_job
+from vector_codec import encode_vector
+
+# Bilinçli olarak tamamı okunan küçük tablolar (sabit sayıda satır)
+ALLOWED_SCANS = {"questions"}
+
+# Etiket başına en fazla sorgu sayısı (veri boyutundan bağımsız olmalı)
+QUERY_BUDGETS = {
+    "PlaylistManager.get_user_playlists": 1,
+    "PlaylistManager.get_playlist_items": 1,
+    "PlaylistManager.get_playlist_items (sonraki sayfa)": 1,
+    "PlaylistManager.get_favorites_playlist": 2,
+    "recommendation.get_precomputed_similar_users": 1,
+    "recommendation.get_hybrid_similar_users": 1,
+    "export_service.iter_records": 3,  # Bölüm başına bir akış sorgusu (hesap boyutundan bağımsız)
+}
+
+
+class QueryRecorder:
+    """Engine olayları ile çalıştırılan SQL ifadelerini toplar."""
+
+    def __init__(self):
+        self.statements = []
+        self.active = False
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active:
+            self.statements.append((self.label, statement, parameters, executemany))
+
+    def capture(self, label):
+        self.label = label
+        self.active = True
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.active = False
+
+
+def seed(db, rng):
+    songs = [models.Song(title=f"Şarkı {i}", artist="Sanatçı", genre="Pop", theme="Aşk") for i in range(50)]
+    db.add_all(songs)
+    db.commit()
+    for i in range(20):
+        user = crud.create_user(db, schemas.UserCreate(username=f"kullanici{i}", email=f"k{i}@ornek.com", password="x"))
+        crud.create_user_profile(
+            db, schemas.ProfileCreate(age=20, location="İstanbul", hobbies="Spor", favorite_genres="Pop",
+                                      mood_description="Mutlu"),
+            user.id, encode_vector(rng.normal(size=384)),
+        )
+        db.add(models.ListeningHistory(user_id=user.id, song_id=songs[i].id))
+    db.commit()
+
+    # Şarkı öneri endpoint'i için rastgele şarkı matrisi (model gerektirmeden)
+    np.save(song_index.vectors_path, rng.normal(size=(len(songs), 384)).astype(np.float32))
+    np.savez(song_index.meta_path, ids=np.array([s.id for s in songs], dtype=np.int64),
+             genre_codes=np.zeros(len(songs), dtype=np.int32), theme_codes=np.zeros(len(songs), dtype=np.int32),
+             genre_vocab=np.array(["pop"], dtype=str), theme_vocab=np.array(["aşk"], dtype=str))
+
+
+def exercise(db, recorder):
+    """Sıcak yollar: her biri etiketli olarak yakalanır."""
+    manager = PlaylistManager(db)
+
+    with recorder.capture("crud.get_user_by_email"):
+        crud.get_user_by_email(db, "k3@ornek.com")
+    with recorder.capture("crud.create_user"):
+        user = crud.create_user(db, schemas.UserCreate(username="yeni", email="yeni@ornek.com", password="x"))
+    with recorder.capture("crud.get_profile_by_user_id"):
+        crud.get_profile_by_user_id(db, 3)
+    with recorder.capture("PlaylistManager.create_playlist"):
+        playlist = manager.create_playlist(user.id, "Liste")
+    with recorder.capture("PlaylistManager.add_song_to_playlist"):
+        manager.add_song_to_playlist(playlist.id, 1)
+        manager.add_song_to_playlist(playlist.id, 1)  # Zaten var yolu
+    with recorder.capture("PlaylistManager.remove_song_from_playlist"):
+        manager.remove_song_from_playlist(playlist.id, 1)
+    with recorder.capture("PlaylistManager.add_songs_to_playlist"):
+        manager.add_songs_to_playlist(playlist.id, [3, 4, 5, 4, 999])
+    with recorder.capture("PlaylistManager.reorder_playlist"):
+        manager.reorder_playlist(playlist.id, [5, 3])
+    with recorder.capture("PlaylistManager.remove_songs_from_playlist"):
+        manager.remove_songs_from_playlist(playlist.id, [3, 4])
+    with recorder.capture("PlaylistManager.delete_playlist"):
+        manager.delete_playlist(manager.create_playlist(user.id, "Silinecek").id)
+    with recorder.capture("PlaylistManager.toggle_favorite"):
+        manager.toggle_favorite(user.id, 2)
+        manager.toggle_favorite(user.id, 2)
+    manager.add_songs_to_playlist(playlist.id, list(range(1, 41)))
+    manager.toggle_favorite(user.id, 7)
+    manager.toggle_favorite(user.id, 8)
+    user_id, playlist_id = user.id, playlist.id
+    db.expire_all()
+
+    # Okuma yolları: endpoint'in response_model'i ile serileştirme dahil (lazy-load'lar sayılır)
+    with recorder.capture("PlaylistManager.get_user_playlists"):
+        [schemas.PlaylistSummaryOut.model_validate(p) for p in manager.get_user_playlists(user_id)]
+    with recorder.capture("PlaylistManager.get_playlist_items"):
+        page = schemas.PlaylistItemsPage.model_validate(manager.get_playlist_items(playlist_id, limit=10))
+    with recorder.capture("PlaylistManager.get_playlist_items (sonraki sayfa)"):
+        schemas.PlaylistItemsPage.model_validate(manager.get_playlist_items(playlist_id, limit=10, cursor=page.next_cursor))
+    with recorder.capture("export_service.iter_records"):
+        list(export_service.iter_records(db, user_id))
+    db.expire_all()
+    with recorder.capture("PlaylistManager.get_favorites_playlist"):
+        schemas.PlaylistOut.model_validate(manager.get_favorites_playlist(user_id, with_items=True))
+    with recorder.capture("recommendation.get_similar_users"):
+        recommendation.get_similar_users(db, current_user_id=3)
+    # Komşu tablosunu arka plan işi doldurur (tüm tabloyu bilinçli okur, burada ölçülmez)
+    neighbor_job.refresh_all(db)
+    with recorder.capture("recommendation.get_precomputed_similar_users"):
+        recommendation.get_precomputed_similar_users(db, current_user_id=3)
+    with recorder.capture("recommendation.get_hybrid_similar_users"):
+        recommendation.get_hybrid_similar_users(db, current_user_id=3, history_weight=0.5)
+    with recorder.capture("recommendation.get_song_recommendations"):
+        recommendation.get_song_recommendations(db, 3, top_k=5)
+    with recorder.capture("recommendation.get_similar_songs"):
+        recommendation.get_similar_songs(db, 1, top_k=5)
+
+
+def full_scans(conn, statement, parameters):
+    """EXPLAIN QUERY PLAN çıktısındaki tam tablo taramalarını döner."""
+    plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    scans = []
+    for row in plan:
+        detail = row[-1]
+        if not detail.startswith("SCAN "):
+            continue
+        table = detail.split()[1]
+        if table in ALLOWED_SCANS or table.startswith("CONSTANT"):
+            continue
+        scans.append(detail)
+    return plan, scans
+
+
+def main():
+    models.Base.metadata.create_all(bind=engine)
+    rng = np.random.default_rng(0)
+    db = SessionLocal()
+    seed(db, rng)
+
+    # Süreç ömründe bir kez yapılan toplu yüklemeler (indeks kurulumu) kontrol dışı
+    recommendation.user_index.ensure_loaded(db)
+    recommendation.history_sketches.ensure_built(db)
+    cf_engine.ensure_built(db)  # Silme yollarındaki sync_user sorguları da kontrol edilsin
+    song_index.ensure_loaded()
+
+    recorder = QueryRecorder()
+    event.listen(engine, "before_cursor_execute", recorder)
+    exercise(db, recorder)
+    event.remove(engine, "before_cursor_execute", recorder)
+    db.close()
+
+    violations = 0
+    checked = 0
+    with engine.connect() as conn:
+        for label, statement, parameters, executemany in recorder.statements:
+            verb = statement.lstrip().split(None, 1)[0].upper()
+            if verb not in ("SELECT", "UPDATE", "DELETE") or executemany:
+                continue
+            checked += 1
+            plan, scans = full_scans(conn, statement, parameters)
+            if scans:
+                violations += 1
+                print(f"❌ [{label}] tam tablo taraması: {', '.join(scans)}")
+                print(f"   SQL: {' '.join(statement.split())}")
+                for row in plan:
+                    print(f"   PLAN: {row[-1]}")
+
+    counts = {}
+    for label, *_ in recorder.statements:
+        counts[label] = counts.get(label, 0) + 1
+    for label, budget in QUERY_BUDGETS.items():
+        if counts.get(label, 0) > budget:
+            violations += 1
+            print(f"❌ [{label}] {counts[label]} sorgu çalıştı (bütçe: {budget})")
+
+    print(f"\n🔎 {checked} sorgu kontrol edildi, {violations} ihlal.")
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,54 +1,207 @@
-from sqlalchemy.orm import Session
-from sklearn.metrics.pairwise import cosine_similarity
+import os
+from datetime import datetime
+
 import numpy as np
-import json
+from sqlalchemy.orm import Session
 import models
+from vector_index import user_index
+from history_sketch import history_sketches
+from vector_codec import decode_vector
+from song_embeddings import song_index
+from user_neighbors import neighbor_job, read_neighbors
+from instrumentation import stage
+
+# Hibrit eşleşme: dinleme geçmişi (tahmini Jaccard) ağırlığının varsayılanı ve
+# her kaynaktan (mood indeksi, LSH) skorlanan aday sayısı
+HYBRID_HISTORY_WEIGHT = float(os.getenv("HYBRID_HISTORY_WEIGHT", "0.5"))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "100"))
+
+def get_user_vector(db: Session, user_id: int):
+    """
+    Kullanıcının mood vektörünü önce bellekteki indeksten, yoksa veritabanından getirir.
+    Profil/vektör yoksa veya bozuksa None döner.
+    """
+    # İndeks ilk kez kullanılıyorsa tüm profilleri tek sorguda yükle
+    user_index.ensure_loaded(db)
+
+    vector = user_index.get_vector(user_id)
+    if vector is not None:
+        return vector
+
+    profile = db.query(models.UserProfile).filter(models.UserProfile.user_id == user_id).first()
+
+    # Profil veya vektör yoksa boş dön
+    if not profile or not profile.mood_vector:
+        return None
+
+    # BLOB'u kopyasız NumPy Array'e çevir
+    try:
+        return decode_vector(profile.mood_vector)
+    except:
+        return None # Vektör bozuksa boş dön
 
 def get_similar_users(db: Session, current_user_id: int, top_k: int = 3):
     """
     Verilen kullanıcıya (current_user_id) en çok benzeyen diğer kullanıcıları bulur.
     Mantık: Cosine Similarity (Vektör Benzerliği)
+    Tüm vektörler bellekteki indekste tutulur (vector_index.user_index),
+    her istekte tablo baştan okunmaz.
     """
-    
-    # 1. Şu anki kullanıcının profilini bul
-    current_profile = db.query(models.UserProfile).filter(models.UserProfile.user_id == current_user_id).first()
-    
-    # Profil veya vektör yoksa boş dön
-    if not current_profile or not current_profile.mood_vector:
+
+    # 1. Şu anki kullanıcının vektörünü bul
+    current_vector = get_user_vector(db, current_user_id)
+    if current_vector is None:
         return []
-    
-    # JSON String olan vektörü NumPy Array'e çevir
-    # Örn: "[0.1, 0.2]" -> np.array([[0.1, 0.2]])
-    try:
-        current_vector = np.array(json.loads(current_profile.mood_vector)).reshape(1, -1)
-    except:
-        return [] # Vektör bozuksa boş dön
-
-    # 2. Veritabanındaki DİĞER kullanıcıları çek (Kendisi hariç)
-    other_profiles = db.query(models.UserProfile).filter(models.UserProfile.user_id != current_user_id).all()
-    
-    similarities = []
-
-    for profile in other_profiles:
-        if profile.mood_vector:
-            try:
-                # Diğer kullanıcının vektörünü hazırla
-                target_vector = np.array(json.loads(profile.mood_vector)).reshape(1, -1)
-                
-                # 3. Benzerlik Skoru Hesapla (0 ile 1 arası)
-                score = cosine_similarity(current_vector, target_vector)[0][0]
-                
-                similarities.append({
-                    "user_id": profile.user_id,
-                    "score": float(score), 
-                    "username": profile.owner.username, # İlişkili tablodan ismini al
-                    "match_reason": f"Benzerlik Oranı: %{int(score*100)}"
-                })
-            except:
-                continue
-    
-    # 4. Sıralama Yap: Skoru en yüksek olan en üstte olsun
-    similarities.sort(key=lambda x: x["score"], reverse=True)
-    
-    # 5. Sadece ilk 'top_k' (örn: 3) kişiyi döndür
-    return similarities[:top_k]
\ No newline at end of file
+
+    # 2. Tek matris çarpımı + argpartition ile en benzer 'top_k' kişiyi bul (kendisi hariç)
+    with stage("similarity"):
+        matches = user_index.search(current_vector, top_k=top_k, exclude_user_id=current_user_id)
+
+    return [_user_match(user_id, username, score) for user_id, username, score in matches]
+
+def _user_match(user_id: int, username: str, score: float):
+    return {
+        "user_id": user_id,
+        "score": score,
+        "username": username,
+        "match_reason": f"Benzerlik Oranı: %{int(score*100)}"
+    }
+
+def get_precomputed_similar_users(db: Session, current_user_id: int, top_k: int = 3):
+    """
+    Benzer kullanıcıları user_neighbors tablosundan okur (tek indeksli sorgu).
+    Sonucun ne kadar bayat olduğu da döner: computed_at, stale_seconds ve
+    kullanıcının yenileme kuyruğunda olup olmadığı (refresh_pending).
+    Kullanıcı için henüz satır yoksa (yeni profil) canlı hesaplanır ve kuyruğa alınır.
+    Sıkıştırılmış katmanda tablo tutulmaz (bkz. NeighborTableJob.enabled); her zaman canlı.
+    """
+    user_index.ensure_loaded(db)
+    table = neighbor_job.enabled()
+    rows = read_neighbors(db, current_user_id, top_k) if table else []
+    if rows:
+        computed_at = rows[0].computed_at
+        return {
+            "recommended_users": [_user_match(r.neighbor_id, r.username, r.score) for r in rows],
+            "source": "precomputed",
+            "computed_at": computed_at,
+            "stale_seconds": round((datetime.utcnow() - computed_at).total_seconds(), 1),
+            "refresh_pending": neighbor_job.is_pending(current_user_id),
+        }
+
+    matches = get_similar_users(db, current_user_id, top_k=top_k)
+    if matches and table:
+        neighbor_job.mark_dirty(current_user_id)
+    return {
+        "recommended_users": matches,
+        "source": "live",
+        "computed_at": datetime.utcnow(),
+        "stale_seconds": 0.0,
+        "refresh_pending": bool(matches) and table,
+    }
+
+def get_hybrid_similar_users(db: Session, current_user_id: int, top_k: int = 3,
+                             history_weight: float = HYBRID_HISTORY_WEIGHT):
+    """
+    Mood kosinüs benzerliği ile dinleme geçmişi/playlist benzerliğini harmanlar:
+        skor = (1 - history_weight) * kosinüs + history_weight * tahmini Jaccard
+    Adaylar iki kaynaktan gelir: mood indeksinin en yakın HYBRID_CANDIDATES
+    kullanıcısı + MinHash/LSH'nin geçmişi en çok örtüşen HYBRID_CANDIDATES
+    kullanıcısı. Tüm kullanıcı çiftleri hiç karşılaştırılmaz.
+    """
+    history_sketches.ensure_built(db)
+    current_vector = get_user_vector(db, current_user_id)
+
+    with stage("similarity"):
+        candidates = {}  # user_id -> (username, mood skoru)
+        if current_vector is not None and history_weight < 1:
+            for user_id, username, score in user_index.search(
+                current_vector, top_k=HYBRID_CANDIDATES, exclude_user_id=current_user_id
+            ):
+                candidates[user_id] = (username, score)
+        if history_weight > 0:
+            for user_id, _ in history_sketches.similar(current_user_id, limit=HYBRID_CANDIDATES):
+                candidates.setdefault(user_id, (None, None))
+        if not candidates:
+            return []
+
+        ids = list(candidates)
+        mood = np.array([candidates[i][1] if candidates[i][1] is not None else np.nan for i in ids])
+        missing = [i for i, score in zip(ids, mood) if np.isnan(score)]
+        if missing and current_vector is not None:
+            vectors = user_index.get_vectors(missing)
+            for j, user_id in enumerate(ids):
+                if user_id in vectors:
+                    mood[j] = float(vectors[user_id] @ current_vector / (np.linalg.norm(current_vector) or 1.0))
+        mood = np.nan_to_num(mood, nan=0.0)
+        history = history_sketches.estimate(current_user_id, ids)
+        scores = (1 - history_weight) * mood + history_weight * history
+
+        k = min(top_k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+    # LSH'den gelen (veya profili olmayan) kullanıcıların adları tek sorguda
+    unnamed = [ids[i] for i in top if candidates[ids[i]][0] is None]
+    names = dict(db.query(models.User.id, models.User.username).filter(models.User.id.in_(unnamed)).all()) if unnamed else {}
+
+    results = []
+    for i in top:
+        user_id = ids[i]
+        match = _user_match(user_id, candidates[user_id][0] or names.get(user_id), float(scores[i]))
+        match["mood_score"] = float(mood[i])
+        match["history_score"] = float(history[i])
+        match["match_reason"] += f" (mood %{int(mood[i] * 100)}, dinleme %{int(history[i] * 100)})"
+        results.append(match)
+    return results
+
+# --- ŞARKI ÖNERİLERİ (song_embeddings matrisi üzerinden) ---
+
+def _songs_with_scores(db: Session, matches):
+    """[(song_id, score)] listesini tek sorguda şarkı bilgileriyle birleştirir (sıra korunur)."""
+    if not matches:
+        return []
+    ids = [song_id for song_id, _ in matches]
+    songs = {s.id: s for s in db.query(models.Song).filter(models.Song.id.in_(ids)).all()}
+    return [
+        {
+            "song_id": song_id,
+            "title": songs[song_id].title,
+            "artist": songs[song_id].artist,
+            "genre": songs[song_id].genre,
+            "theme": songs[song_id].theme,
+            "score": score,
+        }
+        for song_id, score in matches
+        if song_id in songs
+    ]
+
+def get_song_recommendations(db: Session, user_id: int, top_k: int = 10, genre: str = None, theme: str = None):
+    """
+    Kullanıcının mood vektörüne en yakın şarkıları önerir.
+    Kullanıcının playlistlerinde zaten olan şarkılar hariç tutulur.
+    """
+    user_vector = get_user_vector(db, user_id)
+    if user_vector is None:
+        return []
+
+    # Playlistlerdeki şarkılar tek sorguda
+    in_playlists = [
+        song_id for (song_id,) in
+        db.query(models.PlaylistItem.song_id)
+        .join(models.Playlist, models.Playlist.id == models.PlaylistItem.playlist_id)
+        .filter(models.Playlist.user_id == user_id)
+        .distinct()
+    ]
+
+    with stage("similarity"):
+        matches = song_index.search(user_vector, top_k=top_k, genre=genre, theme=theme, exclude_song_ids=in_playlists)
+    return _songs_with_scores(db, matches)
+
+def get_similar_songs(db: Session, song_id: int, top_k: int = 10):
+    """'Buna benzer' şarkılar: verilen şarkının vektörüne en yakın diğer şarkılar."""
+    song_vector = song_index.get_vector(song_id)
+    if song_vector is None:
+        return []
+    with stage("similarity"):
+        matches = song_index.search(song_vector, top_k=top_k, exclude_song_ids=[song_id])
+    return _songs_with_scores(db, matches)
@@ -0,0 +1,46 @@
+"""
+Denormalize playlist sayaçlarını sıfırdan yeniden hesaplar:
+users.playlist_count, playlists.item_count ve playlists.updated_at.
+
+Sayaçlar normalde PlaylistManager tarafından her ekleme/silme ile aynı
+transaction'da güncellenir; bu komut elle yapılan veri düzeltmelerinden
+veya servis dışı yazmalardan sonra tutarlılığı geri getirmek içindir.
+
+Kullanım:
+    python repair_counters.py
+"""
+from sqlalchemy import text
+
+from database import engine
+
+
+def recompute_counters(conn):
+    """Tek transaction içinde, korelasyonlu alt sorgularla tüm sayaçları yeniden yazar."""
+    conn.execute(text(
+        "UPDATE playlists SET item_count = ("
+        "SELECT COUNT(*) FROM playlist_items WHERE playlist_items.playlist_id = playlists.id)"
+    ))
+    conn.execute(text(
+        "UPDATE playlists SET updated_at = COALESCE("
+        "(SELECT MAX(added_at) FROM playlist_items WHERE playlist_items.playlist_id = playlists.id), "
+        "updated_at, CURRENT_TIMESTAMP) "
+        "WHERE updated_at IS NULL"
+    ))
+    conn.execute(text(
+        "UPDATE users SET playlist_count = ("
+        "SELECT COUNT(*) FROM playlists WHERE playlists.user_id = users.id AND NOT playlists.is_favorite)"
+    ))
+
+
+def repair():
+    with engine.begin() as conn:
+        before = conn.execute(text(
+            "SELECT COUNT(*) FROM playlists WHERE item_count != ("
+            "SELECT COUNT(*) FROM playlist_items WHERE playlist_items.playlist_id = playlists.id)"
+        )).scalar()
+        recompute_counters(conn)
+    print(f"✅ Sayaçlar yeniden hesaplandı ({before} playlist'in item_count değeri hatalıydı).")
+
+
+if __name__ == "__main__":
+    repair()
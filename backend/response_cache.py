@@ -0,0 +1,212 @@
+"""
+GET endpoint'leri için süreç içi yanıt önbelleği (ETag / If-None-Match destekli).
+
+- Hangi rotanın ne kadar süre önbelleğe alınacağı cache_route() ile kaydedilir;
+  kayıtlı olmayan rotalara dokunulmaz.
+- Her kayıt etiketlerle (tag) işaretlenir: "recommendations",
+  "user:5:playlists", "playlist:12" gibi. Yazma yolları (crud, PlaylistManager)
+  invalidate() ile ilgili etiketleri siler.
+- Bellek sınırlıdır (RESPONSE_CACHE_MAX_BYTES); dolunca en eski kullanılan (LRU)
+  kayıtlar atılır.
+- Yanıtlar ETag taşır; istemci If-None-Match gönderirse gövde yerine 304 döner.
+
+Not: önbellek her worker sürecinde ayrıdır; birden çok uvicorn worker'ı ile
+başka bir süreçteki yazma, bu süreçteki kaydı en fazla TTL kadar bayat bırakır.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Request
+from fastapi.responses import Response
+
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") != "0"
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+class _Route:
+    def __init__(self, path: str, ttl: float, tags):
+        self.path = path
+        self.ttl = ttl
+        self.tags = tags
+        # "/users/{user_id}/x" -> ^/users/(?P<user_id>[^/]+)/x$
+        self.pattern = re.compile("^" + re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", path) + "$")
+        self.hits = 0
+        self.misses = 0
+
+
+class ResponseCache:
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._routes = []
+        self._entries = OrderedDict()  # key -> (body, etag, media_type, expires_at, tags, route)
+        self._tag_keys = {}            # tag -> {key}
+        self._bytes = 0
+        self._generation = 0           # Her invalidate'te artar (yarış koruması)
+        self._lock = threading.Lock()
+
+        # Sayaçlar
+        self.not_modified = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def cache_route(self, path: str, ttl: float, tags=None):
+        """
+        path: FastAPI rota şablonu (ör. "/users/{user_id}/playlists/").
+        tags: yol parametrelerinden (dict) etiket listesi üreten fonksiyon. Sözlükte
+              sorgu parametreleri de bulunur (aynı addaki yol parametresi önceliklidir).
+        """
+        self._routes.append(_Route(path, ttl, tags or (lambda params: [])))
+
+    def _match(self, path: str):
+        for route in self._routes:
+            m = route.pattern.match(path)
+            if m:
+                return route, m.groupdict()
+        return None, None
+
+    # --- KAYIT YÖNETİMİ ---
+
+    def _drop(self, key):
+        body, _, _, _, tags, _ = self._entries.pop(key)
+        self._bytes -= len(body)
+        for tag in tags:
+            keys = self._tag_keys.get(tag)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_keys[tag]
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[3] < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _store(self, key, body, etag, media_type, route, tags, generation):
+        if len(body) > self.max_bytes // 10:
+            return  # Tek bir dev yanıt önbelleği süpürmesin
+        with self._lock:
+            if generation != self._generation:
+                return  # İstek sürerken ilgili veri değişmiş olabilir; bayat yanıtı saklama
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (body, etag, media_type, time.monotonic() + route.ttl, tags, route)
+            self._bytes += len(body)
+            for tag in tags:
+                self._tag_keys.setdefault(tag, set()).add(key)
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, *tags):
+        """Verilen etiketlere sahip tüm kayıtları siler (yazma yollarından çağrılır)."""
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._tag_keys.get(tag, ())):
+                    self._drop(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tag_keys.clear()
+            self._bytes = 0
+
+    # --- MIDDLEWARE ---
+
+    async def middleware(self, request: Request, call_next):
+        if not RESPONSE_CACHE_ENABLED or request.method != "GET":
+            return await call_next(request)
+        route, params = self._match(request.url.path)
+        if route is None:
+            return await call_next(request)
+
+        key = f"{request.url.path}?{request.url.query}"
+        if_none_match = request.headers.get("if-none-match")
+
+        entry = self._lookup(key)
+        if entry is not None:
+            body, etag, media_type = entry[0], entry[1], entry[2]
+            route.hits += 1
+            if _etag_matches(if_none_match, etag):
+                self.not_modified += 1
+                return Response(status_code=304, headers=self._headers(etag, "HIT"))
+            return Response(content=body, media_type=media_type, headers=self._headers(etag, "HIT"))
+
+        route.misses += 1
+        generation = self._generation
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        etag = make_etag(body)
+        media_type = response.headers.get("content-type")
+        self._store(key, body, etag, media_type, route, route.tags({**request.query_params, **params}), generation)
+
+        if _etag_matches(if_none_match, etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=self._headers(etag, "MISS"))
+        return Response(content=body, media_type=media_type, headers=self._headers(etag, "MISS"))
+
+    @staticmethod
+    def _headers(etag, status):
+        # no-cache: istemci saklayabilir ama her seferinde ETag ile doğrulatır (304)
+        return {"ETag": etag, "Cache-Control": "private, no-cache", "X-Cache": status}
+
+    def stats(self):
+        routes = {}
+        for route in self._routes:
+            total = route.hits + route.misses
+            routes[route.path] = {
+                "hits": route.hits,
+                "misses": route.misses,
+                "hit_ratio": round(route.hits / total, 4) if total else 0.0,
+            }
+        hits = sum(r["hits"] for r in routes.values())
+        total = hits + sum(r["misses"] for r in routes.values())
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+            "not_modified": self.not_modified,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "routes": routes,
+        }
+
+
+# Süreç genelinde tek önbellek (main.py rotaları kaydeder, yazma yolları invalidate eder)
+response_cache = ResponseCache()
+
+
+def user_playlists_tag(user_id) -> str:
+    return f"user:{user_id}:playlists"
+
+
+def playlist_tag(playlist_id) -> str:
+    return f"playlist:{playlist_id}"
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import List, Optional
 from datetime import datetime
 
@@ -74,6 +74,13 @@ class SongBase(BaseModel):
     class Config:
         from_attributes = True
 
+class SongSearchResult(SongBase):
+    score: float  # BM25 (büyük = daha alakalı)
+
+class SongSearchPage(BaseModel):
+    results: List[SongSearchResult]
+    next_offset: Optional[int] = None  # None ise son sayfa
+
 class PlaylistCreate(BaseModel):
     name: str
 
@@ -87,6 +94,36 @@ class PlaylistOut(BaseModel):
     id: int
     name: str
     is_favorite: bool
+    item_count: int = 0
+    updated_at: Optional[datetime] = None
     items: List[PlaylistItemOut] = []
     class Config:
         from_attributes = True
+
+class PlaylistSummaryOut(BaseModel):
+    # Listeleme için: şarkılar olmadan, sadece özet
+    id: int
+    name: str
+    is_favorite: bool
+    item_count: int = 0
+    updated_at: Optional[datetime] = None
+    class Config:
+        from_attributes = True
+
+class PlaylistItemsPage(BaseModel):
+    playlist_id: int
+    items: List[PlaylistItemOut]
+    next_cursor: Optional[str] = None  # None ise son sayfa
+
+class PlaylistSongsBatch(BaseModel):
+    # Sıra önemlidir: ekleme ve yeniden sıralamada ilk şarkı en üstte olur
+    song_ids: List[int] = Field(..., min_length=1, max_length=500)
+
+class BatchSongResult(BaseModel):
+    song_id: int
+    status: str
+
+class PlaylistBatchOut(BaseModel):
+    playlist_id: int
+    item_count: Optional[int] = None
+    results: List[BatchSongResult]
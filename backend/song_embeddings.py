@@ -0,0 +1,239 @@
+"""
+Şarkı vektörleri (song embedding) matrisi.
+
+Her şarkı ai_service modeliyle BİR KEZ (batch halinde) vektöre çevrilir ve
+diske bitişik (contiguous) float32 .npy matrisi olarak yazılır. Sunucu bu
+dosyayı np.memmap ile açar, öneri = tek matris-vektör çarpımı + top-k.
+
+Kullanım:
+    python song_embeddings.py    -> yeni eklenen / metni değişen şarkıları kodlar, matrisi günceller
+"""
+import hashlib
+import os
+import threading
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+import models
+
+SONG_VECTORS_PATH = os.getenv("SONG_VECTORS_PATH", "song_vectors.npy")
+SONG_META_PATH = os.getenv("SONG_META_PATH", "song_meta.npz")
+ENCODE_BATCH_SIZE = 256
+
+
+def song_text(title, artist, genre, theme) -> str:
+    # Profil metnine benzer bir "çorba" (bkz. main.create_profile_for_user)
+    return (
+        f"Şarkı: {title or ''}. "
+        f"Sanatçı: {artist or ''}. "
+        f"Tür: {genre or ''}. "
+        f"Tema: {theme or ''}"
+    )
+
+
+def text_fingerprint(text: str) -> int:
+    """Şarkı metninin 64 bit özeti; tür/tema güncellenen şarkılar yeniden kodlanır."""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+def _encode_labels(values, vocab: list):
+    """Tür/tema metinlerini tamsayı kodlara çevirir (vektörel filtreleme için)."""
+    lookup = {label: i for i, label in enumerate(vocab)}
+    codes = np.empty(len(values), dtype=np.int32)
+    for i, value in enumerate(values):
+        key = (value or "").strip().lower()
+        if key not in lookup:
+            lookup[key] = len(vocab)
+            vocab.append(key)
+        codes[i] = lookup[key]
+    return codes
+
+
+def build_song_matrix(db: Session, vectors_path: str = SONG_VECTORS_PATH, meta_path: str = SONG_META_PATH):
+    """
+    Matriste olmayan ya da metni (tür/tema...) değişmiş şarkıları batch halinde
+    kodlar ve matrisi yeniden yazar. Metni aynı kalan şarkılar tekrar modelden geçmez.
+    """
+    import ai_service
+
+    old_ids = np.zeros(0, dtype=np.int64)
+    old_fingerprints = None
+    old_vectors = None
+    if os.path.exists(vectors_path) and os.path.exists(meta_path):
+        with np.load(meta_path) as meta:
+            old_ids = meta["ids"]
+            if "text_fingerprints" in meta.files:
+                old_fingerprints = meta["text_fingerprints"]
+        old_vectors = np.load(vectors_path, mmap_mode="r")
+
+    rows = (
+        db.query(models.Song.id, models.Song.title, models.Song.artist, models.Song.genre, models.Song.theme)
+        .order_by(models.Song.id)
+        .all()
+    )
+    if not rows:
+        print("⚠️ Şarkı tablosu boş, vektör matrisi oluşturulmadı.")
+        return
+
+    ids = np.fromiter((r.id for r in rows), dtype=np.int64, count=len(rows))
+    texts = [song_text(r.title, r.artist, r.genre, r.theme) for r in rows]
+    fingerprints = np.fromiter((text_fingerprint(t) for t in texts), dtype=np.int64, count=len(rows))
+    known = np.isin(ids, old_ids)
+    if old_fingerprints is None:
+        if known.any():
+            print("⚠️ Eski meta dosyasında metin özeti yok; tüm şarkılar yeniden kodlanacak.")
+        known[:] = False
+    elif known.any():
+        # Tür/tema (katalog upsert'i) değişen şarkıların eski vektörü kullanılmaz
+        known[known] = old_fingerprints[np.searchsorted(old_ids, ids[known])] == fingerprints[known]
+    new_rows = [i for i, k in enumerate(known) if not k]
+    print(f"🎵 {len(rows)} şarkı, {len(new_rows)} tanesi yeni / değişmiş, kodlanacak...")
+
+    dim = old_vectors.shape[1] if old_vectors is not None else None
+    new_vectors = None
+    if new_rows:
+        parts = []
+        for start in range(0, len(new_rows), ENCODE_BATCH_SIZE):
+            batch = new_rows[start:start + ENCODE_BATCH_SIZE]
+            parts.append(ai_service.get_mood_vectors(
+                [texts[i] for i in batch],
+                batch_size=ENCODE_BATCH_SIZE,
+                use_cache=False,  # Her şarkı zaten bir kez kodlanıyor, önbelleği doldurmasın
+            ))
+            print(f"   ... {min(start + ENCODE_BATCH_SIZE, len(new_rows))}/{len(new_rows)}")
+        new_vectors = np.concatenate(parts)
+        dim = new_vectors.shape[1]
+
+    # Yeni matrisi geçici dosyaya yaz, sonra atomik olarak değiştir
+    tmp_path = vectors_path + ".tmp"
+    out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(len(rows), dim))
+    if old_vectors is not None and known.any():
+        old_pos = np.searchsorted(old_ids, ids[known])
+        out[np.flatnonzero(known)] = old_vectors[old_pos]
+    if new_vectors is not None:
+        norms = np.linalg.norm(new_vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        out[np.flatnonzero(~known)] = new_vectors / norms
+    out.flush()
+    del out, old_vectors
+    os.replace(tmp_path, vectors_path)
+
+    write_song_meta(ids, [r.genre for r in rows], [r.theme for r in rows], meta_path, fingerprints)
+    print(f"✅ Şarkı matrisi kaydedildi: {vectors_path} ({len(rows)} x {dim})")
+
+
+def write_song_meta(ids, genres, themes, meta_path: str = SONG_META_PATH, text_fingerprints=None):
+    """
+    Matris satırlarının şarkı id'leri ve tür/tema kodları (filtreler için); atomik yazılır.
+    text_fingerprints: satırların song_text özeti (vektörü metinden üretilmeyen
+    sentetik matrislerde verilmez; bir sonraki build hepsini yeniden kodlar).
+    """
+    genre_vocab, theme_vocab = [], []
+    genre_codes = _encode_labels(genres, genre_vocab)
+    theme_codes = _encode_labels(themes, theme_vocab)
+    extra = {}
+    if text_fingerprints is not None:
+        extra["text_fingerprints"] = np.asarray(text_fingerprints, dtype=np.int64)
+    with open(meta_path + ".tmp", "wb") as f:
+        np.savez(f, ids=np.asarray(ids, dtype=np.int64), genre_codes=genre_codes, theme_codes=theme_codes,
+                 genre_vocab=np.array(genre_vocab, dtype=str),  # Unicode dizi: yüklerken pickle gerekmez
+                 theme_vocab=np.array(theme_vocab, dtype=str), **extra)
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+class SongIndex:
+    """
+    Şarkı matrisini memory-map ile açan, filtreli top-k arama yapan sınıf.
+    Filtreler (tür, tema, hariç tutulan şarkılar) boolean maske olarak uygulanır.
+    """
+
+    def __init__(self, vectors_path: str = SONG_VECTORS_PATH, meta_path: str = SONG_META_PATH):
+        self.vectors_path = vectors_path
+        self.meta_path = meta_path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self.matrix = None
+        self.ids = None
+
+    @property
+    def available(self) -> bool:
+        return os.path.exists(self.vectors_path) and os.path.exists(self.meta_path)
+
+    def ensure_loaded(self) -> bool:
+        """Dosya değiştiyse (yeniden build edildiyse) tekrar map eder."""
+        if not self.available:
+            return False
+        mtime = os.path.getmtime(self.vectors_path)
+        if self._mtime == mtime:
+            return True
+        with self._lock:
+            if self._mtime != mtime:
+                with np.load(self.meta_path) as meta:
+                    try:
+                        genre_vocab = meta["genre_vocab"].tolist()
+                        theme_vocab = meta["theme_vocab"].tolist()
+                    except ValueError:
+                        # Eski format (object dizi, pickle ister): güvenli değil, yüklenmez
+                        print(f"⚠️ {self.meta_path} eski formatta; python song_embeddings.py ile yeniden oluşturun.")
+                        return False
+                    self.ids = meta["ids"]
+                    self.genre_codes = meta["genre_codes"]
+                    self.theme_codes = meta["theme_codes"]
+                    self._genre_lookup = {g: i for i, g in enumerate(genre_vocab)}
+                    self._theme_lookup = {t: i for i, t in enumerate(theme_vocab)}
+                self.matrix = np.load(self.vectors_path, mmap_mode="r")
+                self._mtime = mtime
+        return True
+
+    def get_vector(self, song_id: int):
+        row = np.searchsorted(self.ids, song_id)
+        if row >= len(self.ids) or self.ids[row] != song_id:
+            return None
+        return np.asarray(self.matrix[row])
+
+    def search(self, query_vector, top_k: int = 10, genre: str = None, theme: str = None,
+               exclude_song_ids=None):
+        """Sonuç: [(song_id, score), ...] skora göre azalan sırada."""
+        query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        scores = self.matrix @ query
+
+        # Filtreler: tek tek şarkı gezmeden boolean maske
+        mask = np.ones(len(scores), dtype=bool)
+        if genre:
+            code = self._genre_lookup.get(genre.strip().lower())
+            if code is None:
+                return []
+            mask &= self.genre_codes == code
+        if theme:
+            code = self._theme_lookup.get(theme.strip().lower())
+            if code is None:
+                return []
+            mask &= self.theme_codes == code
+        if exclude_song_ids is not None and len(exclude_song_ids):
+            mask &= ~np.isin(self.ids, np.asarray(exclude_song_ids, dtype=np.int64))
+
+        valid = int(mask.sum())
+        k = min(top_k, valid)
+        if k <= 0:
+            return []
+        scores = np.where(mask, scores, -np.inf)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(self.ids[i]), float(scores[i])) for i in top]
+
+
+# Süreç çapında tek şarkı indeksi
+song_index = SongIndex()
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    db = SessionLocal()
+    build_song_matrix(db)
+    db.close()
@@ -0,0 +1,159 @@
+"""
+Şarkı kataloğunda tam metin arama (SQLite FTS5).
+
+songs_fts, "contentless" bir FTS5 tablosudur: metni tekrar saklamaz, sadece
+ters indeksi tutar (sonuçlar songs ile JOIN edilerek okunur). songs üzerindeki
+INSERT/UPDATE/DELETE tetikleyicileri indeksi aynı transaction içinde günceller;
+catalog_loader'ın toplu yazmaları da otomatik olarak indekslenir.
+
+unicode61 tokenizer "ş, ç, ö, ü, ğ" aksanlarını siler ama noktasız "ı"yı "i"ye
+çevirmez; bu yüzden indekse yazarken ve ararken ı -> i katlaması yapılır
+("sarki" -> "Şarkı" eşleşir).
+
+- search_songs: BM25 sıralı arama (title > artist > genre/theme ağırlıklı)
+- autocomplete: önek araması; adaylar FTS sorgusunun içinde BM25 ile sıralanıp
+  AUTOCOMPLETE_CANDIDATES ile kesilir, sonra başlık önekine göre dizilir
+"""
+import re
+import unicodedata
+
+from sqlalchemy import text
+
+AUTOCOMPLETE_CANDIDATES = 200  # Önek eşleşmelerinden sıralamaya alınacak en fazla aday
+MIN_PREFIX_LENGTH = 2  # Tek harflik önekler (indekslenmez) tüm terim listesini tarar
+BM25_WEIGHTS = (10.0, 5.0, 1.0, 1.0)  # title, artist, genre, theme
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def _fold(value: str) -> str:
+    """Tokenizer ile aynı katlama (Python tarafı): küçük harf, aksansız, ı -> i."""
+    value = unicodedata.normalize("NFKD", value.lower().replace("ı", "i"))
+    return "".join(ch for ch in value if not unicodedata.combining(ch))
+
+
+def _folded(row: str) -> str:
+    """Tetikleyicilerde indekse yazılan sütun değerleri (ı -> i katlaması)."""
+    return ", ".join(f"replace({row}.{col}, 'ı', 'i')" for col in ("title", "artist", "genre", "theme"))
+
+
+_DDL = [
+    # remove_diacritics: "şarkı" ile "sarki" aynı eşleşir; prefix: 2-4 harflik önek indeksleri
+    """CREATE VIRTUAL TABLE IF NOT EXISTS songs_fts USING fts5(
+        title, artist, genre, theme,
+        content='',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3 4'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS songs_fts_ai AFTER INSERT ON songs BEGIN
+        INSERT INTO songs_fts(rowid, title, artist, genre, theme)
+        VALUES (new.id, {_folded("new")});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS songs_fts_ad AFTER DELETE ON songs BEGIN
+        INSERT INTO songs_fts(songs_fts, rowid, title, artist, genre, theme)
+        VALUES ('delete', old.id, {_folded("old")});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS songs_fts_au AFTER UPDATE OF title, artist, genre, theme ON songs BEGIN
+        INSERT INTO songs_fts(songs_fts, rowid, title, artist, genre, theme)
+        VALUES ('delete', old.id, {_folded("old")});
+        INSERT INTO songs_fts(rowid, title, artist, genre, theme)
+        VALUES (new.id, {_folded("new")});
+    END""",
+]
+
+
+def ensure_search_index(engine, backfill: bool = True):
+    """
+    FTS tablosunu ve tetikleyicileri yoksa oluşturur; ilk oluşturmada mevcut
+    şarkıları indeksler. Tekrar çağrılması ucuzdur.
+    backfill=False (sunucu açılışı): katalog doluysa indeks kurulmaz, sadece
+    uyarılır; büyük katalogda tüm şarkıları indekslemek açılışı bloklamasın
+    (migrate_schema / catalog_loader kurar). Boş veritabanında hemen oluşturulur.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'songs_fts'")
+        ).first()
+        if not exists and not backfill and conn.execute(text("SELECT 1 FROM songs LIMIT 1")).first():
+            print("⚠️ Şarkı arama indeksi yok! Oluşturmak için: python migrate_schema.py")
+            return False
+        for stmt in _DDL:
+            conn.execute(text(stmt))
+        if not exists:
+            conn.execute(text(
+                f"INSERT INTO songs_fts(rowid, title, artist, genre, theme) SELECT id, {_folded('songs')} FROM songs"
+            ))
+            print("🔎 Şarkı arama indeksi (FTS5) oluşturuldu.")
+    return True
+
+
+def match_query(q: str, prefix: bool = False):
+    """
+    Kullanıcı girdisini güvenli bir FTS5 sorgusuna çevirir: her kelime tırnaklı
+    (operatör olarak yorumlanmaz) ve hepsi eşleşmeli (AND). prefix=True ise son
+    kelime önek olarak aranır. Aranacak kelime yoksa None.
+    """
+    tokens = _TOKEN.findall(_fold(q))
+    if prefix and tokens and len(tokens[-1]) < MIN_PREFIX_LENGTH:
+        tokens.pop()  # Henüz yazılmakta olan tek harf: önceki kelimelerle ara
+        prefix = False
+    if not tokens:
+        return None
+    terms = [f'"{t}"' for t in tokens]
+    if prefix:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_songs(db, q: str, limit: int = 20, offset: int = 0):
+    """BM25 sıralı arama. (sonuçlar, sonraki sayfanın offset'i veya None) döner."""
+    query = match_query(q)
+    if query is None:
+        return [], None
+    rows = db.execute(
+        text(
+            "SELECT s.id, s.title, s.artist, s.genre, s.theme, "
+            f"bm25(songs_fts, {', '.join(map(str, BM25_WEIGHTS))}) AS rank "
+            "FROM songs_fts JOIN songs s ON s.id = songs_fts.rowid "
+            "WHERE songs_fts MATCH :q ORDER BY rank LIMIT :limit OFFSET :offset"
+        ),
+        {"q": query, "limit": limit + 1, "offset": offset},
+    ).all()
+
+    results = [
+        {"id": r.id, "title": r.title, "artist": r.artist, "genre": r.genre, "theme": r.theme,
+         "score": round(-r.rank, 4)}  # bm25 negatif döner; büyük skor = daha alakalı
+        for r in rows[:limit]
+    ]
+    next_offset = offset + limit if len(rows) > limit else None
+    return results, next_offset
+
+
+def autocomplete(db, q: str, limit: int = 10):
+    """
+    Başlık/sanatçı önek tamamlama. Önek eşleşmeleri FTS sorgusunun içinde BM25 ile
+    sıralanır (rowid sırasıyla keyfi kesilmez) ve en alakalı AUTOCOMPLETE_CANDIDATES
+    aday alınır; bunlar arasında başlığı önekle başlayanlar ve kısa başlıklar öne alınır.
+    """
+    query = match_query(q, prefix=True)
+    if query is None:
+        return []
+    rows = db.execute(
+        text(
+            "SELECT s.id, s.title, s.artist, s.genre, s.theme FROM ("
+            "SELECT rowid, rank FROM songs_fts WHERE songs_fts MATCH :q "
+            f"AND rank MATCH 'bm25({', '.join(map(str, BM25_WEIGHTS))})' "
+            "ORDER BY rank LIMIT :candidates"
+            ") c JOIN songs s ON s.id = c.rowid"
+        ),
+        {"q": f"{{title artist}} : ({query})", "candidates": AUTOCOMPLETE_CANDIDATES},
+    ).all()
+
+    typed = _fold(q.strip())
+    rows.sort(key=lambda r: (not _fold(r.title or "").startswith(typed), len(r.title or ""), r.id))
+    return [
+        {"id": r.id, "title": r.title, "artist": r.artist, "genre": r.genre, "theme": r.theme}
+        for r in rows[:limit]
+    ]
@@ -0,0 +1,210 @@
+"""
+Sentetik veri üretici (ölçek testleri ve bench_endpoints.py için).
+
+users, user_profiles, songs, playlists, playlist_items ve listening_history
+tablolarını seed'li rastgele veriyle doldurur; aynı seed aynı veriyi üretir.
+Mood vektörleri MiniLM yerine rastgele birim vektörlerdir (model yüklenmez).
+
+- Şarkı popülerliği çarpıktır (az sayıda şarkı çok dinlenir), CF ve playlist
+  sorguları gerçekçi dağılımla çalışır.
+- Her kullanıcının "Favorilenler" listesi vardır (crud.create_user gibi).
+- Sayaç sütunları (users.playlist_count, playlists.item_count) tutarlı yazılır.
+- İstenirse şarkı vektör matrisi de (song_embeddings formatında) yazılır. Komut
+  satırında varsayılan olarak yazılmaz: SONG_VECTORS_PATH üretimdeki gerçek
+  matrisi gösterebilir, rastgele vektörlerle ezilmemeli.
+
+Kullanım:
+    DATABASE_URL=sqlite:///./bench.db python synthetic_data.py --users 10000 --songs 100000
+    DATABASE_URL=sqlite:///./bench.db python synthetic_data.py --song-vectors bench_vectors.npy
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import func, insert, select
+
+import models
+import song_search
+from crud import get_password_hash
+from playlist_service import MAX_PLAYLISTS, MAX_PLAYLIST_SONGS
+from song_embeddings import SONG_META_PATH, SONG_VECTORS_PATH, write_song_meta
+from vector_codec import encode_vector
+
+VECTOR_DIM = 384
+BATCH_SIZE = 10_000
+
+SYLLABLES = ["ka", "ra", "se", "vi", "lo", "ne", "mu", "zi", "ta", "ay", "gö", "şa", "ım", "ol", "de", "ri"]
+GENRES = ["Classic Rock", "Blues", "Metalcore", "Punk", "J-Pop", "Anime", "Indie Folk", "Vocal Jazz",
+          "Art Pop", "Avant-Garde", "Baroque Pop"]
+THEMES = ["Mutluluk", "Üzüntü", "Savaş", "Korku", "Sakinlik", "Enerji", "Aşk"]
+ACTIVITIES = ["Ders çalışırken", "Spor yaparken", "Arabada", "Yürürken", "Dinlenirken",
+              "Oyun oynarken", "Yemek yaparken", "Uyku öncesi"]
+CITIES = ["İstanbul", "Ankara", "İzmir", "Bursa", "Antalya", "Eskişehir", "Trabzon", "Konya"]
+
+
+def _word(rng):
+    return "".join(rng.choice(SYLLABLES, size=rng.integers(2, 5)))
+
+
+def _unit_vectors(rng, n: int):
+    v = rng.standard_normal((n, VECTOR_DIM)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def _popular_songs(rng, song_ids, n: int):
+    """Çarpık dağılımla (düşük sıradaki şarkılar daha popüler) tekrarsız n şarkı."""
+    picks = (len(song_ids) * rng.random(n * 2) ** 3).astype(np.int64)
+    return song_ids[np.unique(picks)[:n]]
+
+
+def _next_id(conn, table):
+    return (conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+
+def _insert(conn, table, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        conn.execute(insert(table), rows[start:start + BATCH_SIZE])
+
+
+def generate(engine, users: int = 1000, songs: int = 10_000, playlists_per_user: float = 3,
+             items_per_playlist: float = 20, history_per_user: float = 30, seed: int = 42,
+             vectors_path: str = SONG_VECTORS_PATH, meta_path: str = SONG_META_PATH):
+    """
+    Tabloları doldurur (mevcut verinin üzerine ekler). Ortalama değerler Poisson
+    dağılımıyla kullanıcı/playlist başına değişir. vectors_path None ise şarkı
+    matrisi yazılmaz. Üretilen id'leri döner (benchmark istekleri için).
+    """
+    rng = np.random.default_rng(seed)
+    models.Base.metadata.create_all(bind=engine)
+    song_search.ensure_search_index(engine)  # Tetikleyiciler eklenen şarkıları da indekslesin
+
+    tables = {name: models.Base.metadata.tables[name] for name in
+              ("users", "user_profiles", "songs", "playlists", "playlist_items", "listening_history")}
+    password_hash = get_password_hash("sifre123")  # bcrypt pahalı: tüm kullanıcılar aynı hash'i paylaşır
+    now = datetime.utcnow()
+
+    with engine.begin() as conn:
+        first = {name: _next_id(conn, table) for name, table in tables.items()}
+
+        # --- ŞARKILAR ---
+        start = time.perf_counter()
+        song_ids = np.arange(first["songs"], first["songs"] + songs, dtype=np.int64)
+        artists = [f"{_word(rng).title()} {_word(rng).title()}" for _ in range(max(1, songs // 20))]
+        song_genres = rng.choice(GENRES, size=songs)
+        song_themes = rng.choice(THEMES, size=songs)
+        _insert(conn, tables["songs"], [
+            {"id": int(song_id), "title": " ".join(_word(rng) for _ in range(rng.integers(1, 4))).title(),
+             "artist": artists[rng.integers(len(artists))], "genre": genre, "theme": theme}
+            for song_id, genre, theme in zip(song_ids, song_genres, song_themes)
+        ])
+        print(f"🎵 {songs} şarkı ({time.perf_counter() - start:.1f} sn)")
+
+        # --- KULLANICILAR + PROFİLLER ---
+        start = time.perf_counter()
+        user_ids = np.arange(first["users"], first["users"] + users, dtype=np.int64)
+        playlist_counts = np.minimum(rng.poisson(playlists_per_user, size=users), MAX_PLAYLISTS)
+        _insert(conn, tables["users"], [
+            {"id": int(user_id), "username": f"synth{seed}_{user_id}", "email": f"synth{seed}_{user_id}@ornek.com",
+             "password_hash": password_hash, "playlist_count": int(count)}
+            for user_id, count in zip(user_ids, playlist_counts)
+        ])
+        for offset in range(0, users, BATCH_SIZE):
+            batch = user_ids[offset:offset + BATCH_SIZE]
+            vectors = _unit_vectors(rng, len(batch))
+            conn.execute(insert(tables["user_profiles"]), [
+                {"id": first["user_profiles"] + offset + i, "user_id": int(user_id),
+                 "age": int(rng.integers(16, 60)), "location": str(rng.choice(CITIES)),
+                 "hobbies": str(rng.choice(ACTIVITIES)),
+                 "favorite_genres": ", ".join(rng.choice(GENRES, size=rng.integers(1, 4), replace=False)),
+                 "mood_description": str(rng.choice(THEMES)), "mood_vector": encode_vector(vector)}
+                for i, (user_id, vector) in enumerate(zip(batch, vectors))
+            ])
+        print(f"👤 {users} kullanıcı + profil ({time.perf_counter() - start:.1f} sn)")
+
+        # --- PLAYLISTLER (her kullanıcıya bir favori listesi + normal listeler) ---
+        start = time.perf_counter()
+        playlist_rows, item_rows = [], []
+        playlist_id, item_id = first["playlists"], first["playlist_items"]
+        for user_id, count in zip(user_ids, playlist_counts):
+            for n in range(count + 1):
+                is_favorite = bool(n == count)
+                chosen = _popular_songs(rng, song_ids, min(rng.poisson(items_per_playlist), MAX_PLAYLIST_SONGS))
+                added = sorted(now - timedelta(seconds=float(s)) for s in rng.random(len(chosen)) * 365 * 86400)
+                for position, (song_id, added_at) in enumerate(zip(chosen, added), start=1):
+                    item_rows.append({"id": item_id, "playlist_id": playlist_id, "song_id": int(song_id),
+                                      "added_at": added_at, "position": position})
+                    item_id += 1
+                playlist_rows.append({
+                    "id": playlist_id, "user_id": int(user_id), "is_favorite": is_favorite,
+                    "name": "Favorilenler" if is_favorite else f"Liste {n + 1}",
+                    "item_count": len(chosen), "updated_at": max(added, default=now),
+                })
+                playlist_id += 1
+            if len(item_rows) >= BATCH_SIZE * 10:
+                _insert(conn, tables["playlists"], playlist_rows)
+                _insert(conn, tables["playlist_items"], item_rows)
+                playlist_rows, item_rows = [], []
+        _insert(conn, tables["playlists"], playlist_rows)
+        _insert(conn, tables["playlist_items"], item_rows)
+        print(f"📂 {playlist_id - first['playlists']} playlist, {item_id - first['playlist_items']} şarkı "
+              f"({time.perf_counter() - start:.1f} sn)")
+
+        # --- DİNLEME GEÇMİŞİ ---
+        start = time.perf_counter()
+        history_rows = []
+        history_id = first["listening_history"]
+        for user_id in user_ids:
+            for song_id in _popular_songs(rng, song_ids, rng.poisson(history_per_user)):
+                history_rows.append({"id": history_id, "user_id": int(user_id), "song_id": int(song_id)})
+                history_id += 1
+        _insert(conn, tables["listening_history"], history_rows)
+        print(f"🎧 {len(history_rows)} dinleme kaydı ({time.perf_counter() - start:.1f} sn)")
+
+    # --- ŞARKI VEKTÖR MATRİSİ (song_embeddings formatında, rastgele birim vektörler) ---
+    if vectors_path is not None and songs:
+        with engine.connect() as conn:
+            rows = conn.execute(select(tables["songs"].c.id, tables["songs"].c.genre, tables["songs"].c.theme)
+                                .order_by(tables["songs"].c.id)).all()
+        out = np.lib.format.open_memmap(vectors_path + ".tmp", mode="w+", dtype=np.float32,
+                                        shape=(len(rows), VECTOR_DIM))
+        for offset in range(0, len(rows), BATCH_SIZE):
+            out[offset:offset + BATCH_SIZE] = _unit_vectors(rng, min(BATCH_SIZE, len(rows) - offset))
+        out.flush()
+        del out
+        os.replace(vectors_path + ".tmp", vectors_path)
+        write_song_meta([r.id for r in rows], [r.genre for r in rows], [r.theme for r in rows], meta_path)
+        print(f"🧮 Şarkı matrisi yazıldı: {vectors_path} ({len(rows)} x {VECTOR_DIM})")
+
+    return {
+        "user_ids": user_ids,
+        "song_ids": song_ids,
+        "playlist_ids": np.arange(first["playlists"], playlist_id, dtype=np.int64),
+    }
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="Sentetik veri üretici")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--songs", type=int, default=10_000)
+    parser.add_argument("--playlists-per-user", type=float, default=3)
+    parser.add_argument("--items-per-playlist", type=float, default=20)
+    parser.add_argument("--history-per-user", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--song-vectors", default=None,
+                        help="Rastgele şarkı matrisinin yazılacağı .npy yolu (verilmezse yazılmaz)")
+    parser.add_argument("--song-meta", default=None,
+                        help="Şarkı meta dosyası (varsayılan: <song-vectors>_meta.npz)")
+    args = parser.parse_args()
+    meta_path = args.song_meta
+    if args.song_vectors and meta_path is None:
+        meta_path = os.path.splitext(args.song_vectors)[0] + "_meta.npz"
+
+    start = time.perf_counter()
+    generate(engine, users=args.users, songs=args.songs, playlists_per_user=args.playlists_per_user,
+             items_per_playlist=args.items_per_playlist, history_per_user=args.history_per_user,
+             seed=args.seed, vectors_path=args.song_vectors, meta_path=meta_path)
+    print(f"✅ Sentetik veri hazır ({time.perf_counter() - start:.1f} sn)")
@@ -0,0 +1,412 @@
+"""
+Önceden hesaplanmış "benzer kullanıcılar" tablosu (user_neighbors).
+
+/users/{id}/recommendations/ her istekte tüm vektörleri taramak yerine bu
+tablodan tek bir indeksli okuma yapar. Tabloyu bu modüldeki arka plan işi doldurur:
+
+- Tam yenileme: tüm profil vektörleri bloklar halinde çarpılır
+  (blok x N skor matrisi, NEIGHBORS_BLOCK_BYTES ile sınırlı) ve her kullanıcı
+  için en iyi NEIGHBORS_K komşu önce user_neighbors_staging'e kısa
+  transaction'larla yazılır, sonra tek kısa transaction'da yerine konur. Eski
+  tablo o ana kadar okunmaya devam eder; SQLite yazma kilidi hesap boyunca
+  tutulmaz.
+- Artımlı yenileme: profil oluşturulunca/değişince mark_dirty() çağrılır.
+  Sadece o kullanıcının satırı, yeni vektörün mevcut k'ıncı skorunu geçtiği
+  kullanıcıların satırları ve listesinde o kullanıcı bulunan satırlar yeniden
+  hesaplanır.
+- Periyodik tam yenileme (NEIGHBORS_FULL_REFRESH_SECONDS) kaçan güncellemeleri
+  (ör. başka bir süreçte yazılan profiller) toparlar.
+- Çok worker (USER_VECTOR_STORE_PATH): iş sadece depo yanındaki
+  ".neighbors.lock" kilidini alan worker'da çalışır; diğerleri kilidi periyodik
+  dener (lider ölürse devralır). Lider, diğer worker'ların yazdığı profilleri
+  paylaşılan depoya eklenen satırlardan öğrenir.
+
+Komut satırından tam yenileme:
+    python user_neighbors.py
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal, engine
+from response_cache import response_cache
+from vector_index import user_index, USER_VECTOR_STORE_PATH
+import vector_store
+
+NEIGHBORS_K = int(os.getenv("NEIGHBORS_K", "20"))  # Kullanıcı başına saklanan komşu sayısı
+NEIGHBORS_BLOCK_BYTES = int(os.getenv("NEIGHBORS_BLOCK_BYTES", str(64 * 1024 * 1024)))  # Skor bloğu bellek sınırı
+NEIGHBORS_REFRESH_DELAY = float(os.getenv("NEIGHBORS_REFRESH_DELAY", "1.0"))  # Kirli kullanıcıları biriktirme süresi (sn)
+NEIGHBORS_FULL_REFRESH_SECONDS = float(os.getenv("NEIGHBORS_FULL_REFRESH_SECONDS", str(6 * 3600)))  # 0 = kapalı
+INCREMENTAL_MAX_FRACTION = 0.25  # Etkilenen satırlar bundan fazlaysa tam yenileme daha ucuz
+WRITE_CHUNK = 500                # DELETE ... IN (...) parametre sınırı için
+# Paylaşılan depo (çok worker) modunda: işi tek worker yürütür; diğerleri bu aralıkla kilidi dener,
+# lider de diğer worker'ların depoya eklediği profilleri bu aralıkla toplar
+NEIGHBORS_LEADER_POLL_SECONDS = float(os.getenv("NEIGHBORS_LEADER_POLL_SECONDS", "5"))
+STAGING_CHUNK = 2_000            # Tam yenilemede ara tabloya transaction başına yazılan kullanıcı
+
+
+def _top_k(scores, self_cols, k: int):
+    """Her satırın (kendisi hariç) en iyi k sütunu ve skorları, skora göre azalan."""
+    scores[np.arange(len(self_cols)), self_cols] = -np.inf
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+class NeighborTableJob:
+
+    def __init__(self, k: int = NEIGHBORS_K, block_bytes: int = NEIGHBORS_BLOCK_BYTES):
+        self.k = k
+        self.block_bytes = block_bytes
+        self._compute_lock = threading.Lock()  # Aynı anda tek hesaplama
+        self._cond = threading.Condition()
+        self._dirty = set()
+        self._in_progress = set()
+        self._kth = None  # user_id -> (k'ıncı skor, komşu sayısı); None = henüz okunmadı
+        self._thread = None
+        self._stopping = False
+        self.leader_lock_path = USER_VECTOR_STORE_PATH + ".neighbors.lock" if USER_VECTOR_STORE_PATH else None
+        self._leader_lock = None
+        self.follower = False  # Paylaşılan depo modunda işi başka worker yürütüyor
+        self._store_cursor = None
+        self._took_over = False
+
+        # Sayaçlar
+        self.full_refreshes = 0
+        self.incremental_refreshes = 0
+        self.rows_written = 0
+        self.last_full_refresh = None
+        self.last_duration = None
+
+    @staticmethod
+    def enabled() -> bool:
+        """
+        Sıkıştırılmış katman (SIMILARITY_BACKEND=compressed) etkinse tablo tutulmaz:
+        tam vektörler bellekte değildir, her yenileme N x dim float32 matrisi
+        veritabanından yeniden okumak zorunda kalırdı. Öneriler canlı aranır
+        (int8 kodlarla aday seçimi + kesin sıralama).
+        """
+        return user_index.compressed is None
+
+    # --- HESAPLAMA ---
+
+    def _blocks(self, ids, matrix, positions):
+        """positions satırlarının komşularını blok blok üretir: (pozisyonlar, komşu id'leri, skorlar)."""
+        n = len(ids)
+        k = min(self.k, n - 1)
+        if k <= 0:
+            return
+        block = max(1, self.block_bytes // (4 * n))
+        for start in range(0, len(positions), block):
+            rows = positions[start:start + block]
+            top, top_scores = _top_k(matrix[rows] @ matrix.T, rows, k)
+            yield rows, ids[top], top_scores
+
+    def _write_rows(self, db: Session, ids, rows, neighbor_ids, scores, computed_at, table=models.UserNeighbor):
+        user_ids = ids[rows]
+        db.execute(insert(table), [
+            {"user_id": int(user_ids[i]), "rank": r, "neighbor_id": int(neighbor_ids[i, r]),
+             "score": float(scores[i, r]), "computed_at": computed_at}
+            for i in range(len(rows)) for r in range(neighbor_ids.shape[1])
+        ])
+        self.rows_written += len(rows)
+
+    def _remember_kth(self, ids, blocks):
+        """Artımlı yenilemenin "k'ıncı skor" karşılaştırması için tablonun bellekteki özeti."""
+        if self._kth is None:
+            return
+        for rows, _, scores in blocks:
+            self._kth.update(zip(ids[rows].tolist(), zip(scores[:, -1].tolist(), [scores.shape[1]] * len(rows))))
+
+    def refresh_all(self, db: Session):
+        """
+        Tüm tabloyu baştan hesaplar. Yazma kilidi hesap boyunca tutulmaz:
+        skorlar önce bellekte hesaplanır, user_neighbors_staging tablosuna kısa
+        (STAGING_CHUNK kullanıcılık) transaction'larla yazılır, en sonda tek kısa
+        transaction'da DELETE + INSERT ... SELECT ile yerine konur.
+        """
+        with self._compute_lock:
+            start = time.perf_counter()
+            user_index.ensure_loaded(db)
+            if not self.enabled():
+                return 0
+            ids, matrix = user_index.snapshot()
+            blocks = list(self._blocks(ids, matrix, np.arange(len(ids))))
+            del matrix
+            computed_at = datetime.utcnow()
+
+            staging = models.UserNeighborStaging
+            db.execute(delete(staging))
+            db.commit()
+            for rows, neighbor_ids, scores in blocks:
+                for i in range(0, len(rows), STAGING_CHUNK):
+                    part = slice(i, i + STAGING_CHUNK)
+                    self._write_rows(db, ids, rows[part], neighbor_ids[part], scores[part], computed_at, staging)
+                    db.commit()
+
+            columns = ["user_id", "rank", "neighbor_id", "score", "computed_at"]
+            try:
+                db.execute(delete(models.UserNeighbor))
+                db.execute(insert(models.UserNeighbor).from_select(
+                    columns, select(*(getattr(staging, c) for c in columns))
+                ))
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            db.execute(delete(staging))
+            db.commit()
+            self._kth = {}
+            self._remember_kth(ids, blocks)
+
+            self.full_refreshes += 1
+            self.last_full_refresh = computed_at
+            self.last_duration = time.perf_counter() - start
+        response_cache.invalidate("recommendations")
+        print(f"👥 Komşu tablosu yenilendi: {len(ids)} kullanıcı, {self.last_duration:.1f} sn")
+        return len(ids)
+
+    def _load_kth(self, db: Session):
+        """Tablodaki k'ıncı skorları belleğe alır (tablo bu süreçte yazılmadıysa, bir kez)."""
+        rows = db.execute(
+            select(models.UserNeighbor.user_id, func.min(models.UserNeighbor.score), func.count())
+            .group_by(models.UserNeighbor.user_id)
+        ).all()
+        self._kth = {int(user_id): (float(score), int(count)) for user_id, score, count in rows}
+
+    def _current_kth(self, db: Session, ids):
+        """Her kullanıcının tablodaki k'ıncı (en düşük) skoru; listesi dolu değilse -inf."""
+        if self._kth is None:
+            self._load_kth(db)
+        full = min(self.k, len(ids) - 1)
+        missing = (-np.inf, 0)
+        return np.fromiter(
+            (score if count >= full else -np.inf
+             for score, count in (self._kth.get(u, missing) for u in ids.tolist())),
+            dtype=np.float32, count=len(ids),
+        )
+
+    def refresh_users(self, db: Session, user_ids):
+        """
+        Artımlı yenileme: user_ids'in vektörleri yeni/değişmiş kabul edilir.
+        Yeniden hesaplanan satır sayısını döner.
+        """
+        with self._compute_lock:
+            start = time.perf_counter()
+            user_index.ensure_loaded(db)
+            if not self.enabled():
+                return 0
+            ids, matrix = user_index.snapshot()
+            n = len(ids)
+            changed = np.flatnonzero(np.isin(ids, list(user_ids)))
+            if n < 2 or len(changed) == 0:
+                return 0
+
+            # 1) Değişen kullanıcıların kendi satırları
+            affected = np.zeros(n, dtype=bool)
+            affected[changed] = True
+            # 2) Yeni vektörün mevcut k'ıncı skoru geçtiği kullanıcılar
+            best = (matrix[changed] @ matrix.T).max(axis=0)
+            affected |= best > self._current_kth(db, ids)
+            # 3) Listesinde değişen kullanıcı olanlar (skorları artık geçersiz)
+            holders = db.scalars(
+                select(models.UserNeighbor.user_id).distinct()
+                .where(models.UserNeighbor.neighbor_id.in_([int(u) for u in ids[changed]]))
+            ).all()
+            affected |= np.isin(ids, holders)
+
+            positions = np.flatnonzero(affected)
+            if len(positions) > INCREMENTAL_MAX_FRACTION * n:
+                full = True
+            else:
+                full = False
+                # Önce hesapla, sonra DELETE + INSERT'i arka arkaya (kısa yazma transaction'ı)
+                blocks = list(self._blocks(ids, matrix, positions))
+                computed_at = datetime.utcnow()
+                try:
+                    for i in range(0, len(positions), WRITE_CHUNK):
+                        chunk = [int(u) for u in ids[positions[i:i + WRITE_CHUNK]]]
+                        db.execute(delete(models.UserNeighbor).where(models.UserNeighbor.user_id.in_(chunk)))
+                    for rows, neighbor_ids, scores in blocks:
+                        self._write_rows(db, ids, rows, neighbor_ids, scores, computed_at)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    raise
+                self._remember_kth(ids, blocks)
+                self.incremental_refreshes += 1
+                self.last_duration = time.perf_counter() - start
+
+        if full:
+            return self.refresh_all(db)
+        response_cache.invalidate("recommendations")
+        return len(positions)
+
+    # --- ARKA PLAN İŞİ ---
+
+    def mark_dirty(self, user_id: int):
+        """Profili oluşan/değişen kullanıcıyı kuyruğa alır (iş çalışmıyorsa sadece kaydedilir)."""
+        if self.follower or (user_index.loaded and not self.enabled()):
+            return  # Lider worker değişikliği paylaşılan depodan görür
+        with self._cond:
+            self._dirty.add(user_id)
+            self._cond.notify()
+
+    def is_pending(self, user_id: int) -> bool:
+        with self._cond:
+            return user_id in self._dirty or user_id in self._in_progress
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="user-neighbors", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        if self._leader_lock is not None:
+            self._leader_lock.close()
+            self._leader_lock = None
+
+    def _needs_full_refresh(self):
+        if self.last_full_refresh is None:
+            return True
+        if NEIGHBORS_FULL_REFRESH_SECONDS <= 0:
+            return False
+        return (datetime.utcnow() - self.last_full_refresh).total_seconds() >= NEIGHBORS_FULL_REFRESH_SECONDS
+
+    def _wait_for_leadership(self):
+        """Paylaşılan depo modunda kilidi alana kadar bekler. Durdurulursa False."""
+        while True:
+            self._leader_lock = vector_store.try_exclusive_lock(self.leader_lock_path)
+            if self._leader_lock is not None:
+                if self.follower:
+                    # Önceki lider düştü: aradaki değişiklikler bilinmiyor, tam yenileme ile başla
+                    self._took_over = True
+                self.follower = False
+                print(f"👥 Komşu tablosu işi bu worker'da çalışıyor (pid {os.getpid()})")
+                return True
+            with self._cond:
+                if not self.follower:
+                    self.follower = True
+                    self._dirty.clear()
+                if not self._stopping:
+                    self._cond.wait(timeout=NEIGHBORS_LEADER_POLL_SECONDS)
+                if self._stopping:
+                    return False
+
+    def _collect_store_changes(self, db: Session):
+        """Lider: diğer worker'ların paylaşılan depoya eklediği profilleri kirli say."""
+        user_index.ensure_loaded(db)
+        changed, self._store_cursor = user_index.appended_since(self._store_cursor)
+        if changed is None:
+            self.last_full_refresh = None  # Depo yeniden yazıldı: neyin değiştiği bilinmiyor
+            changed = []
+        with self._cond:
+            self._dirty.update(changed)
+
+    def _run(self):
+        if self.leader_lock_path and not self._wait_for_leadership():
+            return
+
+        # Açılışta tablo boşsa (ilk kurulum) tam yenileme; doluysa periyodik takvime bırak
+        with SessionLocal() as db:
+            try:
+                if self.leader_lock_path:
+                    self._collect_store_changes(db)  # Başlangıç noktası (cursor)
+                if self._took_over or db.query(models.UserNeighbor.user_id).first() is None:
+                    self.refresh_all(db)
+                else:
+                    self.last_full_refresh = datetime.utcnow()
+            except Exception as e:
+                print(f"⚠️ Komşu tablosu kurulamadı: {e}")
+                self.last_full_refresh = datetime.utcnow()  # Sıcak döngüye girme; periyotta tekrar dene
+
+        while True:
+            with self._cond:
+                timeout = NEIGHBORS_FULL_REFRESH_SECONDS if NEIGHBORS_FULL_REFRESH_SECONDS > 0 else None
+                if self.leader_lock_path:
+                    timeout = min(timeout or NEIGHBORS_LEADER_POLL_SECONDS, NEIGHBORS_LEADER_POLL_SECONDS)
+                if not self._dirty and not self._stopping:
+                    self._cond.wait(timeout=timeout)
+                if self._stopping:
+                    return
+            if self.leader_lock_path:
+                try:
+                    with SessionLocal() as db:
+                        self._collect_store_changes(db)
+                except Exception as e:
+                    print(f"⚠️ Paylaşılan depo değişiklikleri okunamadı: {e}")
+                with self._cond:
+                    if not self._dirty and not self._needs_full_refresh():
+                        continue
+            # Kısa bir süre bekle: dalga halinde gelen profiller tek hesapta işlensin
+            time.sleep(NEIGHBORS_REFRESH_DELAY)
+            with self._cond:
+                batch, self._dirty = self._dirty, set()
+                self._in_progress = batch
+
+            try:
+                with SessionLocal() as db:
+                    if self._needs_full_refresh():
+                        self.refresh_all(db)
+                    elif batch:
+                        self.refresh_users(db, batch)
+            except Exception as e:
+                print(f"⚠️ Komşu tablosu yenilenemedi: {e}")
+                with self._cond:
+                    self._dirty |= batch  # Bir sonraki turda tekrar dene
+            finally:
+                with self._cond:
+                    self._in_progress = set()
+
+    def stats(self):
+        with self._cond:
+            pending = len(self._dirty) + len(self._in_progress)
+        return {
+            "k": self.k,
+            "enabled": self.enabled(),
+            "running": self._thread is not None,
+            "follower": self.follower,
+            "pending_users": pending,
+            "full_refreshes": self.full_refreshes,
+            "incremental_refreshes": self.incremental_refreshes,
+            "rows_written": self.rows_written,
+            "last_full_refresh": self.last_full_refresh.isoformat() if self.last_full_refresh else None,
+            "last_duration_seconds": round(self.last_duration, 3) if self.last_duration is not None else None,
+        }
+
+
+# Süreç genelinde tek iş (main.py başlatır, crud profil yazınca mark_dirty çağırır)
+neighbor_job = NeighborTableJob()
+
+
+def read_neighbors(db: Session, user_id: int, top_k: int):
+    """Tek indeksli okuma: [(neighbor_id, username, score, computed_at)] rank sırasıyla."""
+    return db.execute(
+        select(models.UserNeighbor.neighbor_id, models.User.username,
+               models.UserNeighbor.score, models.UserNeighbor.computed_at)
+        .join(models.User, models.User.id == models.UserNeighbor.neighbor_id)
+        .where(models.UserNeighbor.user_id == user_id)
+        .order_by(models.UserNeighbor.rank)
+        .limit(top_k)
+    ).all()
+
+
+if __name__ == "__main__":
+    models.Base.metadata.create_all(bind=engine)
+    with SessionLocal() as session:
+        neighbor_job.refresh_all(session)
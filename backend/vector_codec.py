@@ -0,0 +1,50 @@
+import json
+import struct
+
+import numpy as np
+
+# Binary vektör formatı (UserProfile.mood_vector BLOB kolonu için)
+# [0:2]  b"MV"       -> sihirli başlık (magic)
+# [2]    versiyon    -> şimdilik 1
+# [3]    ayrılmış    -> 0
+# [4:8]  boyut (dim) -> uint32, little-endian
+# [8:]   dim * float32, little-endian
+MAGIC = b"MV"
+VERSION = 1
+HEADER = struct.Struct("<2sBBI")
+HEADER_SIZE = HEADER.size  # 8 byte -> float32 verisi 4 byte hizalı başlar
+
+_FLOAT32_LE = np.dtype("<f4")
+
+
+def encode_vector(vector) -> bytes:
+    """Listeyi / NumPy dizisini başlıklı float32 byte dizisine çevirir (JSON yerine)."""
+    arr = np.asarray(vector, dtype=_FLOAT32_LE).reshape(-1)
+    return HEADER.pack(MAGIC, VERSION, 0, arr.shape[0]) + arr.tobytes()
+
+
+def is_encoded(value) -> bool:
+    return isinstance(value, (bytes, bytearray, memoryview)) and bytes(value[:2]) == MAGIC
+
+
+def decode_vector(value) -> np.ndarray:
+    """
+    BLOB'u kopyalamadan (np.frombuffer) float32 diziye çevirir.
+    Dönen dizi salt-okunurdur. Migration tamamlanmamış eski satırlar için
+    JSON string formatı da hâlâ okunabilir.
+    """
+    if value is None:
+        raise ValueError("Vektör boş")
+
+    if is_encoded(value):
+        magic, version, _, dim = HEADER.unpack_from(value, 0)
+        if version != VERSION:
+            raise ValueError(f"Desteklenmeyen vektör versiyonu: {version}")
+        if len(value) != HEADER_SIZE + dim * 4:
+            raise ValueError("Vektör verisi bozuk (uzunluk başlıkla uyuşmuyor)")
+        return np.frombuffer(value, dtype=_FLOAT32_LE, count=dim, offset=HEADER_SIZE)
+
+    # Eski format: "[0.1, 0.2, ...]" JSON string'i
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        value = bytes(value).decode("utf-8")
+    return np.asarray(json.loads(value), dtype=np.float32)
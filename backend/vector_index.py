@@ -0,0 +1,656 @@
+import os
+import sys
+import threading
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import models
+from database import ReadSessionLocal
+from vector_codec import decode_vector
+import ann_index
+import compressed_index
+import vector_store
+
+# Benzerlik arama motoru: "exact" (tam tarama), "ivf" (yaklaşık, ann_index) veya
+# "compressed" (PCA + int8 kodlarla aday seçimi, tam vektörlerle kesin sıralama)
+SIMILARITY_BACKEND = os.getenv("SIMILARITY_BACKEND", "exact")
+# IVF indeksi diskte yoksa en az bu kadar profil olunca otomatik kurulur
+ANN_MIN_USERS = int(os.getenv("ANN_MIN_USERS", "10000"))
+# Sıkıştırılmış katman en az bu kadar profil varsa kullanılır (altında float32 matris zaten küçük)
+COMPRESSED_MIN_USERS = int(os.getenv("COMPRESSED_MIN_USERS", "10000"))
+LOAD_CHUNK = 10_000  # Sıkıştırılmış yüklemede profiller bu kadarlık parçalarla okunur/kodlanır
+FETCH_CHUNK = 500    # Tam vektörler veritabanından bu kadarlık IN (...) listeleriyle çekilir
+# Ayarlıysa vektörler worker'lar arasında paylaşılan mmap dosyasında tutulur (bkz. vector_store.py)
+USER_VECTOR_STORE_PATH = os.getenv("USER_VECTOR_STORE_PATH", "")
+
+
+class UserVectorIndex:
+    """
+    Tüm kullanıcıların mood vektörlerini bellekte tutan süreç çapında indeks.
+    Vektörler normalize edilmiş float32 matriste, user_id ve username değerleri
+    paralel dizilerde saklanır. Bir sorgu = tek matris-vektör çarpımı + argpartition.
+    """
+
+    def __init__(self, initial_capacity: int = 1024, backend: str = SIMILARITY_BACKEND):
+        self._lock = threading.RLock()
+        self.backend = backend
+        self.ann = None  # backend == "ivf" ise ann_index.IVFIndex
+        self.compressed = None  # backend == "compressed" ise compressed_index.CompressedVectors (_matrix yerine)
+        self._initial_capacity = initial_capacity
+        self.dim = None
+        self.size = 0
+        self.loaded = False
+        self._matrix = None
+        self._user_ids = None
+        self._usernames = None
+        self._positions = {}  # user_id -> matristeki satır numarası
+
+    # --- İÇ YARDIMCILAR ---
+
+    @staticmethod
+    def _normalize(vector):
+        vec = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vec)
+        if norm > 0:
+            vec = vec / norm
+        return vec
+
+    def _allocate(self, dim: int, capacity: int):
+        self.dim = dim
+        self._matrix = None if self.compressed is not None else np.zeros((capacity, dim), dtype=np.float32)
+        self._user_ids = np.zeros(capacity, dtype=np.int64)
+        self._usernames = np.empty(capacity, dtype=object)
+
+    def _grow(self, min_capacity: int):
+        # Kapasite dolunca iki katına çıkar (amortize O(1) ekleme)
+        capacity = max(min_capacity, len(self._user_ids) * 2)
+        if self.compressed is not None:
+            self.compressed.grow(capacity)
+        else:
+            matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+            matrix[:self.size] = self._matrix[:self.size]
+            self._matrix = matrix
+        user_ids = np.zeros(capacity, dtype=np.int64)
+        user_ids[:self.size] = self._user_ids[:self.size]
+        usernames = np.empty(capacity, dtype=object)
+        usernames[:self.size] = self._usernames[:self.size]
+        self._user_ids, self._usernames = user_ids, usernames
+
+    def _row_for(self, user_id: int):
+        row = self._positions.get(user_id)
+        if row is None:
+            if self.size >= len(self._user_ids):
+                self._grow(self.size + 1)
+            row = self.size
+            self.size += 1
+            self._positions[user_id] = row
+        return row
+
+    def _put(self, user_id: int, username: str, vector):
+        vec = self._normalize(vector)
+        if self.dim is None:
+            self._allocate(vec.shape[0], self._initial_capacity)
+        if vec.shape[0] != self.dim:
+            raise ValueError(f"Vektör boyutu uyumsuz: {vec.shape[0]} != {self.dim}")
+
+        row = self._row_for(user_id)
+        if self.compressed is not None:
+            self.compressed.put([row], vec[None, :])
+        else:
+            self._matrix[row] = vec
+        self._user_ids[row] = user_id
+        self._usernames[row] = username
+
+    def _put_compressed(self, entries):
+        """(user_id, username, normalize vektör) listesini tek seferde kodlayıp yazar."""
+        if self.dim is None:
+            self._allocate(entries[0][2].shape[0], max(self._initial_capacity, len(entries)))
+        rows = []
+        for user_id, username, _ in entries:
+            row = self._row_for(user_id)
+            self._user_ids[row] = user_id
+            self._usernames[row] = username
+            rows.append(row)
+        # Aynı kullanıcı parçada iki kez varsa sonraki (yeni) profil kazanır
+        self.compressed.put(rows, np.stack([vec for _, _, vec in entries]))
+
+    # --- DIŞ API ---
+
+    def load(self, db: Session):
+        """Tüm profilleri tek sorguda (JOIN ile) çekip matrisi baştan kurar."""
+        query = (
+            db.query(models.UserProfile.user_id, models.User.username, models.UserProfile.mood_vector)
+            .join(models.User, models.User.id == models.UserProfile.user_id)
+            .filter(models.UserProfile.mood_vector.isnot(None))
+            .order_by(models.UserProfile.id)
+        )
+        with self._lock:
+            self.dim = None
+            self.size = 0
+            self._positions = {}
+            self.ann = None
+            self.compressed = None
+            if self.backend == "compressed":
+                self._load_compressed(query)
+            else:
+                for user_id, username, mood_vector in query.all():
+                    try:
+                        self._put(user_id, username, decode_vector(mood_vector))
+                    except (ValueError, TypeError):
+                        continue  # Bozuk vektörleri atla
+            if self.backend == "ivf":
+                self._attach_ann()
+            self.loaded = True
+
+    def _load_compressed(self, query):
+        """
+        Profilleri parça parça okuyup int8 kodlara çevirir; tam float32 matris hiç
+        kurulmaz. PCA ilk PCA_FIT_SAMPLE profil üzerinde eğitilir. Toplam profil
+        COMPRESSED_MIN_USERS altındaysa normal (exact) matrise düşülür.
+        """
+        pending, dim = [], None
+        for user_id, username, mood_vector in query.yield_per(LOAD_CHUNK):
+            try:
+                vec = self._normalize(decode_vector(mood_vector))
+            except (ValueError, TypeError):
+                continue  # Bozuk vektörleri atla
+            dim = dim or vec.shape[0]
+            if vec.shape[0] != dim:
+                continue  # Boyutu uyumsuz vektörleri atla
+            pending.append((user_id, username, vec))
+            if self.compressed is None and len(pending) >= compressed_index.PCA_FIT_SAMPLE:
+                self._start_compressed(pending)
+                pending = []
+            elif self.compressed is not None and len(pending) >= LOAD_CHUNK:
+                self._put_compressed(pending)
+                pending = []
+
+        if self.compressed is None:
+            if len(pending) >= COMPRESSED_MIN_USERS:
+                self._start_compressed(pending)
+            else:
+                for user_id, username, vec in pending:
+                    self._put(user_id, username, vec)
+        elif pending:
+            self._put_compressed(pending)
+
+    def _start_compressed(self, entries):
+        projection = compressed_index.PCAProjection.fit(np.stack([vec for _, _, vec in entries]))
+        self.compressed = compressed_index.CompressedVectors(projection, max(self._initial_capacity, len(entries)))
+        print(f"🗜️ Sıkıştırılmış vektör katmanı: {self.compressed.codes.shape[1]} boyut int8 "
+              f"(PCA {len(entries)} profil üzerinde eğitildi)")
+        self._put_compressed(entries)
+
+    @staticmethod
+    def _fetch_vectors(user_ids):
+        """
+        Tam vektörleri veritabanından okur (sıkıştırılmış katmanda bellekte tutulmazlar).
+        Döner: {user_id: normalize vektör}; bir kullanıcının birden çok profili varsa
+        load() ile aynı şekilde en yenisi kazanır.
+        """
+        found = {}
+        user_ids = [int(i) for i in user_ids]
+        with ReadSessionLocal() as db:
+            for start in range(0, len(user_ids), FETCH_CHUNK):
+                rows = (
+                    db.query(models.UserProfile.user_id, models.UserProfile.mood_vector)
+                    .filter(models.UserProfile.user_id.in_(user_ids[start:start + FETCH_CHUNK]),
+                            models.UserProfile.mood_vector.isnot(None))
+                    .order_by(models.UserProfile.id)
+                    .all()
+                )
+                for user_id, mood_vector in rows:
+                    try:
+                        found[user_id] = UserVectorIndex._normalize(decode_vector(mood_vector))
+                    except (ValueError, TypeError):
+                        continue
+        return found
+
+    def _attach_ann(self):
+        """
+        Diskteki IVF indeksini yükler ve veritabanıyla eşitler: dosya yazıldıktan sonra
+        eklenen/değişen profiller yeniden atanır, silinenler çıkarılır. Dosya yoksa
+        yeterli veri varsa kurar.
+        """
+        ids, vectors = self.snapshot()
+        if os.path.exists(ann_index.ANN_INDEX_PATH):
+            ivf = ann_index.IVFIndex.load(ann_index.ANN_INDEX_PATH)
+            deleted = np.setdiff1d(ivf.all_ids(), ids)
+            stale = np.isin(ids, ivf.stale_ids(ids, vectors))
+            if len(deleted):
+                ivf.remove(deleted)
+            if stale.any():
+                ivf.add(ids[stale], vectors[stale])
+            if len(deleted) or stale.any():
+                print(f"🧭 IVF indeksi eşitlendi: {int(stale.sum())} profil yeniden atandı, {len(deleted)} silindi")
+                ivf.save(ann_index.ANN_INDEX_PATH)
+        elif len(ids) >= ANN_MIN_USERS:
+            print(f"🧭 IVF indeksi kuruluyor ({len(ids)} profil)...")
+            ivf = ann_index.IVFIndex(dim=self.dim, n_lists=ann_index.default_n_lists(len(ids)))
+            ivf.build(ids, vectors)
+            ivf.save(ann_index.ANN_INDEX_PATH)
+        else:
+            return  # Az veride tam tarama zaten hızlı
+        self.ann = ivf
+
+    def snapshot(self):
+        """
+        (user_ids, vektör matrisi) kopyası döner. Sıkıştırılmış katmanda tam
+        vektörler veritabanından okunur (geçici N x dim bellek; tek seferlik
+        toplu işler için; komşu tablosu işi bu katmanda kapalıdır).
+        """
+        with self._lock:
+            if self.size == 0:
+                return np.zeros(0, dtype=np.int64), np.zeros((0, self.dim or 0), dtype=np.float32)
+            if self.compressed is None:
+                return self._user_ids[:self.size].copy(), self._matrix[:self.size].copy()
+            ids, dim = self._user_ids[:self.size].copy(), self.dim
+        found = self._fetch_vectors(ids)
+        keep = np.array([int(i) in found for i in ids], dtype=bool)
+        ids = ids[keep]
+        matrix = np.zeros((len(ids), dim), dtype=np.float32)
+        for row, user_id in enumerate(ids):
+            matrix[row] = found[int(user_id)]
+        return ids, matrix
+
+    def ensure_loaded(self, db: Session):
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self.load(db)
+
+    def upsert(self, user_id: int, username: str, vector, source_id: int = None):
+        """Yeni/değişen profili indekse yerinde ekler. İndeks henüz yüklenmediyse ilk load'da gelecek."""
+        with self._lock:
+            if not self.loaded:
+                return
+            self._put(user_id, username, vector)
+            if self.ann is not None:
+                self.ann.add([user_id], [vector])
+
+    def get_vector(self, user_id: int):
+        with self._lock:
+            row = self._positions.get(user_id)
+            if row is None:
+                return None
+            if self.compressed is None:
+                return self._matrix[row].copy()
+        return self._fetch_vectors([user_id]).get(user_id)
+
+    def get_vectors(self, user_ids):
+        """{user_id: vektör} (indekste olmayanlar atlanır). Sıkıştırılmış katmanda tek DB okuması."""
+        with self._lock:
+            rows = {int(i): self._positions[int(i)] for i in user_ids if int(i) in self._positions}
+            if self.compressed is None:
+                return {user_id: self._matrix[row].copy() for user_id, row in rows.items()}
+        return self._fetch_vectors(list(rows))
+
+    def _bookkeeping_bytes(self):
+        """Vektör dışındaki satır başı yapılar: user_id dizisi, kullanıcı adları, user_id -> satır sözlüğü."""
+        if self._user_ids is None:
+            return {"user_ids_bytes": 0, "usernames_bytes": 0, "positions_bytes": 0}
+        names = self._usernames[:self.size]
+        return {
+            "user_ids_bytes": int(self._user_ids.nbytes),
+            "usernames_bytes": int(self._usernames.nbytes + sum(sys.getsizeof(u) for u in names if u is not None)),
+            "positions_bytes": int(sys.getsizeof(self._positions) + sum(
+                sys.getsizeof(k) + sys.getsizeof(v) for k, v in self._positions.items()
+            )),
+        }
+
+    def memory_footprint(self):
+        """
+        İndeksin bellek kullanımı (bayt): vektör deposu + satır başı kayıtlar.
+        Sıkıştırılmış katmanda codes_ratio sadece kodların float32'ye oranıdır;
+        total_ratio kullanıcı adları ve sözlük kayıtları dahil gerçek orandır.
+        """
+        with self._lock:
+            n, dim = self.size, self.dim or 0
+            bookkeeping = self._bookkeeping_bytes()
+            overhead = sum(bookkeeping.values())
+            if self.compressed is not None:
+                footprint = self.compressed.memory_footprint(n, dim)
+                total = footprint["codes_bytes"] + footprint["projection_bytes"] + overhead
+                return {"backend": "compressed", **footprint, **bookkeeping, "total_bytes": total,
+                        "total_ratio": round((footprint["float32_bytes"] + overhead) / total, 1) if total else None}
+            return {"backend": self.backend, "vectors": n, "dim": dim,
+                    "float32_bytes": n * dim * 4, **bookkeeping, "total_bytes": n * dim * 4 + overhead}
+
+    def search(self, query_vector, top_k: int = 3, exclude_user_id: int = None, nprobe: int = None):
+        """
+        Sorgu vektörüne en benzeyen top_k kullanıcıyı döner.
+        Sonuç: [(user_id, username, score), ...] skora göre azalan sırada.
+        IVF etkinse sadece en yakın nprobe küme taranır (yaklaşık sonuç).
+        Sıkıştırılmış katmanda adaylar int8 kodlarla seçilip tam vektörlerle
+        kesin skorlanır (dönen skorlar gerçek kosinüs benzerliğidir).
+        """
+        if self.compressed is not None:
+            return self._search_compressed(query_vector, top_k, exclude_user_id)
+
+        if self.ann is not None:
+            ids, scores = self.ann.search(query_vector, top_k=top_k, nprobe=nprobe, exclude_id=exclude_user_id)
+            with self._lock:
+                return [
+                    (int(i), self._usernames[self._positions[int(i)]], float(s))
+                    for i, s in zip(ids, scores)
+                    if int(i) in self._positions
+                ]
+
+        with self._lock:
+            n = self.size
+            if n == 0 or top_k <= 0:
+                return []
+            query = self._normalize(query_vector)
+            if query.shape[0] != self.dim:
+                return []
+
+            # Kosinüs benzerliği = normalize vektörlerin iç çarpımı
+            scores = self._matrix[:n] @ query
+
+            if exclude_user_id is not None:
+                row = self._positions.get(exclude_user_id)
+                if row is not None:
+                    scores[row] = -np.inf
+
+            valid = n - (1 if exclude_user_id in self._positions else 0)
+            k = min(top_k, valid)
+            if k <= 0:
+                return []
+
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                (int(self._user_ids[i]), self._usernames[i], float(scores[i]))
+                for i in top
+            ]
+
+    def _search_compressed(self, query_vector, top_k: int, exclude_user_id: int = None,
+                           rerank: int = compressed_index.COMPRESSED_RERANK):
+        query = self._normalize(query_vector)
+        with self._lock:
+            n = self.size
+            if n == 0 or top_k <= 0 or query.shape[0] != self.dim:
+                return []
+            scores = self.compressed.scores(query, n)
+            exclude_row = self._positions.get(exclude_user_id) if exclude_user_id is not None else None
+            if exclude_row is not None:
+                scores[exclude_row] = -np.inf
+            n_candidates = min(top_k * max(1, rerank), n - (exclude_row is not None))
+            if n_candidates <= 0:
+                return []
+            rows = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+            names = {int(self._user_ids[r]): self._usernames[r] for r in rows}
+
+        # Kilidin dışında: sadece adayların tam vektörleri okunur
+        found = self._fetch_vectors(list(names))
+        candidate_ids = [user_id for user_id in names if user_id in found]
+        ids, exact = compressed_index.rerank(
+            candidate_ids, [found[i] for i in candidate_ids], query, top_k
+        )
+        return [(int(i), names[int(i)], float(s)) for i, s in zip(ids, exact)]
+
+
+class SharedUserVectorIndex:
+    """
+    UserVectorIndex'in çok worker'lı karşılığı (tam tarama): vektörler süreç
+    belleğinde değil, vector_store dosyasında tutulur ve salt-okunur map edilir.
+    Süreç başına özel bellek sadece id arama dizileri ve canlılık maskesidir
+    (satır başına ~17 bayt; vektör başına 4 * dim bayt paylaşılır).
+
+    - Dosya yoksa bir kez veritabanından kurulur (tek worker, dosya kilidiyle).
+    - Dosya varsa açılışta tablo decode edilmez; sadece watermark'tan sonra
+      eklenen profiller okunup depoya eklenir.
+    - Her ensure_loaded/search başında başlıktaki generation kontrol edilir;
+      diğer worker'ların eklediği satırlar yeniden başlatmadan görülür.
+    - Kullanıcı adları dosyada yoktur; arama sonuçları için tek sorguyla okunur.
+    """
+
+    backend = "shared"
+    compressed = None  # UserVectorIndex ile aynı arayüz: tam vektörler (dosyada) her zaman erişilebilir
+
+    def __init__(self, path: str):
+        self.store = vector_store.VectorStore(path)
+        self._lock = threading.RLock()
+        self.loaded = False
+        self.dim = None
+        self.size = 0
+        self._generation = None
+        self._remaps = 0  # Dosya kaç kez yeniden map edildi (satır numaraları değişti)
+        self._count = 0
+        self._sorted_ids = np.zeros(0, dtype=np.int64)   # (id, satır) sıralı; aynı id'nin en yeni satırı sonda
+        self._sorted_rows = np.zeros(0, dtype=np.int64)
+        self._alive = np.zeros(0, dtype=bool)
+
+    _normalize = staticmethod(UserVectorIndex._normalize)
+
+    # --- KURULUM ---
+
+    @staticmethod
+    def _profile_chunks(db: Session, after_id: int, progress: dict):
+        """watermark'tan sonraki profilleri (ids, normalize vektörler) parçaları olarak okur."""
+        query = (
+            db.query(models.UserProfile.id, models.UserProfile.user_id, models.UserProfile.mood_vector)
+            .filter(models.UserProfile.mood_vector.isnot(None), models.UserProfile.id > after_id)
+            .order_by(models.UserProfile.id)
+        )
+        ids, vectors = [], []
+        for profile_id, user_id, mood_vector in query.yield_per(LOAD_CHUNK):
+            progress["watermark"] = profile_id
+            try:
+                vec = UserVectorIndex._normalize(decode_vector(mood_vector))
+            except (ValueError, TypeError):
+                continue  # Bozuk vektörleri atla
+            if vec.shape[0] != progress["dim"]:
+                continue
+            ids.append(user_id)
+            vectors.append(vec)
+            if len(ids) >= LOAD_CHUNK:
+                yield np.array(ids, dtype=np.int64), np.stack(vectors)
+                ids, vectors = [], []
+        if ids:
+            yield np.array(ids, dtype=np.int64), np.stack(vectors)
+
+    def _build(self, db: Session, force: bool = False):
+        first = (
+            db.query(models.UserProfile.mood_vector)
+            .filter(models.UserProfile.mood_vector.isnot(None))
+            .order_by(models.UserProfile.id)
+            .first()
+        )
+        if first is None:
+            return False  # Henüz profil yok; depo ilk upsert'te kurulur
+        total = db.query(func.count(models.UserProfile.id)).filter(models.UserProfile.mood_vector.isnot(None)).scalar()
+        progress = {"dim": decode_vector(first[0]).shape[0], "watermark": 0}
+        capacity = max(vector_store.MIN_CAPACITY, 2 * total)
+        built = self.store.build(progress["dim"], capacity, lambda: self._profile_chunks(db, 0, progress),
+                                 watermark=lambda: progress["watermark"], force=force)
+        if built:
+            print(f"🗄️ Paylaşılan vektör deposu kuruldu: {self.store.path} ({total} profil)")
+        return built
+
+    def _catch_up(self, db: Session):
+        """Depo yazıldıktan sonra eklenen profilleri (watermark sonrası) depoya ekler."""
+        _, _, watermark, _ = self.store.refresh()
+        progress = {"dim": self.store.dim, "watermark": watermark}
+        added = 0
+        for ids, vectors in self._profile_chunks(db, watermark, progress):
+            self.store.append(ids, vectors, watermark=progress["watermark"])
+            added += len(ids)
+        if added:
+            print(f"🗄️ Paylaşılan vektör deposuna {added} yeni profil eklendi")
+
+    def load(self, db: Session):
+        with self._lock:
+            if not self.store.exists():
+                self._build(db)
+            if self.store.exists():
+                self._catch_up(db)
+                self._refresh()
+            self.loaded = True
+
+    def rebuild(self, db: Session):
+        """Depoyu veritabanından baştan yazar (çalışan worker'lar dosya değişimini görüp yeniden map eder)."""
+        with self._lock:
+            self._build(db, force=True)
+            self._refresh()
+            self.loaded = True
+
+    def ensure_loaded(self, db: Session):
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self.load(db)
+        self._refresh()
+
+    def _refresh(self):
+        """Diğer worker'ların eklediği satırları (generation değiştiyse) arama dizilerine katar."""
+        if not self.store.exists():
+            return
+        with self._lock:
+            count, generation, _, remapped = self.store.refresh()
+            if generation == self._generation and not remapped:
+                return
+            ids = self.store.ids
+            if remapped:
+                self._remaps += 1
+            if remapped or count < self._count:
+                rows = np.arange(count, dtype=np.int64)
+                order = np.lexsort((rows, ids[:count]))
+                self._sorted_ids, self._sorted_rows = ids[:count][order], rows[order]
+            elif count > self._count:
+                # Yeni satırlar mevcut satırlardan büyük: eşit id'lerin sağına eklenir
+                rows = np.arange(self._count, count, dtype=np.int64)
+                order = np.lexsort((rows, ids[self._count:count]))
+                new_ids, new_rows = ids[self._count:count][order], rows[order]
+                at = np.searchsorted(self._sorted_ids, new_ids, side="right")
+                self._sorted_ids = np.insert(self._sorted_ids, at, new_ids)
+                self._sorted_rows = np.insert(self._sorted_rows, at, new_rows)
+            self._alive = self.store.alive(count)
+            self._count = count
+            self._generation = generation
+            self.dim = self.store.dim
+            self.size = int(self._alive.sum())
+
+    def appended_since(self, cursor):
+        """
+        cursor'dan sonra depoya eklenen (yeni/değişen) profillerin user_id'leri,
+        hangi worker yazmış olursa olsun. Döner: (user_id'ler, yeni cursor).
+        Dosya bu arada yeniden yazıldıysa (büyüme/rebuild) satır numaraları
+        değiştiği için user_id'ler yerine None döner. cursor=None -> şu an.
+        """
+        self._refresh()
+        with self._lock:
+            now = (self._remaps, self._count)
+            if cursor is None:
+                return [], now
+            remaps, row = cursor
+            if remaps != self._remaps:
+                return None, now
+            return [int(i) for i in np.unique(self.store.ids[row:self._count])], now
+
+    def _rows_for(self, user_ids):
+        """user_id -> satır (canlı olanlar); yoksa -1."""
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        if len(self._sorted_ids) == 0:
+            return np.full(len(user_ids), -1, dtype=np.int64)
+        at = np.searchsorted(self._sorted_ids, user_ids, side="right") - 1
+        at_clipped = np.maximum(at, 0)
+        rows = self._sorted_rows[at_clipped]
+        found = (at >= 0) & (self._sorted_ids[at_clipped] == user_ids) & self._alive[rows]
+        return np.where(found, rows, -1)
+
+    @staticmethod
+    def _usernames(user_ids):
+        with ReadSessionLocal() as db:
+            return dict(db.query(models.User.id, models.User.username).filter(models.User.id.in_(user_ids)).all())
+
+    # --- DIŞ API ---
+
+    def upsert(self, user_id: int, username: str, vector, source_id: int = None):
+        """Profili paylaşılan depoya ekler (eski satırı silinmiş işaretlenir); tüm worker'lar görür."""
+        if not self.loaded:
+            return
+        vec = self._normalize(vector)[None, :]
+        if not self.store.exists():
+            self.store.build(vec.shape[1], vector_store.MIN_CAPACITY, lambda: [(np.array([user_id]), vec)],
+                             watermark=source_id or 0)
+        else:
+            self.store.append([user_id], vec, watermark=source_id)
+        self._refresh()
+
+    def get_vector(self, user_id: int):
+        self._refresh()
+        with self._lock:
+            row = int(self._rows_for([user_id])[0])
+            return np.array(self.store.matrix[row]) if row >= 0 else None
+
+    def get_vectors(self, user_ids):
+        self._refresh()
+        user_ids = [int(i) for i in user_ids]
+        with self._lock:
+            rows = self._rows_for(user_ids)
+            return {user_id: np.array(self.store.matrix[row]) for user_id, row in zip(user_ids, rows) if row >= 0}
+
+    def snapshot(self):
+        """(user_ids, vektör matrisi) kopyası (komşu tablosu işi gibi toplu işler için)."""
+        self._refresh()
+        with self._lock:
+            if self.size == 0:
+                return np.zeros(0, dtype=np.int64), np.zeros((0, self.dim or 0), dtype=np.float32)
+            rows = np.flatnonzero(self._alive)
+            return self.store.ids[rows].copy(), self.store.matrix[rows]
+
+    def memory_footprint(self):
+        with self._lock:
+            dim = self.dim or 0
+            return {
+                "backend": self.backend,
+                "vectors": self.size,
+                "dim": dim,
+                "file_bytes": self.store.file_size(),
+                "shared_bytes": self._count * dim * 4,  # Sayfa önbelleğinde, tüm worker'lar için tek kopya
+                "private_bytes": int(self._sorted_ids.nbytes + self._sorted_rows.nbytes + self._alive.nbytes),
+                "generation": self._generation,
+            }
+
+    def search(self, query_vector, top_k: int = 3, exclude_user_id: int = None, nprobe: int = None):
+        """Sonuç: [(user_id, username, score), ...] skora göre azalan sırada (tam tarama)."""
+        self._refresh()
+        with self._lock:
+            n = self._count
+            if self.size == 0 or top_k <= 0:
+                return []
+            query = self._normalize(query_vector)
+            if query.shape[0] != self.dim:
+                return []
+
+            scores = self.store.matrix[:n] @ query
+            scores[~self._alive] = -np.inf
+            valid = self.size
+            if exclude_user_id is not None:
+                row = int(self._rows_for([exclude_user_id])[0])
+                if row >= 0:
+                    scores[row] = -np.inf
+                    valid -= 1
+            k = min(top_k, valid)
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            ids = [int(i) for i in self.store.ids[top]]
+            top_scores = [float(scores[i]) for i in top]
+
+        names = self._usernames(ids)
+        return [(user_id, names.get(user_id), score) for user_id, score in zip(ids, top_scores)]
+
+
+# Süreç çapında tek indeks (Global Değişken); USER_VECTOR_STORE_PATH ayarlıysa worker'lar arası paylaşılan depo
+if USER_VECTOR_STORE_PATH:
+    if SIMILARITY_BACKEND != "exact":
+        print(f"⚠️ USER_VECTOR_STORE_PATH ayarlı: SIMILARITY_BACKEND={SIMILARITY_BACKEND} yok sayılıyor, "
+              f"paylaşılan depoda tam tarama kullanılır")
+    user_index = SharedUserVectorIndex(USER_VECTOR_STORE_PATH)
+else:
+    user_index = UserVectorIndex()
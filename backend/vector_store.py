@@ -0,0 +1,261 @@
+"""
+Süreçler (uvicorn worker'ları) arasında paylaşılan, bellek eşlemli vektör deposu.
+
+Dosya düzeni (little-endian, tek dosya):
+    [başlık: HEADER_SIZE bayt]
+    [float32 matris: capacity x dim]     -> sayfa hizalı başlar
+    [int64 id dizisi: capacity]
+    [silinmiş (tombstone) bit haritası: ceil(capacity / 8) bayt]
+Başlık: magic, sürüm, dim, capacity, count, generation, watermark.
+
+- Okuyucular dosyayı np.memmap ile salt-okunur açar; sayfalar işletim
+  sisteminin sayfa önbelleğinde paylaşılır, worker sayısı arttıkça bellek artmaz.
+- Tek yazar: eklemeler dosya kilidi (path + ".lock") altında yapılır; hangi
+  worker yazarsa yazsın aynı anda tek süreç yazar.
+- Ekleme sırası: satırlar + id'ler yazılır, aynı id'nin eski satırı silinmiş
+  işaretlenir, en son başlıktaki count ve generation güncellenir (yayınlama).
+  Okuyucular generation değişince yeni satırları görür; yeniden başlatma gerekmez.
+- Kapasite dolunca silinmiş satırlar atılarak dosya iki katı kapasiteyle
+  yeniden yazılır ve atomik olarak değiştirilir (os.replace); okuyucular dosya
+  kimliğinin (inode) değiştiğini görüp yeniden map eder.
+- watermark: depoya yazılmış en büyük kaynak satır id'si (UserProfile.id);
+  açılışta sadece bundan sonraki satırlar okunur.
+
+Kullanım:
+    USER_VECTOR_STORE_PATH=user_vectors.bin python vector_store.py   -> depoyu veritabanından baştan kurar
+"""
+import os
+import struct
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+MAGIC = b"MRVSTORE"
+VERSION = 1
+HEADER_FORMAT = "<8sIIQQQQ"  # magic, sürüm, dim, capacity, count, generation, watermark
+HEADER_SIZE = 4096
+MIN_CAPACITY = 1024
+
+
+def try_exclusive_lock(path: str):
+    """
+    Süreçler arası kilidi beklemeden almayı dener (ör. tek worker'da çalışacak iş
+    seçimi). Alınırsa kilidi tutan açık dosyayı döner (kapatılınca kilit bırakılır;
+    süreç ölürse işletim sistemi bırakır), alınamazsa None.
+    """
+    lock_file = open(path, "a+b")
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+class VectorStore:
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._raw = None
+        self._identity = None
+        self.dim = 0
+        self.capacity = 0
+        self.matrix = None
+        self.ids = None
+        self._tombstones = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    # --- DÜZEN ---
+
+    @staticmethod
+    def _layout(dim: int, capacity: int):
+        matrix = HEADER_SIZE
+        ids = matrix + capacity * dim * 4
+        tombstones = ids + capacity * 8
+        return matrix, ids, tombstones, tombstones + (capacity + 7) // 8
+
+    @staticmethod
+    def _views(raw, dim: int, capacity: int):
+        m, i, t, end = VectorStore._layout(dim, capacity)
+        return (raw[m:i].view(np.float32).reshape(capacity, dim),
+                raw[i:t].view(np.int64),
+                raw[t:end])
+
+    @staticmethod
+    def _read_header(raw):
+        # Yazar başlığı güncellerken yırtık okuma olmasın: iki okuma aynı olana kadar tekrarla
+        while True:
+            first = bytes(raw[:struct.calcsize(HEADER_FORMAT)])
+            if first == bytes(raw[:len(first)]):
+                break
+        magic, version, dim, capacity, count, generation, watermark = struct.unpack(HEADER_FORMAT, first)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Geçersiz vektör deposu dosyası")
+        return dim, capacity, count, generation, watermark
+
+    @staticmethod
+    def _write_header(raw, dim, capacity, count, generation, watermark):
+        raw[:struct.calcsize(HEADER_FORMAT)] = np.frombuffer(
+            struct.pack(HEADER_FORMAT, MAGIC, VERSION, dim, capacity, count, generation, watermark), dtype=np.uint8
+        )
+
+    # --- YAZAR ---
+
+    @contextmanager
+    def _writer_lock(self):
+        """Süreçler arası tek yazar (dosya kilidi) + süreç içi thread kilidi."""
+        with self._lock, open(self.path + ".lock", "a+b") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _write_file(self, dim: int, capacity: int, chunks, generation: int, watermark):
+        """
+        (ids, vektörler) parçalarından yeni dosyayı yazıp atomik olarak yerine koyar.
+        watermark çağrılabilirse parçalar tükendikten sonra çağrılır (okunan son kaynak id).
+        """
+        tmp_path = self.path + ".tmp"
+        size = self._layout(dim, capacity)[3]
+        with open(tmp_path, "wb") as f:
+            f.truncate(size)
+        raw = np.memmap(tmp_path, dtype=np.uint8, mode="r+", shape=(size,))
+        matrix, ids, tombstones = self._views(raw, dim, capacity)
+
+        count = 0
+        for chunk_ids, chunk_vectors in chunks:
+            n = len(chunk_ids)
+            if count + n > capacity:
+                raise ValueError("Vektör deposu kapasitesi aşıldı")
+            matrix[count:count + n] = chunk_vectors
+            ids[count:count + n] = chunk_ids
+            count += n
+
+        # Aynı id birden çok kez yazıldıysa sonuncusu (en yeni) kalır
+        order = np.lexsort((np.arange(count), ids[:count]))
+        sorted_ids = ids[:count][order]
+        stale = order[:-1][sorted_ids[:-1] == sorted_ids[1:]] if count else order
+        np.bitwise_or.at(tombstones, stale >> 3, (1 << (stale & 7)).astype(np.uint8))
+
+        if callable(watermark):
+            watermark = watermark()
+        self._write_header(raw, dim, capacity, count, generation, watermark)
+        raw.flush()
+        del raw, matrix, ids, tombstones
+        os.replace(tmp_path, self.path)
+        return count
+
+    def build(self, dim: int, capacity: int, chunks, watermark=0, force: bool = False) -> bool:
+        """
+        Depoyu baştan yazar. force=False ise ve dosya zaten varsa (başka bir
+        worker kurmuş) hiçbir şey yapmaz. chunks: (ids, vektörler) üreten çağrılabilir;
+        sadece gerçekten kurulacaksa çağrılır.
+        """
+        with self._writer_lock():
+            if self.exists() and not force:
+                return False
+            generation = 1
+            if self.exists():
+                generation = self._read_header(np.memmap(self.path, dtype=np.uint8, mode="r"))[3] + 1
+            self._write_file(dim, max(MIN_CAPACITY, capacity), chunks(), generation, watermark)
+            return True
+
+    def append(self, ids, vectors, watermark: int = None):
+        """Yeni satırları ekler, aynı id'lerin eski satırlarını silinmiş işaretler ve yayınlar."""
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        # Aynı parti içinde tekrar eden id'lerin sadece sonuncusu
+        _, last = np.unique(ids[::-1], return_index=True)
+        keep = np.sort(len(ids) - 1 - last)
+        ids, vectors = ids[keep], vectors[keep]
+
+        with self._writer_lock():
+            raw = np.memmap(self.path, dtype=np.uint8, mode="r+")
+            dim, capacity, count, generation, old_watermark = self._read_header(raw)
+            if vectors.shape[1] != dim:
+                raise ValueError(f"Vektör boyutu uyumsuz: {vectors.shape[1]} != {dim}")
+            watermark = max(old_watermark, watermark or 0)
+            matrix, stored_ids, tombstones = self._views(raw, dim, capacity)
+
+            if count + len(ids) > capacity:
+                # Silinmişleri atarak iki katı kapasiteyle yeniden yaz
+                alive = ~self._unpack(tombstones, count)
+                alive &= ~np.isin(stored_ids[:count], ids)
+                n_alive = int(alive.sum())
+                new_capacity = max(MIN_CAPACITY, 2 * (n_alive + len(ids)))
+                chunks = [(stored_ids[:count][alive], matrix[:count][alive]), (ids, vectors)]
+                del matrix, stored_ids, tombstones
+                self._write_file(dim, new_capacity, chunks, generation + 1, watermark)
+                del chunks, raw
+                return
+
+            stale = np.flatnonzero(np.isin(stored_ids[:count], ids))
+            matrix[count:count + len(ids)] = vectors
+            stored_ids[count:count + len(ids)] = ids
+            np.bitwise_or.at(tombstones, stale >> 3, (1 << (stale & 7)).astype(np.uint8))
+            raw.flush()  # Önce veri, sonra başlık (okuyucular yarım satır görmesin)
+            self._write_header(raw, dim, capacity, count + len(ids), generation + 1, watermark)
+            raw.flush()
+            del matrix, stored_ids, tombstones, raw
+
+    # --- OKUYUCU ---
+
+    @staticmethod
+    def _unpack(tombstones, count: int):
+        return np.unpackbits(tombstones, count=count, bitorder="little").astype(bool)
+
+    def refresh(self):
+        """
+        Dosya değiştirildiyse (büyüme/yeniden kurulum) yeniden map eder.
+        Döner: (count, generation, watermark, remapped)
+        """
+        stat = os.stat(self.path)
+        identity = (stat.st_dev, stat.st_ino, stat.st_size)
+        remapped = identity != self._identity
+        if remapped:
+            raw = np.memmap(self.path, dtype=np.uint8, mode="r")
+            self.dim, self.capacity = self._read_header(raw)[:2]
+            self.matrix, self.ids, self._tombstones = self._views(raw, self.dim, self.capacity)
+            self._raw, self._identity = raw, identity
+        count, generation, watermark = self._read_header(self._raw)[2:]
+        return count, generation, watermark, remapped
+
+    def alive(self, count: int):
+        """İlk count satırın canlı (silinmemiş) maskesi."""
+        return ~self._unpack(self._tombstones, count)
+
+    def file_size(self) -> int:
+        return os.path.getsize(self.path) if self.exists() else 0
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+    from vector_index import SharedUserVectorIndex, USER_VECTOR_STORE_PATH
+
+    if not USER_VECTOR_STORE_PATH:
+        raise SystemExit("USER_VECTOR_STORE_PATH ayarlı değil.")
+    with SessionLocal() as db:
+        SharedUserVectorIndex(USER_VECTOR_STORE_PATH).rebuild(db)